@@ -0,0 +1,3 @@
+"""
+Benchmark suite for llm_data_mask, run with `python -m benchmarks.run`.
+"""
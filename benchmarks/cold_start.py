@@ -0,0 +1,99 @@
+"""
+Measures the cold start of the structured generator with and without the guide cache.
+
+Each measurement runs in a fresh interpreter, which loads the model and
+builds the real DriverDetails generator: first against an empty guide cache
+directory (the guide is compiled and stored), then against the populated one
+(the guide is loaded back). The guide cache hits and misses of each run are
+reported, so a run that silently compiled the guide shows up.
+
+Needs outlines, torch and transformers, and a supported outlines version
+for the cache to be used at all.
+
+Usage:
+    python -m benchmarks.cold_start [--model NAME] [--runs N]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REQUIRED_MODULES = ("outlines", "torch", "transformers")
+
+_PROBE = """
+import json, time
+start = time.perf_counter()
+from llm_data_mask import DriverDetails, enable_metrics, get_generator, get_model
+from llm_data_mask.metrics import default_metrics
+get_model({model!r})
+loaded = time.perf_counter()
+enable_metrics()
+get_generator(DriverDetails, {model!r})
+built = time.perf_counter()
+counters = default_metrics.snapshot()["counters"]
+print(json.dumps({{
+    "model_s": loaded - start,
+    "generator_s": built - loaded,
+    "hits": counters.get("guide_cache_hits", 0),
+    "misses": counters.get("guide_cache_misses", 0),
+}}))
+"""
+
+
+def measure_cold_start(model_name, cache_dir):
+    """
+    Loads the model and builds the generator in a fresh interpreter.
+
+    Returns:
+        dict: model_s and generator_s, the seconds spent in each step, and
+              the guide cache hits and misses
+    """
+    environment = dict(os.environ, LLM_DATA_MASK_GUIDE_CACHE=cache_dir)
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(model=model_name)],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=environment,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    from llm_data_mask.guide_cache import SUPPORTED_OUTLINES_VERSIONS, is_supported_outlines
+    from llm_data_mask.registry import DEFAULT_MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="Measure the generator cold start")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL_NAME, help="Model to load")
+    parser.add_argument("--runs", type=int, default=3, help="Warm cache runs to average")
+    args = parser.parse_args()
+
+    missing = [name for name in REQUIRED_MODULES if importlib.util.find_spec(name) is None]
+    if missing:
+        sys.exit(f"The cold start benchmark needs {', '.join(missing)} installed")
+    if not is_supported_outlines():
+        sys.exit(f"The guide cache needs outlines {' or '.join(SUPPORTED_OUTLINES_VERSIONS)}")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = measure_cold_start(args.model, cache_dir)
+        warm = [measure_cold_start(args.model, cache_dir) for _ in range(args.runs)]
+
+    warm_generator_s = sum(run["generator_s"] for run in warm) / len(warm)
+    print(f"{'':<16} {'model (s)':>10} {'generator (s)':>14} {'hits':>5} {'misses':>7}")
+    print(
+        f"{'empty cache':<16} {cold['model_s']:10.2f} {cold['generator_s']:14.2f} "
+        f"{cold['hits']:5} {cold['misses']:7}"
+    )
+    print(
+        f"{'cached guide':<16} {warm[0]['model_s']:10.2f} {warm_generator_s:14.2f} "
+        f"{sum(run['hits'] for run in warm):5} {sum(run['misses'] for run in warm):7}"
+    )
+    if warm_generator_s:
+        print(f"generator build speed-up: {cold['generator_s'] / warm_generator_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Compares the CPU inference profiles against the current model loading.
+
+Each configuration runs in a fresh interpreter, which loads the model,
+extracts every field of the same synthetic records (the fast path is off,
+so the model generates them all) and reports:
+    - generated tokens per second over the generation stage
+    - peak RSS of the process
+    - field accuracy against the synthetic ground truth
+
+"current" loads the model as the registry does without a profile.
+
+Usage:
+    python -m benchmarks.cpu_profile [--records N] [--model NAME] [--profiles NAME ...]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+from llm_data_mask.cpu_profile import CPU_PROFILES
+from llm_data_mask.registry import CPU_PROFILE_VARIABLE, DEFAULT_MODEL_NAME
+
+REQUIRED_MODULES = ("outlines", "torch", "transformers")
+
+_PROBE = """
+import json, resource, sys, time
+from llm_data_mask import enable_metrics, extract_driver_details_batch, get_model, normalize_text
+from llm_data_mask.metrics import default_metrics
+from llm_data_mask.synthetic import field_accuracy, generate_records
+
+records = generate_records({records}, seed={seed}, trailing_sentences=(0, 2))
+texts = [normalize_text(record["text"]).text for record in records]
+
+start = time.perf_counter()
+get_model({model!r})
+load_s = time.perf_counter() - start
+
+enable_metrics()
+mappings = extract_driver_details_batch(
+    texts, batch_size={batch_size}, model_name={model!r}, fast_path=False, normalized=True
+)
+snapshot = default_metrics.snapshot()
+generation_s = snapshot["timings"]["generation"]["sum"]
+
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss /= 1024
+print(json.dumps({{
+    "load_s": load_s,
+    "tokens_per_s": snapshot["counters"].get("generated_tokens", 0) / generation_s,
+    "prompt_tokens_per_s": snapshot["counters"].get("prompt_tokens", 0) / generation_s,
+    "rss_mib": rss / 1024,
+    "accuracy": field_accuracy(records, mappings)["overall"],
+}}))
+"""
+
+
+def measure_profile(profile, args):
+    """
+    Runs the extraction in a fresh interpreter with a CPU profile, or without one.
+
+    Returns:
+        dict: load_s, tokens_per_s, prompt_tokens_per_s, rss_mib and accuracy
+    """
+    environment = dict(os.environ)
+    environment.pop(CPU_PROFILE_VARIABLE, None)
+    if profile != "current":
+        environment[CPU_PROFILE_VARIABLE] = profile
+
+    probe = _PROBE.format(records=args.records, seed=args.seed, model=args.model, batch_size=args.batch_size)
+    output = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, check=True, env=environment
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CPU inference profiles")
+    parser.add_argument("--records", type=int, default=32, help="Synthetic records extracted per profile")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic records")
+    parser.add_argument("--batch-size", type=int, default=8, help="Records generated together")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME, help="Model to load")
+    parser.add_argument(
+        "--profiles",
+        nargs="*",
+        default=["current", *CPU_PROFILES],
+        help="Profiles to compare, 'current' for the loading without a profile",
+    )
+    args = parser.parse_args()
+
+    missing = [name for name in REQUIRED_MODULES if importlib.util.find_spec(name) is None]
+    if missing:
+        sys.exit(f"The CPU profile benchmark needs {', '.join(missing)} installed")
+
+    print(f"{'profile':<10} {'load s':>8} {'tokens/s':>9} {'prompt tok/s':>13} {'peak MiB':>9} {'accuracy':>9}")
+    for profile in args.profiles:
+        result = measure_profile(profile, args)
+        print(
+            f"{profile:<10} {result['load_s']:8.1f} {result['tokens_per_s']:9.1f} "
+            f"{result['prompt_tokens_per_s']:13.1f} {result['rss_mib']:9.0f} {result['accuracy']:9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
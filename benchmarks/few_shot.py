@@ -0,0 +1,103 @@
+"""
+Compares prompt sizes, speed and accuracy of the extraction with fewer worked examples.
+
+Each configuration extracts the same synthetic records with all the examples
+or with the k most similar ones per record, and reports the prompt tokens
+per record, the records per second and the field accuracy. The fast path is
+off, so every field of every record is generated by the model.
+
+Prompt tokens are counted with the tokenizer of --model when transformers
+is installed, and approximated by words and punctuation marks otherwise.
+With --stub (the default without outlines) accuracy and speed only cover
+the pipeline around the model.
+
+Usage:
+    python -m benchmarks.few_shot [--records N] [--model NAME] [--stub]
+"""
+import argparse
+import importlib.util
+import re
+import time
+
+from llm_data_mask import (
+    build_example_selector,
+    extract_driver_details_batch,
+    normalize_text,
+    use_stub_model,
+)
+from llm_data_mask.core import build_extraction_prompt
+from llm_data_mask.registry import DEFAULT_MODEL_NAME
+from llm_data_mask.synthetic import field_accuracy, generate_records
+
+_APPROXIMATE_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# None embeds every example
+FEW_SHOT_SIZES = (None, 2, 1, 0)
+
+
+def _token_counter(model_name):
+    """
+    Returns a function counting the tokens of a text, and whether it is exact.
+    """
+    if importlib.util.find_spec("transformers") is None:
+        return lambda text: len(_APPROXIMATE_TOKEN.findall(text)), False
+
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    return lambda text: len(tokenizer(text).input_ids), True
+
+
+def _prompt_tokens(texts, example_selector, count_tokens):
+    """
+    Counts the tokens of the prompts extracting every field of the records.
+    """
+    total = 0
+    for text in texts:
+        examples = example_selector.select(text) if example_selector is not None else None
+        total += count_tokens(build_extraction_prompt(text, examples=examples))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the few-shot example selection")
+    parser.add_argument("--records", type=int, default=200, help="Synthetic records")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic records")
+    parser.add_argument("--batch-size", type=int, default=8, help="Records generated together")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME, help="Model to extract with")
+    parser.add_argument("--stub", action="store_true", help="Use the stub model instead of real weights")
+    args = parser.parse_args()
+
+    if args.stub or importlib.util.find_spec("outlines") is None:
+        use_stub_model()
+
+    records = generate_records(args.records, seed=args.seed, trailing_sentences=(0, 3))
+    texts = [normalize_text(record["text"]).text for record in records]
+    count_tokens, exact = _token_counter(args.model)
+
+    print(f"{'examples':<10} {'tokens/record':>14} {'records/s':>10} {'accuracy':>9}")
+    for k in FEW_SHOT_SIZES:
+        example_selector = build_example_selector(k) if k is not None else None
+        tokens = _prompt_tokens(texts, example_selector, count_tokens)
+
+        start = time.perf_counter()
+        mappings = extract_driver_details_batch(
+            texts,
+            batch_size=args.batch_size,
+            model_name=args.model,
+            fast_path=False,
+            normalized=True,
+            example_selector=example_selector,
+        )
+        elapsed = time.perf_counter() - start
+
+        accuracy = field_accuracy(records, mappings)["overall"]
+        label = "all" if k is None else f"top {k}"
+        print(f"{label:<10} {tokens / len(texts):14.1f} {len(texts) / elapsed:10.1f} {accuracy:9.3f}")
+
+    if not exact:
+        print("transformers is not installed, token counts are approximate")
+
+
+if __name__ == "__main__":
+    main()
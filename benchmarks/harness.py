@@ -0,0 +1,96 @@
+"""
+Measurement helpers shared by the benchmarks.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+
+
+def percentile(values, fraction):
+    """
+    Returns the value below which the given fraction of values fall.
+    """
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(fn, inputs, warmup=3, memory_items=50):
+    """
+    Times fn over every input and measures its peak memory.
+
+    Memory is traced in a separate pass over the first inputs, so the
+    tracing overhead does not distort the latencies.
+
+    Args:
+        fn (callable): Function called with each input
+        inputs (list): Inputs of the benchmark
+        warmup (int): Number of untimed calls made first
+        memory_items (int): Number of inputs used to measure peak memory
+
+    Returns:
+        dict: items, throughput (items/s), p50/p99/mean latency (ms) and peak memory (KiB)
+    """
+    for item in inputs[:warmup]:
+        fn(item)
+
+    latencies = []
+    start = time.perf_counter()
+    for item in inputs:
+        item_start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - item_start)
+    total = time.perf_counter() - start
+
+    tracemalloc.start()
+    for item in inputs[:memory_items]:
+        fn(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "items": len(inputs),
+        "throughput": len(inputs) / total if total else float("inf"),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+
+def load_baseline(path):
+    """
+    Loads stored benchmark results, or an empty dict if there are none.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    """
+    Stores benchmark results to compare later runs against.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def format_report(results, baseline):
+    """
+    Formats results as a table, with the throughput change against the baseline.
+    """
+    header = f"{'benchmark':<32} {'items/s':>12} {'p50 ms':>9} {'p99 ms':>9} {'peak KiB':>10} {'vs base':>8}"
+    lines = [header, "-" * len(header)]
+    for name, result in results.items():
+        change = ""
+        if name in baseline:
+            change = f"{result['throughput'] / baseline[name]['throughput']:.2f}x"
+        lines.append(
+            f"{name:<32} {result['throughput']:>12.1f} {result['p50_ms']:>9.3f} "
+            f"{result['p99_ms']:>9.3f} {result['peak_kib']:>10.1f} {change:>8}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,87 @@
+"""
+Checks the start-up cost of importing the package against a budget.
+
+Each module is imported in a fresh interpreter, which reports the import
+time, its peak RSS and which heavy dependencies got loaded. The command
+exits with status 1 when a budget is exceeded, so it can guard against a
+top-level import of the model stack creeping back in.
+
+Usage:
+    python -m benchmarks.imports
+"""
+import json
+import subprocess
+import sys
+
+# Dependencies only the extraction with a real model needs
+HEAVY_MODULES = ("outlines", "torch", "transformers", "pydantic")
+
+# Budgets per imported module: import time (ms), peak RSS (MiB) and the heavy
+# dependencies it may load
+IMPORT_BUDGETS = {
+    "llm_data_mask": {"import_ms": 20, "rss_mib": 30, "allowed": ()},
+    "llm_data_mask.helpers": {"import_ms": 50, "rss_mib": 30, "allowed": ()},
+    "llm_data_mask.core": {"import_ms": 500, "rss_mib": 80, "allowed": ("pydantic",)},
+}
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss /= 1024
+print(json.dumps({{
+    "import_ms": elapsed * 1000,
+    "rss_mib": rss / 1024,
+    "loaded": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure_import(module):
+    """
+    Imports module in a fresh interpreter.
+
+    Returns:
+        dict: import_ms, rss_mib and the heavy modules loaded
+    """
+    probe = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def check_budget(result, budget):
+    """
+    Returns the ways result exceeds budget, an empty list if it fits.
+    """
+    failures = []
+    for key in ("import_ms", "rss_mib"):
+        if result[key] > budget[key]:
+            failures.append(f"{key} {result[key]:.1f} > {budget[key]}")
+    unexpected = sorted(set(result["loaded"]) - set(budget["allowed"]))
+    if unexpected:
+        failures.append(f"loads {', '.join(unexpected)}")
+    return failures
+
+
+def main():
+    failed = False
+    for module, budget in IMPORT_BUDGETS.items():
+        # Best of three, so a cold disk cache does not fail the check
+        results = [measure_import(module) for _ in range(3)]
+        result = min(results, key=lambda r: r["import_ms"])
+        failures = check_budget(result, budget)
+        failed = failed or bool(failures)
+
+        status = "FAIL " + "; ".join(failures) if failures else "ok"
+        print(f"{module:<24} {result['import_ms']:8.1f} ms {result['rss_mib']:7.1f} MiB  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
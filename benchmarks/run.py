@@ -0,0 +1,169 @@
+"""
+Runs the benchmark suite on synthetic records and compares it to the stored baseline.
+
+Usage:
+    python -m benchmarks.run [--records N] [--only NAME ...] [--save-baseline]
+"""
+import argparse
+import os
+import re
+import tempfile
+
+from llm_data_mask import (
+    align_value,
+    extract_driver_details_batch,
+    mask_pii,
+    normalize_text,
+    process_driver_text,
+    process_driver_texts,
+    replace_if_matches_ends,
+    unmask_pii,
+    use_stub_model,
+)
+from llm_data_mask.bulk import mask_column, unmask_column
+from llm_data_mask.helpers import fix_comma_spacing_regex, remove_extra_spaces_regex
+from llm_data_mask.synthetic import PETITION_SENTENCES, generate_records
+from llm_data_mask.vault import PIIVault
+
+from .harness import format_report, load_baseline, measure, save_baseline
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def _legacy_preprocess(text):
+    # The three separate passes normalize_text replaces
+    text = remove_extra_spaces_regex(text)
+    text = fix_comma_spacing_regex(text)
+    return re.sub(r"(\s\d\d)\.", r"\1", text)
+
+
+def _aligned_mapping(mapping, text):
+    # Preprocessing can change the ground truth formatting (e.g. the CEP grouping)
+    aligned = {}
+    for field, value in mapping.items():
+        span, _ = align_value(value, text)
+        aligned[field] = text[span[0]:span[1]] if span else value
+    return aligned
+
+
+def _long_document(records, size):
+    # A petition of about `size` characters with the qualification paragraph in the middle
+    filler = " ".join(PETITION_SENTENCES)
+    padding = filler * (size // (2 * len(filler)) + 1)
+    return padding[: size // 2] + " " + records[0]["text"] + " " + padding[: size // 2]
+
+
+def build_benchmarks(records, vault):
+    """
+    Returns the benchmarks as name -> (function, inputs).
+
+    Args:
+        records (list): Synthetic records
+        vault (PIIVault): Empty vault filled for the vault benchmarks
+    """
+    normalized = [normalize_text(record["text"]).text for record in records]
+    masking_inputs = [
+        (text, _aligned_mapping(record["mapping"], text))
+        for text, record in zip(normalized, records)
+    ]
+    masked = [(mask_pii(text, mapping), mapping) for text, mapping in masking_inputs]
+
+    long_document = _long_document(records, 50_000)
+    # A CPF written without punctuation, so only the fuzzy matcher finds it
+    fuzzy_value = records[0]["mapping"]["CPF"].replace(".", "").replace("-", "")
+    fuzzy_inputs = [(long_document, fuzzy_value)] * 20
+
+    texts = [record["text"] for record in records]
+    batches = [texts[start:start + 8] for start in range(0, len(texts), 8)]
+
+    # Records that each leave a field to the model, so generation,
+    # retries and batching run on the stub as well
+    unresolved_records = generate_records(len(records), seed=1, trailing_sentences=(0, 3), unresolved=1.0)
+    unresolved_texts = [record["text"] for record in unresolved_records]
+    unresolved_batches = [unresolved_texts[start:start + 8] for start in range(0, len(unresolved_texts), 8)]
+
+    # Columns of 1000 rows, masked or unmasked row by row or in bulk
+    rows = 1000
+    columns = [
+        (
+            [masking_inputs[(start + i) % len(records)][0] for i in range(rows)],
+            [masking_inputs[(start + i) % len(records)][1] for i in range(rows)],
+        )
+        for start in range(0, rows * 5, rows)
+    ]
+    masked_columns = [(mask_column(column, mappings), mappings) for column, mappings in columns]
+
+    # A vault holding the mappings of every column, unmasked by id range
+    vault_columns = []
+    for column, mappings in columns:
+        start = len(vault)
+        vault_columns.append((start, [vault.mask(text, mapping)[1] for text, mapping in zip(column, mappings)]))
+    vault.flush()
+
+    return {
+        "mask_pii": (lambda item: mask_pii(*item), masking_inputs),
+        "unmask_pii": (lambda item: unmask_pii(*item), masked),
+        "replace_if_matches_ends_50k": (
+            lambda item: replace_if_matches_ends(item[0], item[1], "[CPF]"),
+            fuzzy_inputs,
+        ),
+        "mask_pii_rows_1k": (
+            lambda item: [mask_pii(text, mapping) for text, mapping in zip(*item)],
+            columns,
+        ),
+        "mask_column_1k": (lambda item: mask_column(*item), columns),
+        "unmask_pii_rows_1k": (
+            lambda item: [unmask_pii(text, mapping) for text, mapping in zip(*item)],
+            masked_columns,
+        ),
+        "unmask_column_1k": (lambda item: unmask_column(*item), masked_columns),
+        "vault_unmask_range_1k": (lambda item: vault.unmask_range(*item), vault_columns),
+        "preprocess_legacy": (_legacy_preprocess, texts),
+        "preprocess_normalize_text": (normalize_text, texts),
+        "process_driver_text_stub": (process_driver_text, texts),
+        "process_driver_texts_stub_batch8": (process_driver_texts, batches),
+        "process_driver_texts_stub_unresolved_batch8": (process_driver_texts, unresolved_batches),
+        "extract_driver_details_stub_no_fast_path_batch8": (
+            lambda batch: extract_driver_details_batch(batch, fast_path=False),
+            batches,
+        ),
+        "process_driver_text_stub_long_windowed": (
+            lambda text: process_driver_text(text, window_size=2000),
+            [_long_document(records[index:], 20_000) for index in range(20)],
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the llm_data_mask benchmarks")
+    parser.add_argument("--records", type=int, default=500, help="Synthetic records per benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic records")
+    parser.add_argument("--only", nargs="*", default=None, help="Benchmarks to run")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    args = parser.parse_args()
+
+    # The end-to-end benchmarks run on the deterministic stub model
+    use_stub_model()
+
+    records = generate_records(args.records, seed=args.seed, trailing_sentences=(0, 3))
+    with tempfile.TemporaryDirectory() as scratch_dir, PIIVault(os.path.join(scratch_dir, "vault")) as vault:
+        benchmarks = build_benchmarks(records, vault)
+
+        results = {}
+        for name, (fn, inputs) in benchmarks.items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = measure(fn, inputs)
+
+    baseline = load_baseline(args.baseline)
+    print(format_report(results, baseline))
+
+    if args.save_baseline:
+        baseline.update(results)
+        save_baseline(args.baseline, baseline)
+        print(f"Baseline saved to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Load test of the masking server with concurrent clients on the stub model.
+
+A MaskingServer is started in-process on a free port, and each client
+thread posts synthetic records to /process one at a time. The report gives
+the request latencies, the throughput, the mean micro-batch size formed by
+the scheduler and the number of requests rejected with 503.
+
+Usage:
+    python -m benchmarks.server [--records N] [--clients N] [--max-wait-ms MS]
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from llm_data_mask import use_stub_model
+from llm_data_mask.metrics import default_metrics, enable_metrics
+from llm_data_mask.server import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_QUEUE, MaskingServer
+from llm_data_mask.synthetic import generate_records
+
+from .harness import percentile
+
+
+def post(url, body):
+    """
+    Posts a JSON body and returns (status, decoded response), with the name
+    of the error as status when the connection fails.
+    """
+    request = urllib.request.Request(
+        url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+    except OSError as error:
+        return type(error).__name__, None
+
+
+def run_clients(url, texts, clients):
+    """
+    Sends every text from `clients` concurrent threads.
+
+    Returns:
+        tuple: (latencies of the successful requests in seconds, status counts)
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def client(shard):
+        for text in shard:
+            start = time.perf_counter()
+            status, _ = post(url, {"text": text})
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(texts[index::clients],)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the masking server")
+    parser.add_argument("--records", type=int, default=500, help="Requests sent in total")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client threads")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE, help="Largest micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=10, help="Batching deadline of the scheduler")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE, help="Queue depth limit")
+    args = parser.parse_args()
+
+    use_stub_model()
+    enable_metrics()
+
+    texts = [record["text"] for record in generate_records(args.records, trailing_sentences=(0, 3))]
+    with MaskingServer(
+        ("127.0.0.1", 0),
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+        max_queue=args.max_queue,
+    ) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/process"
+
+        start = time.perf_counter()
+        latencies, statuses = run_clients(url, texts, args.clients)
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+
+    counters = default_metrics.snapshot()["counters"]
+    batches = counters.get("server_batches", 0)
+    print(f"requests/s     {len(texts) / elapsed:10.1f}")
+    if latencies:
+        print(f"p50 ms         {percentile(latencies, 0.50) * 1000:10.2f}")
+        print(f"p99 ms         {percentile(latencies, 0.99) * 1000:10.2f}")
+    print(f"mean batch     {counters.get('server_batched_requests', 0) / max(batches, 1):10.2f}")
+    print(f"rejected (503) {statuses.get(503, 0):10d}")
+    print(f"statuses       {statuses}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,194 @@
 """
 LLM Data Mask - A utility for masking PII in text using LLMs
+
+Submodules are imported on first attribute access, so code that only masks
+and unmasks text never loads pydantic, outlines, transformers or torch.
 """
+import importlib
+
+# Module of each public name, imported lazily by __getattr__
+_LAZY_ATTRIBUTES = {}
+
+
+def _expose(module, *names):
+    for name in names:
+        _LAZY_ATTRIBUTES[name] = module
+
+
+# Expose main functions from core.py
+_expose(
+    "core",
+    "DriverDetails",
+    "extract_driver_details",
+    "extract_driver_details_batch",
+    "extract_driver_details_long",
+    "extract_entities",
+    "extract_entities_batch",
+    "process_document_entities",
+    "DocumentEntities",
+    "PersonDetails",
+    "process_driver_text",
+    "process_driver_texts",
+    "check_mapping",
+    "build_example_selector",
+    "warm_up",
+)
+
+# Expose the few-shot example selection
+_expose("few_shot", "TfidfExampleSelector")
+
+# Expose the columnar bulk masking
+_expose("bulk", "mask_column", "unmask_column")
+
+# Expose the known-entity index
+_expose("entity_index", "EntityIndex")
+
+# Expose the PII vault
+_expose("vault", "PIIVault")
+
+# Expose the long-document windowing
+_expose("chunking", "select_windows", "merge_window_mappings")
+
+# Expose the multi-pattern masking engine
+_expose("matcher", "PIIMatcher", "get_matcher")
+
+# Expose the single-pass preprocessing
+_expose("normalization", "NormalizedText", "normalize_text")
+
+# Expose the deterministic fast path
+_expose("patterns", "extract_fast_fields", "is_valid_cpf", "is_valid_phonenumber")
 
-# Import and expose main functions from core.py
-from .core import (
-    DriverDetails,
-    extract_driver_details,
-    process_driver_text,
-    check_mapping
+# Expose the deterministic value alignment
+_expose("alignment", "align_value")
+
+# Expose the extraction result cache
+_expose("cache", "ResultCache")
+
+# Expose the multi-process runner and the stub model
+_expose("parallel", "DriverTextPool", "process_driver_texts_parallel")
+_expose("stub", "use_stub_model")
+
+# Expose the HTTP service
+_expose("server", "MaskingServer", "MicroBatcher", "serve")
+
+# Expose the prompt prefix key/value cache
+_expose("prefix_cache", "PrefixCache", "default_prefix_cache", "count_tokens", "count_generated_tokens")
+
+# Expose the compiled guide cache
+_expose("guide_cache", "GuideCache", "default_guide_cache")
+
+# Expose the metrics hooks
+_expose("metrics", "MetricsRegistry", "default_metrics", "enable_metrics")
+
+# Expose the CPU inference profiles
+_expose("cpu_profile", "CPUProfile", "CPU_PROFILES", "use_cpu_profile")
+
+# Expose the model registry
+_expose(
+    "registry",
+    "DEFAULT_MODEL_NAME",
+    "ModelRegistry",
+    "get_generator",
+    "get_model",
+    "preload",
 )
 
-# Import and expose masking functions from helpers.py
-from .helpers import (
-    mask_pii,
-    unmask_pii,
-    remove_extra_spaces_regex,
-    fix_comma_spacing_regex,
-    replace_if_matches_ends,
+# Expose masking functions from helpers.py
+_expose(
+    "helpers",
+    "mask_pii",
+    "mask_pii_with_spans",
+    "entities_to_pii_dict",
+    "unmask_pii",
+    "remove_extra_spaces_regex",
+    "fix_comma_spacing_regex",
+    "replace_if_matches_ends",
+    "find_fuzzy_spans",
 )
 
+
+def __getattr__(name):
+    # Submodules used to be imported eagerly, keep them reachable as attributes
+    if name in _LAZY_ATTRIBUTES.values():
+        return importlib.import_module(f".{name}", __name__)
+
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
 # Define the public API
 __all__ = [
     'DriverDetails',
     'extract_driver_details',
+    'extract_driver_details_batch',
+    'extract_driver_details_long',
+    'extract_entities',
+    'extract_entities_batch',
+    'process_document_entities',
+    'DocumentEntities',
+    'PersonDetails',
     'process_driver_text',
+    'process_driver_texts',
     'mask_pii',
+    'mask_pii_with_spans',
+    'entities_to_pii_dict',
+    'select_windows',
+    'merge_window_mappings',
+    'PIIMatcher',
+    'get_matcher',
     'unmask_pii',
+    'mask_column',
+    'unmask_column',
+    'PIIVault',
+    'EntityIndex',
     'check_mapping',
+    'build_example_selector',
+    'TfidfExampleSelector',
+    'warm_up',
+    'NormalizedText',
+    'normalize_text',
+    'extract_fast_fields',
+    'is_valid_cpf',
+    'is_valid_phonenumber',
+    'align_value',
+    'ResultCache',
+    'DriverTextPool',
+    'process_driver_texts_parallel',
+    'use_stub_model',
+    'MaskingServer',
+    'MicroBatcher',
+    'serve',
+    'PrefixCache',
+    'default_prefix_cache',
+    'count_tokens',
+    'count_generated_tokens',
+    'GuideCache',
+    'default_guide_cache',
+    'MetricsRegistry',
+    'default_metrics',
+    'enable_metrics',
+    'CPUProfile',
+    'CPU_PROFILES',
+    'use_cpu_profile',
+    'DEFAULT_MODEL_NAME',
+    'ModelRegistry',
+    'get_generator',
+    'get_model',
+    'preload',
     'remove_extra_spaces_regex',
     'fix_comma_spacing_regex',
     'replace_if_matches_ends',
+    'find_fuzzy_spans',
 ]
 
 # Package metadata
-__version__ = '0.1.0'
\ No newline at end of file
+__version__ = '0.1.0'
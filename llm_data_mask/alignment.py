@@ -0,0 +1,114 @@
+"""
+Deterministic alignment of extracted values with the text they came from.
+
+Values produced by the model sometimes differ from the text in spacing,
+punctuation, capitalization or digit grouping. These functions recover the
+exact span of the text the value refers to, without calling the model.
+"""
+from .helpers import find_fuzzy_spans
+
+# Alignment statuses, from the most to the least strict
+EXACT = "exact"
+NORMALIZED = "normalized"
+DIGITS = "digits"
+FUZZY = "fuzzy"
+
+# Minimum score for a fuzzy span to be accepted as a repair
+FUZZY_MIN_SCORE = 0.85
+
+
+def _project(text, keep):
+    """
+    Keeps the characters of text accepted by keep, with their original offsets.
+
+    Returns:
+        tuple: (projected_text, offsets) where offsets[i] is the index in text
+               of projected_text[i]
+    """
+    characters = []
+    offsets = []
+    for index, char in enumerate(text):
+        if keep(char):
+            characters.append(char.casefold())
+            offsets.append(index)
+    return "".join(characters), offsets
+
+
+def _find_projected(value, text, keep):
+    """
+    Finds value in text comparing only the characters accepted by keep.
+
+    Returns:
+        tuple: (start, end) span of text, or None
+    """
+    projected_value, _ = _project(value, keep)
+    if not projected_value:
+        return None
+
+    projected_text, offsets = _project(text, keep)
+    position = projected_text.find(projected_value)
+    if position == -1:
+        return None
+    start = offsets[position]
+    end = offsets[position + len(projected_value) - 1] + 1
+
+    # Extend the span over the leading and trailing punctuation of the value,
+    # such as the parentheses of "(61) 9 9133-5265", but not over whitespace
+    leading = value[:len(value) - len(value.lstrip(_skipped_chars(value, keep)))].rstrip()
+    while leading and start > 0 and text[start - 1] == leading[-1]:
+        leading = leading[:-1]
+        start -= 1
+    trailing = value[len(value.rstrip(_skipped_chars(value, keep))):].lstrip()
+    while trailing and end < len(text) and text[end] == trailing[0]:
+        trailing = trailing[1:]
+        end += 1
+
+    return start, end
+
+
+def _skipped_chars(value, keep):
+    """
+    Returns the characters of value that are ignored by keep.
+    """
+    return "".join({char for char in value if not keep(char)})
+
+
+def align_value(value, text):
+    """
+    Locates the span of text that a possibly misformatted value refers to.
+
+    Tries, in order, an exact match, a match ignoring whitespace, punctuation
+    and case, a match on digits only (for values that are mostly digits) and
+    a fuzzy span match.
+
+    Args:
+        value (str): The extracted value
+        text (str): The text the value was extracted from
+
+    Returns:
+        tuple: ((start, end), status) with the span in text and how it was
+               found, or (None, None) if the value could not be aligned
+    """
+    if not value:
+        return None, None
+
+    start = text.find(value)
+    if start != -1:
+        return (start, start + len(value)), EXACT
+
+    span = _find_projected(value, text, str.isalnum)
+    if span is not None:
+        return span, NORMALIZED
+
+    digits = sum(char.isdigit() for char in value)
+    if digits and digits * 2 >= sum(char.isalnum() for char in value):
+        span = _find_projected(value, text, str.isdigit)
+        if span is not None:
+            return span, DIGITS
+
+    spans = find_fuzzy_spans(text, value, min_score=FUZZY_MIN_SCORE)
+    if spans:
+        start, end, _ = max(spans, key=lambda span: span[2])
+        return (start, end), FUZZY
+
+    return None, None
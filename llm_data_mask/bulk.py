@@ -0,0 +1,171 @@
+"""
+Column-at-a-time masking and unmasking.
+
+These functions take a whole column (a list, a pandas Series or a pyarrow
+array) and return a new column of the same kind. Each row goes through
+mask_pii or unmask_pii, whose compiled matchers and mask templates are
+already cached per PII dictionary, so the column functions don't make a row
+faster. They decode each distinct JSON mapping of a chunk once, and spread
+columns of PARALLEL_MIN_ROWS rows or more over worker processes.
+"""
+import json
+import multiprocessing
+
+from .helpers import mask_pii, unmask_pii
+
+DEFAULT_CHUNK_SIZE = 10_000
+# Below this many rows a process pool costs more than it saves
+PARALLEL_MIN_ROWS = 100_000
+
+
+def _to_list(column):
+    """
+    Converts a list, pandas Series or pyarrow array to a list of Python objects.
+    """
+    if hasattr(column, "to_pylist"):
+        return column.to_pylist()
+    if hasattr(column, "tolist"):
+        return column.tolist()
+    return list(column)
+
+
+def _like(column, values):
+    """
+    Wraps values in the same kind of column as column.
+    """
+    module = type(column).__module__
+    if module.startswith("pandas"):
+        import pandas
+
+        return pandas.Series(values, index=column.index, name=column.name, dtype=object)
+    if module.startswith("pyarrow"):
+        import pyarrow
+
+        return pyarrow.array(values, type=pyarrow.string())
+    return values
+
+
+def _parsed_mappings(task):
+    """
+    Returns the (text, pii_dict) rows of a chunk, decoding each distinct JSON mapping once.
+    """
+    texts, mappings, pii_dict, _ = task
+    if pii_dict is not None:
+        return [(text, pii_dict) for text in texts]
+
+    # Mapping columns read from Parquet often hold JSON strings
+    decoded = {}
+    rows = []
+    for text, mapping in zip(texts, mappings):
+        if isinstance(mapping, str):
+            if mapping not in decoded:
+                decoded[mapping] = json.loads(mapping)
+            mapping = decoded[mapping]
+        rows.append((text, mapping or {}))
+    return rows
+
+
+def _mask_chunk(task):
+    mask_format = task[3]
+    return [
+        None if text is None else mask_pii(text, pii_dict, mask_format)
+        for text, pii_dict in _parsed_mappings(task)
+    ]
+
+
+def _unmask_chunk(task):
+    mask_format = task[3]
+    return [
+        None if text is None else unmask_pii(text, pii_dict, mask_format)
+        for text, pii_dict in _parsed_mappings(task)
+    ]
+
+
+def _run_chunks(function, texts, mappings, pii_dict, mask_format, chunk_size, workers):
+    """
+    Applies function to chunks of rows, in worker processes for large inputs.
+    """
+    if (mappings is None) == (pii_dict is None):
+        raise ValueError("Pass exactly one of mappings or pii_dict")
+
+    texts = _to_list(texts)
+    if mappings is not None:
+        mappings = _to_list(mappings)
+        if len(mappings) != len(texts):
+            raise ValueError("texts and mappings must have the same length")
+
+    tasks = (
+        (
+            texts[start:start + chunk_size],
+            mappings[start:start + chunk_size] if mappings is not None else None,
+            pii_dict,
+            mask_format,
+        )
+        for start in range(0, len(texts), chunk_size)
+    )
+
+    results = []
+    if workers and workers > 1 and len(texts) >= PARALLEL_MIN_ROWS:
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(workers) as pool:
+            for chunk in pool.imap(function, tasks):
+                results.extend(chunk)
+    else:
+        for task in tasks:
+            results.extend(function(task))
+    return results
+
+
+def mask_column(
+    texts,
+    mappings=None,
+    pii_dict=None,
+    mask_format="[{pii_type}]",
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    workers=None,
+):
+    """
+    Masks a column of texts, as mask_pii does for each row.
+
+    Pass either a column of mappings, one per row, or a single pii_dict
+    shared by every row.
+
+    Args:
+        texts: List, pandas Series or pyarrow array of texts
+        mappings: Column of PII dictionaries (or their JSON), one per row
+        pii_dict (dict): PII dictionary shared by every row
+        mask_format (str): Format string for the mask, with {pii_type} as a placeholder
+        chunk_size (int): Number of rows processed per chunk
+        workers (int): Worker processes used for inputs of PARALLEL_MIN_ROWS rows or more
+
+    Returns:
+        The masked texts, in the same kind of column as texts
+    """
+    results = _run_chunks(_mask_chunk, texts, mappings, pii_dict, mask_format, chunk_size, workers)
+    return _like(texts, results)
+
+
+def unmask_column(
+    masked_texts,
+    mappings=None,
+    pii_dict=None,
+    mask_format="[{pii_type}]",
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    workers=None,
+):
+    """
+    Restores a column of masked texts, as unmask_pii does for each row.
+
+    Args:
+        masked_texts: List, pandas Series or pyarrow array of masked texts
+        mappings: Column of PII dictionaries (or their JSON), one per row
+        pii_dict (dict): PII dictionary shared by every row
+        mask_format (str): The format string that was used for masking
+        chunk_size (int): Number of rows processed per chunk
+        workers (int): Worker processes used for inputs of PARALLEL_MIN_ROWS rows or more
+
+    Returns:
+        The restored texts, in the same kind of column as masked_texts
+    """
+    results = _run_chunks(_unmask_chunk, masked_texts, mappings, pii_dict, mask_format, chunk_size, workers)
+    return _like(masked_texts, results)
@@ -0,0 +1,153 @@
+"""
+Persistent, content-addressed cache of extraction results.
+
+Results are stored in SQLite, keyed by a hash of the normalized text and of
+a namespace describing how the result was produced (model, schema, prompt).
+Changing any of those changes the namespace, so stale results are never
+returned and are eventually evicted.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+def make_namespace(*parts):
+    """
+    Builds a namespace hash from everything a cached result depends on.
+
+    Args:
+        *parts: Strings such as the model name, schema and prompt fingerprint
+
+    Returns:
+        str: Hex digest identifying the namespace
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite cache of extracted mappings with least-recently-used eviction.
+
+    Args:
+        path (str): Path of the SQLite database, ":memory:" for a private cache
+        max_entries (int): Maximum number of cached results
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                mapping TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(text, namespace):
+        """
+        Returns the cache key of a normalized text in a namespace.
+        """
+        return make_namespace(namespace, text)
+
+    def get(self, text, namespace):
+        """
+        Returns the cached mapping for text, or None on a miss.
+
+        Args:
+            text (str): The normalized text
+            namespace (str): Namespace built with make_namespace
+
+        Returns:
+            dict: The cached mapping, or None
+        """
+        key = self.make_key(text, namespace)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT mapping FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._connection.execute(
+                "UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._connection.commit()
+        return json.loads(row[0])
+
+    def put(self, text, namespace, mapping):
+        """
+        Stores the mapping for text, evicting the least recently used results if full.
+
+        Args:
+            text (str): The normalized text
+            namespace (str): Namespace built with make_namespace
+            mapping (dict): The extracted mapping
+        """
+        key = self.make_key(text, namespace)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results (key, mapping, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(mapping, ensure_ascii=False), time.time()),
+            )
+            (count,) = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()
+            if count > self.max_entries:
+                # Evict a tenth of the cache at once so puts stay cheap
+                excess = count - self.max_entries + self.max_entries // 10
+                self._connection.execute(
+                    """
+                    DELETE FROM results WHERE key IN (
+                        SELECT key FROM results ORDER BY last_used LIMIT ?
+                    )
+                    """,
+                    (excess,),
+                )
+            self._connection.commit()
+
+    def stats(self):
+        """
+        Returns the hit/miss counters and the number of cached results.
+        """
+        with self._lock:
+            (entries,) = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def clear(self):
+        """
+        Removes every cached result.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM results")
+            self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,186 @@
+"""
+Windowed extraction for long documents.
+
+Full appeals are pages long and the qualification paragraph can be anywhere.
+Instead of prompting with the whole document, the text is split into
+overlapping windows, the windows are scored by the density of PII patterns
+and keywords, and only the best candidates are sent to the model. The
+per-window results are then merged into one mapping with global offsets.
+"""
+import re
+from bisect import bisect_left
+from itertools import accumulate
+
+from .alignment import align_value
+from .patterns import CEP_PATTERN, CPF_PATTERN, NAME_PATTERN, PHONE_PATTERN, RG_PATTERN
+
+DEFAULT_WINDOW_SIZE = 2000
+# Larger than a qualification paragraph, so one window holds it whole
+DEFAULT_WINDOW_OVERLAP = 600
+DEFAULT_MAX_WINDOWS = 2
+# Minimum weighted pattern hits per 1000 characters of a candidate window
+MIN_WINDOW_SCORE = 2.0
+# Fields of a merged mapping, in DriverDetails order
+MAPPING_FIELDS = ("name", "RG", "CPF", "CEP", "phonenumber")
+
+KEYWORD_PATTERN = re.compile(
+    r"\b(?:CPF|RG|CEP|celular|telefone|brasileir[oa]|portador[a]?|residente|domiciliad[oa])\b",
+    re.IGNORECASE,
+)
+
+# Patterns signalling PII, with their weight in the window score
+SIGNAL_PATTERNS = (
+    (CPF_PATTERN, 3),
+    (CEP_PATTERN, 3),
+    (RG_PATTERN, 3),
+    (NAME_PATTERN, 3),
+    (PHONE_PATTERN, 2),
+    (KEYWORD_PATTERN, 1),
+)
+
+
+def split_windows(text, window_size=DEFAULT_WINDOW_SIZE, overlap=DEFAULT_WINDOW_OVERLAP):
+    """
+    Splits text into overlapping windows, cutting at spaces where possible.
+
+    Args:
+        text (str): The text to split
+        window_size (int): Maximum number of characters per window
+        overlap (int): Number of characters shared by consecutive windows
+
+    Returns:
+        list: (start, end) offsets of the windows, covering the whole text
+    """
+    if not 0 <= overlap < window_size:
+        raise ValueError("overlap must be smaller than window_size")
+
+    windows = []
+    start = 0
+    while True:
+        end = min(start + window_size, len(text))
+        if end < len(text):
+            cut = text.rfind(" ", start + window_size // 2, end)
+            if cut != -1:
+                end = cut
+        windows.append((start, end))
+        if end >= len(text):
+            return windows
+
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+
+
+def _signal_index(text):
+    """
+    Locates every PII signal of text once.
+
+    Returns:
+        tuple: (positions, cumulative_weights), both sorted by position
+    """
+    signals = sorted(
+        (match.start(), weight)
+        for pattern, weight in SIGNAL_PATTERNS
+        for match in pattern.finditer(text)
+    )
+    positions = [position for position, _ in signals]
+    return positions, [0] + list(accumulate(weight for _, weight in signals))
+
+
+def score_windows(text, windows):
+    """
+    Scores windows by their weighted PII signals per 1000 characters.
+
+    The text is scanned once, whatever the number and overlap of the windows.
+
+    Args:
+        text (str): The text the windows belong to
+        windows (list): (start, end) offsets of the windows
+
+    Returns:
+        list: The score of each window
+    """
+    positions, weights = _signal_index(text)
+    scores = []
+    for start, end in windows:
+        hits = weights[bisect_left(positions, end)] - weights[bisect_left(positions, start)]
+        scores.append(hits * 1000 / max(end - start, 1))
+    return scores
+
+
+def select_windows(
+    text,
+    window_size=DEFAULT_WINDOW_SIZE,
+    overlap=DEFAULT_WINDOW_OVERLAP,
+    max_windows=DEFAULT_MAX_WINDOWS,
+    min_score=MIN_WINDOW_SCORE,
+):
+    """
+    Picks the windows of text most likely to contain the driver details.
+
+    Args:
+        text (str): The preprocessed document
+        window_size (int): Maximum number of characters per window
+        overlap (int): Number of characters shared by consecutive windows
+        max_windows (int): Maximum number of windows kept
+        min_score (float): Minimum score of a kept window
+
+    Returns:
+        list: (start, end, score) of the kept windows, in document order. The
+              best window is always kept, even below min_score.
+    """
+    windows = split_windows(text, window_size, overlap)
+    scored = sorted(
+        ((score, start, end) for (start, end), score in zip(windows, score_windows(text, windows))),
+        key=lambda window: -window[0],
+    )
+    selected = [window for window in scored[:max_windows] if window[0] >= min_score] or scored[:1]
+    return sorted((start, end, score) for score, start, end in selected)
+
+
+def merge_window_mappings(text, windows, mappings, fields=MAPPING_FIELDS):
+    """
+    Merges the mappings extracted from windows of one document.
+
+    Each value is located in its window and converted to global offsets.
+    When windows disagree on a field, the value found by the most windows
+    wins, then the value of the highest scoring window. Fields no window
+    found are None.
+
+    Args:
+        text (str): The document the windows belong to
+        windows (list): (start, end, score) of the windows
+        mappings (list): The mapping extracted from each window
+        fields (tuple): Fields of the merged mapping, in order
+
+    Returns:
+        tuple: (mapping, spans) with the merged values as written in text and
+               the (start, end, field) global offsets of the located values
+    """
+    candidates = {}  # field -> {value: [windows found in, best score, span]}
+    for (start, end, score), window_mapping in zip(windows, mappings):
+        window_text = text[start:end]
+        for field, value in window_mapping.items():
+            if not isinstance(value, str) or not value:
+                continue
+            span, _ = align_value(value, window_text)
+            if span is not None:
+                span = (start + span[0], start + span[1])
+                value = text[span[0]:span[1]]
+
+            candidate = candidates.setdefault(field, {}).setdefault(value, [0, score, span])
+            candidate[0] += 1
+            if score > candidate[1]:
+                candidate[1] = score
+            if candidate[2] is None:
+                candidate[2] = span
+
+    mapping = dict.fromkeys(fields)
+    spans = []
+    for field, values in candidates.items():
+        value, (_, _, span) = max(values.items(), key=lambda item: (item[1][0], item[1][1]))
+        mapping[field] = value
+        if span is not None:
+            spans.append((span[0], span[1], field))
+
+    return mapping, sorted(spans)
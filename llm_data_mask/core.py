@@ -1,143 +1,296 @@
-import outlines
-import re
-from pydantic import BaseModel, Field
+import json
+from collections import deque
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Literal, Optional
 
+from pydantic import BaseModel, Field, create_model
+
+from .alignment import align_value
+from .cache import make_namespace
+from .chunking import (
+    DEFAULT_MAX_WINDOWS,
+    DEFAULT_WINDOW_OVERLAP,
+    DEFAULT_WINDOW_SIZE,
+    merge_window_mappings,
+    select_windows,
+)
+from .few_shot import TfidfExampleSelector
 from .helpers import (
+    entities_to_pii_dict,
     fix_comma_spacing_regex,
     mask_pii,
+    mask_pii_with_spans,
     remove_extra_spaces_regex,
 )
+from .matcher import apply_masks, get_matcher
+from .metrics import default_metrics, logger
+from .normalization import normalize_text
+from .patterns import (
+    extract_fast_fields,
+    is_valid_cep,
+    is_valid_cpf,
+    is_valid_phonenumber,
+)
+from .prefix_cache import count_generated_tokens, count_tokens, default_prefix_cache
+from .registry import DEFAULT_MODEL_NAME, get_generator, get_model, preload
 
 
 class DriverDetails(BaseModel):
     name: str = Field(pattern=r"([A-Z]+ ?)+", description="Name of the driver")
     RG: str = Field(pattern=r"[0-9.-]+", description="RG of the driver")
-    CPF: str = Field(pattern=r"[0-9.-]+", description="CPF of the driver")
-    CEP: str = Field(pattern=r"[0-9-]+", description="CEP of the driver")
-    phonenumber: str = Field(pattern=r"^[\d\-\(\)\s]+$", description="Phone number of the driver")
+    CPF: str = Field(pattern=r"\d{3}\.?\d{3}\.?\d{3}-?\d{2}", description="CPF of the driver")
+    CEP: str = Field(pattern=r"\d{2}\.?\d{3}-?\d{3}", description="CEP of the driver")
+    phonenumber: str = Field(
+        pattern=r"\(?[1-9]{2}\)? ?(9 ?)?\d{4}-? ?\d{4}",
+        description="Phone number of the driver",
+    )
 
 
 class EditedDriverDetails(BaseModel):
     edited_text: str
 
 
-def extract_driver_details(
-    driver_details_text,
-    max_recursion=5,
-    recursion_level=1,
-):
+# Roles a person can have in a document
+ENTITY_ROLES = ("driver", "owner", "attorney", "other")
+
+# Maximum number of people extracted from one document
+MAX_ENTITIES = 4
+
+
+class PersonDetails(BaseModel):
+    role: Literal[ENTITY_ROLES] = Field(description="Role of the person in the document")
+    name: str = Field(pattern=r"([A-Z]+ ?)+", description="Name of the person")
+    RG: Optional[str] = Field(default=None, pattern=r"[0-9.-]+", description="RG of the person")
+    CPF: Optional[str] = Field(
+        default=None, pattern=r"\d{3}\.?\d{3}\.?\d{3}-?\d{2}", description="CPF of the person"
+    )
+    CEP: Optional[str] = Field(
+        default=None, pattern=r"\d{2}\.?\d{3}-?\d{3}", description="CEP of the person"
+    )
+    phonenumber: Optional[str] = Field(
+        default=None,
+        pattern=r"\(?[1-9]{2}\)? ?(9 ?)?\d{4}-? ?\d{4}",
+        description="Phone number of the person",
+    )
+
+
+class DocumentEntities(BaseModel):
+    entities: list[PersonDetails] = Field(max_length=MAX_ENTITIES)
+
+
+# Field subsets compiled by warm_up besides the full schema: the fields the
+# fast path most often leaves to the model, and the validated fields that
+# are regenerated on their own when their check fails
+WARM_UP_FIELD_SUBSETS = (
+    ("name",),
+    ("RG",),
+    ("name", "RG"),
+    ("CPF",),
+    ("CEP",),
+    ("phonenumber",),
+)
+
+
+def warm_up(model_name=DEFAULT_MODEL_NAME, field_subsets=WARM_UP_FIELD_SUBSETS):
     """
-    Extract driver details from text using a language model.
-    Recursively re-extracts if a specific key contains a specific string.
+    Load the model and compile the extraction generators ahead of the first call.
+
+    Only the full schema and field_subsets are compiled, with their prompt
+    prefixes. Any other subset of fields left to the model still compiles
+    its generator on first use.
 
     Args:
-        driver_details_text (str): The text containing driver details
-        key_to_check (str): The specific key to check for the search string
-        search_string (str): String to search for in the specified key's value
-        max_recursion (int): Maximum number of recursive attempts
-        recursion_level (int): Current recursion level (internal use)
+        model_name (str): Name of the model to preload
+        field_subsets (tuple): Tuples of DriverDetails fields, in schema order, to compile as well
+    """
+    schemas = [DriverDetails, EditedDriverDetails]
+    schemas.extend(partial_driver_details_schema(fields) for fields in field_subsets)
+    preload([model_name], schemas)
+
+    model = get_model(model_name)
+    default_prefix_cache.preload(model, build_extraction_prompt_prefix())
+    for fields in field_subsets:
+        default_prefix_cache.preload(model, build_extraction_prompt_prefix(fields))
+
+
+# Bump when the processing around the prompt changes the extracted values
+PROMPT_VERSION = 2
+
+# Post-checks of the generated fields, failing fields are regenerated
+FIELD_VALIDATORS = {
+    "CPF": is_valid_cpf,
+    "CEP": is_valid_cep,
+    "phonenumber": is_valid_phonenumber,
+}
+
+# Worked examples embedded in the extraction prompt
+EXTRACTION_EXAMPLES = [
+    {
+        "input": "PAULO GIOVANI LEANDRO DIAS, brasileiro, comerciante, portador da cédula de identidade RG 324830130 SSP/DF, CPF n. 802.881.025-09, residente e domiciliado na Avenida Joaquim Coutinho, 201, Marabaixo, Macapá - AP, CEP 68906-491, celular (96) 98226-8422",
+        "output": {
+            "name": "PAULO GIOVANI LEANDRO DIAS",
+            "RG": "324830130 SSP/DF",
+            "CPF": "802.881.025-09",
+            "CEP": "68906-491",
+            "phonenumber": "(96) 98226-8422",
+        },
+    },
+    {
+        "input": "portadora do RG n.° 209668283 SSP/DF, LAURA SOPHIA JOSEFA BARBOSA, brasileira, celular (61) 9 9133-5265, consultora de vendas, CPF n. 709.506.304-46, residente e domiciliado na Av. Liberdade, Lotes 04/17, Quadra 204, Bloco M, Apt. 102, St Ivo, Santa Cecília-DF, CEP 76816-800",
+        "output": {
+            "name": "LAURA SOPHIA JOSEFA BARBOSA",
+            "RG": "209668283 SSP/DF",
+            "CPF": "709.506.304-46",
+            "CEP": "76816-800",
+            "phonenumber": "(61) 9 9133-5265",
+        },
+    },
+    {
+        "input": "GUSTAVO FELIPE ASSUNÇÃO, brasileiro, funcionário público, portador da cédula de identidade RG 251143922 SSP/CE, CPF n. 733.584.223-99, residente e domiciliado na Rua do Gelo, 453, Edson Queiroz, Fortaleza - CE, Brasil, CEP: 60812-180, celular: (85) 98236-2345",
+        "output": {
+            "name": "GUSTAVO FELIPE ASSUNÇÃO",
+            "RG": "251143922 SSP/CE",
+            "CPF": "733.584.223-99",
+            "CEP": "60812-180",
+            "phonenumber": "(85) 98236-2345",
+        },
+    },
+    {
+        "input": "EVELYN LÍVIA PEREIRA, brasileira, supervisora administrativo, portadora da cédula de identidade RG 356640061 SSP/SP, CPF n. 516.692.173-96, residente e domiciliado no Rua C, 706, Canindezinho, São Paulo - SP, Brasil, CEP: 60733-017, celular: (12) 99293-3582, vem respeitosamente à presença de Vossa Senhoria, através de seus procuradores (procuração anexa), interpor RECURSO À JARI - SUSPENSÃO DO DIREITO DE DIRIGIR",
+        "output": {
+            "name": "EVELYN LÍVIA PEREIRA",
+            "RG": "356640061 SSP/SP",
+            "CPF": "516.692.173-96",
+            "CEP": "60733-017",
+            "phonenumber": "(12) 99293-3582",
+        },
+    },
+    {
+        "input": "BRENO YURI EDSON VIANA, brasileiro, servidor público, portadora do RG n.° 362063278 SSP/DF, CPF n. 966.388.721-41, residente e domiciliado na Quadra SQN 314 Bloco F, 898, Asa Norte, Brasília - DF, Brasil, CEP 70767-060, celular (61) 98397-5024, vem respeitosamente à presença de Vossa Senhoria, através de seus procuradores (procuração anexa), apresentar RECURSO À JARI - SUSPENSÃO DO DIREITO DE DIRIGIR Com base no artigo 265 do Código de Trânsito Brasileiro, conforme notificação anexa, o que faz da seguinte forma:",
+        "output": {
+            "name": "BRENO YURI EDSON VIANA",
+            "RG": "362063278 SSP/DF",
+            "CPF": "966.388.721-41",
+            "CEP": "70767-060",
+            "phonenumber": "(61) 98397-5024",
+        },
+    },
+]
+
+
+def build_example_selector(k=2, **options):
+    """
+    Build a selector of the most relevant EXTRACTION_EXAMPLES for each record.
+
+    Args:
+        k (int): Number of examples embedded per record
+        **options: Other TfidfExampleSelector options, e.g. easy_min_similarity
 
     Returns:
-        dict: Extracted driver details
+        TfidfExampleSelector: The selector over the extraction examples
     """
-    # Check recursion depth to prevent infinite recursion
-    if recursion_level >= max_recursion:
-        print(f"Reached maximum recursion depth ({max_recursion})")
-        return {}
+    return TfidfExampleSelector([example["input"] for example in EXTRACTION_EXAMPLES], k, **options)
 
-    # Preprocess the text
-    driver_details_text = remove_extra_spaces_regex(driver_details_text)
-    driver_details_text = fix_comma_spacing_regex(driver_details_text)
-    driver_details_text = driver_details_text.strip()
 
-    # Initialize the model
-    model = outlines.models.transformers("Qwen/Qwen2.5-1.5B-Instruct")
-    # model = outlines.models.transformers("Qwen/Qwen2.5-0.5B-Instruct")
-    # model = outlines.models.transformers("Qwen/Qwen2.5-3B-Instruct")
-    # model = outlines.models.transformers("HuggingFaceTB/SmolLM2-1.7B-Instruct")
-    # model = outlines.models.transformers("meta-llama/Llama-3.2-3B-Instruct")
+@lru_cache(maxsize=None)
+def build_extraction_prompt_prefix(fields=None, examples=None):
+    """
+    Build the part of the extraction prompt shared by every record.
+
+    The prefix holds the instructions and worked examples, and ends right
+    before the record text so its key/value cache can be reused.
 
-    # Construct structured sequence generator
-    generator = outlines.generate.json(model, DriverDetails)
+    Args:
+        fields (tuple): DriverDetails fields to extract, all of them if None
+        examples (tuple): Indexes of the EXTRACTION_EXAMPLES to embed, all of them if None
 
-    # Create the prompt
-    prompt = f"""
-    Extract the details of the driver for the provided text.
+    Returns:
+        str: The shared prompt prefix
+    """
+    if fields is None:
+        fields = tuple(DriverDetails.model_fields)
+    if examples is None:
+        examples = range(len(EXTRACTION_EXAMPLES))
 
+    guidelines = ""
+    if "phonenumber" in fields:
+        guidelines = """
     Follow the guidelines below:
     - The phone number should be in the format (XX) XXXXX-XXXX.
+"""
 
-    
-    Example 1
+    worked_examples = ""
+    for number, index in enumerate(examples, start=1):
+        example = EXTRACTION_EXAMPLES[index]
+        output = "\n".join(f"    {field}: {example['output'][field]}" for field in fields)
+        worked_examples += f"""
+    Example {number}
     Input
-    PAULO GIOVANI LEANDRO DIAS, brasileiro, comerciante, portador da cédula de identidade RG 324830130 SSP/DF, CPF n. 802.881.025-09, residente e domiciliado na Avenida Joaquim Coutinho, 201, Marabaixo, Macapá - AP, CEP 68906-491, celular (96) 98226-8422
+    {example['input']}
 
     Output
-    name: PAULO GIOVANI LEANDRO DIAS
-    RG: 324830130 SSP/DF
-    CPF: 802.881.025-09
-    CEP: 68906-491
-    phonenumber: (96) 98226-8422
-
-    
-    Example 2
-    Input
-    portadora do RG n.° 209668283 SSP/DF, LAURA SOPHIA JOSEFA BARBOSA, brasileira, celular (61) 9 9133-5265, consultora de vendas, CPF n. 709.506.304-46, residente e domiciliado na Av. Liberdade, Lotes 04/17, Quadra 204, Bloco M, Apt. 102, St Ivo, Santa Cecília-DF, CEP 76816-800
+{output}
 
-    Output
-    name: LAURA SOPHIA JOSEFA BARBOSA
-    RG: 209668283 SSP/DF
-    CPF: 709.506.304-46
-    CEP: 76816-800
-    phonenumber: (61) 9 9133-5265
-
-    
-    Example 3
-    Input
-    GUSTAVO FELIPE ASSUNÇÃO, brasileiro, funcionário público, portador da cédula de identidade RG 251143922 SSP/CE, CPF n. 733.584.223-99, residente e domiciliado na Rua do Gelo, 453, Edson Queiroz, Fortaleza - CE, Brasil, CEP: 60812-180, celular: (85) 98236-2345
+"""
 
-    Output
-    name: GUSTAVO FELIPE ASSUNÇÃO
-    RG: 251143922 SSP/CE
-    CPF: 733.584.223-99
-    CEP: 60812-180
-    phonenumber: (85) 98236-2345
-
-    
-    Example 4
-    Input
-    EVELYN LÍVIA PEREIRA, brasileira, supervisora administrativo, portadora da cédula de identidade RG 356640061 SSP/SP, CPF n. 516.692.173-96, residente e domiciliado no Rua C, 706, Canindezinho, São Paulo - SP, Brasil, CEP: 60733-017, celular: (12) 99293-3582, vem respeitosamente à presença de Vossa Senhoria, através de seus procuradores (procuração anexa), interpor RECURSO À JARI - SUSPENSÃO DO DIREITO DE DIRIGIR
+    return f"""
+    Extract the details of the driver for the provided text.
+{guidelines}
+{worked_examples}
+    Your Input"""
 
-    Output
-    name: EVELYN LÍVIA PEREIRA
-    RG: 356640061 SSP/SP
-    CPF: 516.692.173-96
-    CEP: 60733-017
-    phonenumber: (12) 99293-3582
-    
-
-    Example 5
-    Input
-    BRENO YURI EDSON VIANA, brasileiro, servidor público, portadora do RG n.° 362063278 SSP/DF, CPF n. 966.388.721-41, residente e domiciliado na Quadra SQN 314 Bloco F, 898, Asa Norte, Brasília - DF, Brasil, CEP 70767-060, celular (61) 98397-5024, vem respeitosamente à presença de Vossa Senhoria, através de seus procuradores (procuração anexa), apresentar RECURSO À JARI - SUSPENSÃO DO DIREITO DE DIRIGIR Com base no artigo 265 do Código de Trânsito Brasileiro, conforme notificação anexa, o que faz da seguinte forma:
 
-    Output
-    name: BRENO YURI EDSON VIANA
-    RG: 362063278 SSP/DF
-    CPF: 966.388.721-41
-    CEP: 70767-060
-    phonenumber: (61) 98397-5024
-    
-
-    Your Input
+def build_extraction_prompt(driver_details_text, fields=None, examples=None):
+    """
+    Build the few-shot prompt used to extract driver details.
+
+    Args:
+        driver_details_text (str): The preprocessed text containing driver details
+        fields (list): DriverDetails fields to extract, all of them if None
+        examples (tuple): Indexes of the EXTRACTION_EXAMPLES to embed, all of them if None
+
+    Returns:
+        str: The prompt to send to the model
+    """
+    prefix = build_extraction_prompt_prefix(
+        tuple(fields) if fields is not None else None,
+        tuple(examples) if examples is not None else None,
+    )
+    return f"""{prefix}
     {driver_details_text}
 
     Your Output
     """
 
-    # Generate the mapping
-    mapping = generator(prompt)
 
-    # Convert to dictionary
+@lru_cache(maxsize=None)
+def partial_driver_details_schema(fields):
+    """
+    Build a schema holding only some of the DriverDetails fields.
+
+    The schema is cached per tuple of fields so the registry compiles each
+    generator only once.
+
+    Args:
+        fields (tuple): Names of the DriverDetails fields to keep
+
+    Returns:
+        type: A pydantic model with the selected fields
+    """
+    if fields == tuple(DriverDetails.model_fields):
+        return DriverDetails
+
+    definitions = {
+        field: (str, DriverDetails.model_fields[field]) for field in fields
+    }
+    return create_model("PartialDriverDetails", **definitions)
+
+
+def _postprocess_mapping(mapping):
+    """
+    Convert a generated DriverDetails into a dictionary with stripped values.
+    """
     result = mapping.model_dump()
 
     # Post-process the result
@@ -145,105 +298,971 @@ def extract_driver_details(
         # Remove unwanted characters from the keys
         result[key] = result[key].strip()
 
-    # Check if the specified key contains the search string
-    phonenumber_not_valid = (
-        "phonenumber" in result
-        and isinstance(result["phonenumber"], str)
-        and len(result["phonenumber"]) < 10
+    return result
+
+
+def _invalid_fields(result):
+    """
+    Return the fields of a result whose value fails its format check.
+    """
+    return tuple(
+        field
+        for field, is_valid in FIELD_VALIDATORS.items()
+        if field in result and not is_valid(result[field])
     )
 
-    if phonenumber_not_valid:
-        print(
-            f"phonenumber not valid. Retrying extraction (attempt {recursion_level + 1}/{max_recursion})..."
+
+def _missing_fields(fast_fields):
+    """
+    Return the DriverDetails fields the fast path did not resolve, in schema order.
+    """
+    return tuple(field for field in DriverDetails.model_fields if field not in fast_fields)
+
+
+def _merge_fields(fast_fields, generated_fields):
+    """
+    Combine fast path and generated fields into a dict in DriverDetails order.
+    """
+    return {
+        field: fast_fields[field] if field in fast_fields else generated_fields[field]
+        for field in DriverDetails.model_fields
+    }
+
+
+def extraction_cache_namespace(model_name=DEFAULT_MODEL_NAME, fast_path=True, example_selector=None):
+    """
+    Describe everything a cached extraction result depends on.
+
+    The prompt is fingerprinted from its template, so editing the examples or
+    guidelines invalidates cached results automatically. PROMPT_VERSION covers
+    changes to the pre- and post-processing around the prompt.
+
+    Args:
+        model_name (str): Name of the model used for extraction
+        fast_path (bool): Whether fields are resolved with patterns before the model
+        example_selector: Selector of the examples embedded per record, if any
+
+    Returns:
+        str: The cache namespace
+    """
+    parts = [
+        PROMPT_VERSION,
+        model_name,
+        json.dumps(DriverDetails.model_json_schema(), sort_keys=True),
+        build_extraction_prompt("{driver_details_text}"),
+        fast_path,
+    ]
+    # Results extracted with all the examples keep their namespace
+    if example_selector is not None:
+        parts.append(example_selector.describe())
+    return make_namespace(*parts)
+
+
+def _generate_fields(driver_details_texts, fields, model_name, example_selector=None):
+    """
+    Generate some of the DriverDetails fields for a batch of texts.
+
+    Args:
+        driver_details_texts (list): The preprocessed texts
+        fields (tuple): DriverDetails fields to generate
+        model_name (str): Name of the model used for extraction
+        example_selector: Selector of the examples embedded per text, all of them if None
+
+    Returns:
+        list: Generated fields, one dict per text
+    """
+    # Get the structured sequence generator, loaded once per process
+    with default_metrics.timer("generator_acquisition"):
+        generator = get_generator(partial_driver_details_schema(fields), model_name)
+        model = get_model(model_name)
+
+    # Texts embedding the same examples share a prompt prefix
+    groups = {}
+    if example_selector is None:
+        groups[None] = list(range(len(driver_details_texts)))
+    else:
+        with default_metrics.timer("example_selection"):
+            for index, text in enumerate(driver_details_texts):
+                groups.setdefault(example_selector.select(text), []).append(index)
+
+    prompts = [None] * len(driver_details_texts)
+    mappings = [None] * len(driver_details_texts)
+    generated_tokens = 0
+    for examples, indexes in groups.items():
+        # Create the prompts
+        group_prompts = [build_extraction_prompt(driver_details_texts[index], fields, examples) for index in indexes]
+
+        # Generate the mappings, reusing the encoded prompt prefix
+        prefix = build_extraction_prompt_prefix(fields, examples)
+        counting = count_generated_tokens(model) if default_metrics.enabled else nullcontext()
+        with default_metrics.timer("generation"), default_prefix_cache.reuse(model, prefix), counting as counter:
+            group_mappings = generator(group_prompts)
+        if counter is not None:
+            generated_tokens += counter.tokens
+
+        default_metrics.increment(
+            "few_shot_examples",
+            len(indexes) * (len(EXTRACTION_EXAMPLES) if examples is None else len(examples)),
         )
+        for index, prompt, mapping in zip(indexes, group_prompts, group_mappings):
+            prompts[index] = prompt
+            mappings[index] = mapping
+
+    default_metrics.increment("generated_prompts", len(prompts))
+    default_metrics.increment("generated_fields", len(fields) * len(prompts))
+    if default_metrics.enabled:
+        prompt_tokens = count_tokens(model, prompts)
+        if prompt_tokens is not None:
+            default_metrics.increment("prompt_tokens", prompt_tokens)
+            default_metrics.increment("generated_tokens", generated_tokens)
+
+    # Convert to dictionaries and post-process the results
+    return [_postprocess_mapping(mapping) for mapping in mappings]
+
+
+def extract_driver_details(
+    driver_details_text,
+    max_retries=1,
+    model_name=DEFAULT_MODEL_NAME,
+    fast_path=True,
+    normalized=False,
+    cache=None,
+    entity_index=None,
+    example_selector=None,
+):
+    """
+    Extract driver details from text using a language model.
+
+    Fields with rigid formats are first resolved with compiled patterns, and
+    the model only runs for the fields that could not be resolved. The
+    schema constrains CPF, CEP and phone number to their formats, and
+    generated values that still fail their post-check (CPF check digits,
+    phone area code) are regenerated on their own, with the other fields
+    held fixed.
 
-        # Try again with recursion
-        return extract_driver_details(
-            driver_details_text,
-            max_recursion,
-            recursion_level + 1,
+    Args:
+        driver_details_text (str): The text containing driver details
+        max_retries (int): Maximum number of regenerations of the failing fields
+        model_name (str): Name of the model used for extraction
+        fast_path (bool): Whether to resolve fields with patterns before the model
+        normalized (bool): Whether the text already went through normalize_text
+        cache (ResultCache): Cache of previous extractions, if any
+        entity_index (EntityIndex): Known people, matched before any extraction
+                                    and updated with the new results
+        example_selector: Selector of the worked examples embedded in the prompt,
+                          see build_example_selector. All of them if None.
+
+    Returns:
+        dict: Extracted driver details
+    """
+    # Preprocess the text
+    if not normalized:
+        with default_metrics.timer("preprocess"):
+            driver_details_text = remove_extra_spaces_regex(driver_details_text)
+            driver_details_text = fix_comma_spacing_regex(driver_details_text)
+    driver_details_text = driver_details_text.strip()
+
+    # Reuse the details of a person already seen in other documents
+    if entity_index is not None:
+        with default_metrics.timer("entity_lookup"):
+            result = entity_index.lookup(driver_details_text)
+        default_metrics.increment("entity_index_misses" if result is None else "entity_index_hits")
+        if result is None:
+            result = extract_driver_details(
+                driver_details_text,
+                max_retries,
+                model_name,
+                fast_path,
+                normalized=True,
+                cache=cache,
+                example_selector=example_selector,
+            )
+            entity_index.add(result)
+        return result
+
+    # Reuse the result of an identical text
+    if cache is not None:
+        namespace = extraction_cache_namespace(model_name, fast_path, example_selector)
+        result = cache.get(driver_details_text, namespace)
+        default_metrics.increment("cache_misses" if result is None else "cache_hits")
+        if result is None:
+            result = extract_driver_details(
+                driver_details_text,
+                max_retries,
+                model_name,
+                fast_path,
+                normalized=True,
+                example_selector=example_selector,
+            )
+            if result:
+                cache.put(driver_details_text, namespace, result)
+        return result
+
+    # Resolve the fields with rigid formats without the model
+    fast_fields = extract_fast_fields(driver_details_text) if fast_path else {}
+    missing_fields = _missing_fields(fast_fields)
+    default_metrics.increment("fast_path_fields", len(fast_fields))
+    if not missing_fields:
+        return _merge_fields(fast_fields, {})
+
+    [generated_fields] = _generate_fields([driver_details_text], missing_fields, model_name, example_selector)
+
+    for attempt in range(1, max_retries + 1):
+        invalid_fields = _invalid_fields(generated_fields)
+        if not invalid_fields:
+            break
+
+        logger.info(
+            "%s not valid. Regenerating (attempt %d/%d)...",
+            ", ".join(invalid_fields),
+            attempt,
+            max_retries,
+            extra={"invalid_fields": invalid_fields, "attempt": attempt},
+        )
+        default_metrics.increment("retries")
+        [regenerated_fields] = _generate_fields(
+            [driver_details_text], invalid_fields, model_name, example_selector
         )
+        generated_fields.update(regenerated_fields)
 
-    return result
+    return _merge_fields(fast_fields, generated_fields)
 
 
-def process_driver_text(text):
+def preprocess_driver_text(text):
+    """
+    Normalize spacing and number formatting before extraction and masking.
+
+    Args:
+        text (str): The raw text containing driver details
+
+    Returns:
+        str: The preprocessed text
+    """
+    return normalize_text(text).text
+
+
+def _mask_record(text, normalized_text, mapping, mask_original):
+    """
+    Mask a record on its normalized text, or on the untouched original text.
+    """
+    if not mask_original:
+        return mask_pii(normalized_text.text, mapping)
+
+    matcher = get_matcher(mapping)
+    _, spans = mask_pii_with_spans(normalized_text.text, mapping)
+    return apply_masks(text, normalized_text.to_original_spans(spans), matcher.masks)
+
+
+def process_driver_text(
+    text,
+    model_name=DEFAULT_MODEL_NAME,
+    mask_original=False,
+    cache=None,
+    window_size=None,
+    entity_index=None,
+    example_selector=None,
+):
     """
     Process driver text by extracting details, masking PII, and returning both masked and original.
 
     Args:
         text (str): The text containing driver details
+        model_name (str): Name of the model used for extraction
+        mask_original (bool): Whether to apply the masks to the untouched input text
+                              instead of the preprocessed text
+        cache (ResultCache): Cache of previous extractions, if any
+        window_size (int): Texts longer than this are extracted from their best
+                           windows only, see extract_driver_details_long
+        entity_index (EntityIndex): Known people, matched before any extraction
+        example_selector: Selector of the worked examples embedded in the prompt
 
     Returns:
         tuple: (extracted_details, masked_text, original_text)
     """
-    # Preprocess the text
-    processed_text = remove_extra_spaces_regex(text)
-    processed_text = fix_comma_spacing_regex(processed_text)
-    processed_text = re.sub(r"(\s\d\d)\.", r"\1", processed_text)
+    # Preprocess the text once, keeping the offsets back to the input
+    with default_metrics.timer("preprocess"):
+        normalized_text = normalize_text(text)
 
     # Extract driver details
-    mapping = extract_driver_details(processed_text)
+    if window_size and len(normalized_text.text) > window_size:
+        mapping, _ = extract_driver_details_long(
+            normalized_text.text,
+            window_size=window_size,
+            model_name=model_name,
+            normalized=True,
+            cache=cache,
+            entity_index=entity_index,
+            example_selector=example_selector,
+        )
+    else:
+        mapping = extract_driver_details(
+            normalized_text.text,
+            model_name=model_name,
+            normalized=True,
+            cache=cache,
+            entity_index=entity_index,
+            example_selector=example_selector,
+        )
 
     # Mask PII information
-    masked_text = mask_pii(processed_text, mapping)
-    
+    with default_metrics.timer("mask"):
+        masked_text = _mask_record(text, normalized_text, mapping, mask_original)
+
+    return mapping, masked_text, normalized_text.text
+
+
+def extract_driver_details_batch(
+    driver_details_texts,
+    batch_size=8,
+    max_retries=1,
+    model_name=DEFAULT_MODEL_NAME,
+    fast_path=True,
+    normalized=False,
+    cache=None,
+    entity_index=None,
+    example_selector=None,
+):
+    """
+    Extract driver details from many texts, generating over batches of prompts.
+
+    Records with fields failing their post-check are re-queued into the next
+    batch to regenerate only those fields, as in extract_driver_details.
+
+    Args:
+        driver_details_texts (list): The texts containing driver details
+        batch_size (int): Number of prompts generated together
+        max_retries (int): Maximum number of regenerations per record, as in extract_driver_details
+        model_name (str): Name of the model used for extraction
+        fast_path (bool): Whether to resolve fields with patterns before the model
+        normalized (bool): Whether the texts already went through normalize_text
+        cache (ResultCache): Cache of previous extractions, if any
+        entity_index (EntityIndex): Known people, matched before any extraction
+                                    and updated with the new results
+        example_selector: Selector of the worked examples embedded in each prompt,
+                          see build_example_selector. All of them if None.
+
+    Returns:
+        list: Extracted driver details, one dict per input text and in the same order
+    """
+    # Preprocess the texts
+    texts = []
+    for driver_details_text in driver_details_texts:
+        if not normalized:
+            with default_metrics.timer("preprocess"):
+                driver_details_text = remove_extra_spaces_regex(driver_details_text)
+                driver_details_text = fix_comma_spacing_regex(driver_details_text)
+        texts.append(driver_details_text.strip())
+
+    # Only extract the texts that don't name a person already seen
+    if entity_index is not None:
+        with default_metrics.timer("entity_lookup"):
+            results = [entity_index.lookup(text) for text in texts]
+        misses = [index for index, result in enumerate(results) if result is None]
+        default_metrics.increment("entity_index_hits", len(texts) - len(misses))
+        default_metrics.increment("entity_index_misses", len(misses))
+        extracted = extract_driver_details_batch(
+            [texts[index] for index in misses],
+            batch_size,
+            max_retries,
+            model_name,
+            fast_path,
+            normalized=True,
+            cache=cache,
+            example_selector=example_selector,
+        )
+        for index, result in zip(misses, extracted):
+            results[index] = result
+        entity_index.add_many(extracted)
+        return results
+
+    # Only extract the texts that are not cached
+    if cache is not None:
+        namespace = extraction_cache_namespace(model_name, fast_path, example_selector)
+        results = [cache.get(text, namespace) for text in texts]
+        misses = [index for index, result in enumerate(results) if result is None]
+        default_metrics.increment("cache_hits", len(texts) - len(misses))
+        default_metrics.increment("cache_misses", len(misses))
+        extracted = extract_driver_details_batch(
+            [texts[index] for index in misses],
+            batch_size,
+            max_retries,
+            model_name,
+            fast_path,
+            normalized=True,
+            example_selector=example_selector,
+        )
+        for index, result in zip(misses, extracted):
+            results[index] = result
+            if result:
+                cache.put(texts[index], namespace, result)
+        return results
+
+    results = [{} for _ in texts]
+
+    # Resolve the fields with rigid formats without the model
+    fast_fields = [extract_fast_fields(text) if fast_path else {} for text in texts]
+    default_metrics.increment("fast_path_fields", sum(map(len, fast_fields)))
+    pending_fields = [_missing_fields(fields) for fields in fast_fields]
+    generated_fields = [{} for _ in texts]
+
+    attempts = [0] * len(texts)
+    pending = deque()
+    for index, fields in enumerate(fast_fields):
+        if pending_fields[index]:
+            pending.append(index)
+        else:
+            results[index] = _merge_fields(fields, {})
+
+    while pending:
+        batch = [pending.popleft() for _ in range(min(batch_size, len(pending)))]
+
+        # Records waiting for the same fields share a schema and a generation call
+        groups = {}
+        for index in batch:
+            groups.setdefault(pending_fields[index], []).append(index)
+
+        retries = []
+        for fields, indexes in groups.items():
+            generated = _generate_fields(
+                [texts[index] for index in indexes], fields, model_name, example_selector
+            )
+
+            for index, new_fields in zip(indexes, generated):
+                generated_fields[index].update(new_fields)
+                invalid_fields = _invalid_fields(new_fields)
+
+                if invalid_fields and attempts[index] < max_retries:
+                    attempts[index] += 1
+                    logger.info(
+                        "%s not valid. Regenerating (attempt %d/%d)...",
+                        ", ".join(invalid_fields),
+                        attempts[index],
+                        max_retries,
+                        extra={"invalid_fields": invalid_fields, "attempt": attempts[index]},
+                    )
+                    default_metrics.increment("retries")
+                    pending_fields[index] = invalid_fields
+                    retries.append(index)
+                    continue
+
+                results[index] = _merge_fields(fast_fields[index], generated_fields[index])
+
+        # Failed records go into the very next batch
+        pending.extendleft(reversed(retries))
+
+    return results
+
+
+def _extract_windowed(
+    texts,
+    window_size,
+    overlap=DEFAULT_WINDOW_OVERLAP,
+    max_windows=DEFAULT_MAX_WINDOWS,
+    batch_size=8,
+    model_name=DEFAULT_MODEL_NAME,
+    cache=None,
+    entity_index=None,
+    example_selector=None,
+):
+    """
+    Extract driver details from normalized texts, windowing the long ones.
+
+    The candidate windows of every long text and the short texts all go
+    through one extract_driver_details_batch call, so windows are generated
+    in parallel within each batch.
+
+    Returns:
+        list: (mapping, spans) per text, with spans as in merge_window_mappings
+              for windowed texts and None for the others
+    """
+    # Callers often only pick a window size, keep the default overlap below it
+    overlap = min(overlap, window_size // 2) if window_size else overlap
+
+    plans = []
+    inputs = []
+    with default_metrics.timer("window_selection"):
+        for text in texts:
+            windows = None
+            if window_size and len(text) > window_size:
+                windows = select_windows(text, window_size, overlap, max_windows)
+                default_metrics.increment("windows_selected", len(windows))
+                inputs.extend(text[start:end] for start, end, _ in windows)
+            else:
+                inputs.append(text)
+            plans.append(windows)
+
+    mappings = extract_driver_details_batch(
+        inputs,
+        batch_size=batch_size,
+        model_name=model_name,
+        normalized=True,
+        cache=cache,
+        entity_index=entity_index,
+        example_selector=example_selector,
+    )
+
+    results = []
+    position = 0
+    for text, windows in zip(texts, plans):
+        if windows is None:
+            results.append((mappings[position], None))
+            position += 1
+            continue
+
+        window_mappings = mappings[position:position + len(windows)]
+        position += len(windows)
+        results.append(merge_window_mappings(text, windows, window_mappings, tuple(DriverDetails.model_fields)))
+
+    return results
+
+
+def extract_driver_details_long(
+    text,
+    window_size=DEFAULT_WINDOW_SIZE,
+    overlap=DEFAULT_WINDOW_OVERLAP,
+    max_windows=DEFAULT_MAX_WINDOWS,
+    batch_size=8,
+    model_name=DEFAULT_MODEL_NAME,
+    normalized=False,
+    cache=None,
+    entity_index=None,
+    example_selector=None,
+):
+    """
+    Extract driver details from a long document using its best windows only.
+
+    The document is split into overlapping windows, the windows with the
+    highest density of PII patterns are extracted together in one batch, and
+    their results are merged into a single mapping.
+
+    Args:
+        text (str): The document containing driver details
+        window_size (int): Maximum number of characters per window
+        overlap (int): Number of characters shared by consecutive windows, at
+                       most half of window_size
+        max_windows (int): Maximum number of windows sent to the model
+        batch_size (int): Number of prompts generated together
+        model_name (str): Name of the model used for extraction
+        normalized (bool): Whether the text already went through normalize_text
+        cache (ResultCache): Cache of previous extractions, if any
+        entity_index (EntityIndex): Known people, matched before any extraction
+        example_selector: Selector of the worked examples embedded in each prompt
+
+    Returns:
+        tuple: (mapping, spans) with the extracted details and the
+               (start, end, field) offsets of each value in the
+               (normalized) document
+    """
+    if not normalized:
+        with default_metrics.timer("preprocess"):
+            text = normalize_text(text).text
+
+    [(mapping, spans)] = _extract_windowed(
+        [text],
+        window_size,
+        overlap,
+        max_windows,
+        batch_size,
+        model_name,
+        cache,
+        entity_index,
+        example_selector,
+    )
+    if spans is None:
+        spans = []
+        for field, value in mapping.items():
+            span, _ = align_value(value, text)
+            if span is not None:
+                spans.append((span[0], span[1], field))
+    return mapping, spans
+
+
+def process_driver_texts(
+    texts,
+    batch_size=8,
+    model_name=DEFAULT_MODEL_NAME,
+    mask_original=False,
+    cache=None,
+    window_size=None,
+    entity_index=None,
+    example_selector=None,
+):
+    """
+    Batched version of process_driver_text.
+
+    Args:
+        texts (list): The texts containing driver details
+        batch_size (int): Number of prompts generated together
+        model_name (str): Name of the model used for extraction
+        mask_original (bool): Whether to apply the masks to the untouched input texts
+        cache (ResultCache): Cache of previous extractions, if any
+        window_size (int): Texts longer than this are extracted from their best
+                           windows only, see extract_driver_details_long
+        entity_index (EntityIndex): Known people, matched before any extraction
+        example_selector: Selector of the worked examples embedded in each prompt
+
+    Returns:
+        list: (extracted_details, masked_text, original_text) tuples in input order
+    """
+    with default_metrics.timer("preprocess"):
+        normalized_texts = [normalize_text(text) for text in texts]
+
+    normalized = [normalized_text.text for normalized_text in normalized_texts]
+    if window_size:
+        mappings = [
+            mapping
+            for mapping, _ in _extract_windowed(
+                normalized,
+                window_size,
+                batch_size=batch_size,
+                model_name=model_name,
+                cache=cache,
+                entity_index=entity_index,
+                example_selector=example_selector,
+            )
+        ]
+    else:
+        mappings = extract_driver_details_batch(
+            normalized,
+            batch_size=batch_size,
+            model_name=model_name,
+            normalized=True,
+            cache=cache,
+            entity_index=entity_index,
+            example_selector=example_selector,
+        )
+
+    with default_metrics.timer("mask"):
+        return [
+            (mapping, _mask_record(text, normalized_text, mapping, mask_original), normalized_text.text)
+            for text, normalized_text, mapping in zip(texts, normalized_texts, mappings)
+        ]
+
+
+# Worked example with several people, shown after a single-person example
+ENTITY_EXAMPLE = {
+    "input": "JOAO CARLOS MENDES, brasileiro, motorista, portador do RG n.° 123456789 SSP/GO, CPF n. 111.444.777-35, residente e domiciliado na Rua 10, 250, Setor Oeste, Goiânia - GO, CEP 74120-020, celular (62) 99876-5432, por sua advogada MARIANA COSTA LIMA, OAB/GO 12.345, CPF n. 529.982.247-25, com escritório na Av. Goiás, 100, Centro, Goiânia - GO, CEP 74005-010, telefone (62) 3223-4455, vem, na condição de condutor do veículo de propriedade de RICARDO ALVES SOUZA, CPF n. 390.533.447-05, apresentar RECURSO À JARI",
+    "output": [
+        {
+            "role": "driver",
+            "name": "JOAO CARLOS MENDES",
+            "RG": "123456789 SSP/GO",
+            "CPF": "111.444.777-35",
+            "CEP": "74120-020",
+            "phonenumber": "(62) 99876-5432",
+        },
+        {
+            "role": "attorney",
+            "name": "MARIANA COSTA LIMA",
+            "CPF": "529.982.247-25",
+            "CEP": "74005-010",
+            "phonenumber": "(62) 3223-4455",
+        },
+        {
+            "role": "owner",
+            "name": "RICARDO ALVES SOUZA",
+            "CPF": "390.533.447-05",
+        },
+    ],
+}
 
-    return mapping, masked_text, processed_text
 
+@lru_cache(maxsize=None)
+def build_entities_prompt_prefix():
+    """
+    Build the part of the multi-entity prompt shared by every document.
 
-def check_mapping(mapping, driver_details):
+    Returns:
+        str: The shared prompt prefix, ending right before the document text
     """
-    Check if the mapping is correct by comparing it with the original driver details.
+    examples = [
+        (EXTRACTION_EXAMPLES[0]["input"], [dict(EXTRACTION_EXAMPLES[0]["output"], role="driver")]),
+        (ENTITY_EXAMPLE["input"], ENTITY_EXAMPLE["output"]),
+    ]
+
+    rendered = ""
+    for number, (text, entities) in enumerate(examples, start=1):
+        people = ""
+        for index, entity in enumerate(entities, start=1):
+            values = "\n".join(
+                f"    {field}: {entity[field]}" for field in PersonDetails.model_fields if field in entity
+            )
+            people += f"    Person {index}\n{values}\n"
+        rendered += f"""
+    Example {number}
+    Input
+    {text}
+
+    Output
+{people}
+"""
+
+    return f"""
+    Extract every person named in the provided text, with their role ({", ".join(ENTITY_ROLES)}) and details.
+    Leave out the details that are not given for a person.
+{rendered}
+    Your Input"""
+
+
+def build_entities_prompt(text):
+    """
+    Build the few-shot prompt extracting every person of a document.
+
+    Args:
+        text (str): The preprocessed document
+
+    Returns:
+        str: The prompt to send to the model
+    """
+    return f"""{build_entities_prompt_prefix()}
+    {text}
+
+    Your Output
+    """
+
+
+def _postprocess_entities(document_entities):
+    """
+    Convert generated DocumentEntities into dictionaries without the missing fields.
+    """
+    entities = []
+    for entity in document_entities.entities:
+        values = {}
+        for field, value in entity.model_dump().items():
+            if isinstance(value, str) and value.strip():
+                values[field] = value.strip()
+        entities.append(values)
+    return entities
+
+
+def entities_cache_namespace(model_name=DEFAULT_MODEL_NAME):
+    """
+    Describe everything a cached multi-entity result depends on.
+    """
+    return make_namespace(
+        "entities",
+        PROMPT_VERSION,
+        model_name,
+        json.dumps(DocumentEntities.model_json_schema(), sort_keys=True),
+        build_entities_prompt("{text}"),
+    )
+
+
+def extract_entities_batch(
+    texts,
+    batch_size=8,
+    model_name=DEFAULT_MODEL_NAME,
+    normalized=False,
+    cache=None,
+):
+    """
+    Extract every person of each document, all in one generation per document.
+
+    All the people of a document come out of a single structured generation,
+    so the prompt is prefilled once per document whatever the number of
+    people, and the shared prompt prefix is reused across documents.
+
+    Args:
+        texts (list): The documents
+        batch_size (int): Number of prompts generated together
+        model_name (str): Name of the model used for extraction
+        normalized (bool): Whether the texts already went through normalize_text
+        cache (ResultCache): Cache of previous extractions, if any
+
+    Returns:
+        list: For each document, a list of entities as dicts with a "role"
+              and the DriverDetails fields given for that person
+    """
+    if not normalized:
+        with default_metrics.timer("preprocess"):
+            texts = [normalize_text(text).text for text in texts]
+    texts = [text.strip() for text in texts]
+
+    results = [None] * len(texts)
+    if cache is not None:
+        namespace = entities_cache_namespace(model_name)
+        for index, text in enumerate(texts):
+            cached = cache.get(text, namespace)
+            if cached is not None:
+                results[index] = cached["entities"]
+    pending = [index for index, result in enumerate(results) if result is None]
+
+    if pending:
+        with default_metrics.timer("generator_acquisition"):
+            generator = get_generator(DocumentEntities, model_name)
+            model = get_model(model_name)
+
+        prefix = build_entities_prompt_prefix()
+        for start in range(0, len(pending), batch_size):
+            indexes = pending[start:start + batch_size]
+            prompts = [build_entities_prompt(texts[index]) for index in indexes]
+            with default_metrics.timer("generation"), default_prefix_cache.reuse(model, prefix):
+                generated = generator(prompts)
+            default_metrics.increment("generated_prompts", len(prompts))
+
+            for index, document_entities in zip(indexes, generated):
+                results[index] = _postprocess_entities(document_entities)
+                if cache is not None:
+                    cache.put(texts[index], namespace, {"entities": results[index]})
+
+    return results
+
+
+def extract_entities(text, model_name=DEFAULT_MODEL_NAME, normalized=False, cache=None):
+    """
+    Extract every person of a document in one structured generation.
+
+    Args:
+        text (str): The document
+        model_name (str): Name of the model used for extraction
+        normalized (bool): Whether the text already went through normalize_text
+        cache (ResultCache): Cache of previous extractions, if any
+
+    Returns:
+        list: Entities as dicts with a "role" and the fields given for that person
+    """
+    [entities] = extract_entities_batch(
+        [text], model_name=model_name, normalized=normalized, cache=cache
+    )
+    return entities
+
+
+def process_document_entities(
+    text,
+    model_name=DEFAULT_MODEL_NAME,
+    mask_original=False,
+    cache=None,
+):
+    """
+    Extract every person of a document and mask their PII with indexed placeholders.
+
+    The fields of the i-th person are masked as [name_i], [CPF_i], and so on,
+    so the values of different people never share a placeholder. The
+    returned pii_dict restores the text with unmask_pii.
+
+    Args:
+        text (str): The document
+        model_name (str): Name of the model used for extraction
+        mask_original (bool): Whether to apply the masks to the untouched input text
+        cache (ResultCache): Cache of previous extractions, if any
+
+    Returns:
+        tuple: (entities, pii_dict, masked_text, original_text)
+    """
+    with default_metrics.timer("preprocess"):
+        normalized_text = normalize_text(text)
+
+    entities = extract_entities(
+        normalized_text.text, model_name=model_name, normalized=True, cache=cache
+    )
+    pii_dict = entities_to_pii_dict(entities)
+
+    with default_metrics.timer("mask"):
+        masked_text = _mask_record(text, normalized_text, pii_dict, mask_original)
+
+    return entities, pii_dict, masked_text, normalized_text.text
+
+
+def build_edit_prompt(value, driver_details):
+    """
+    Build the few-shot prompt asking the model to edit a value until it matches the text.
+
+    Args:
+        value (str): The extracted value that was not found in the text
+        driver_details (str): The original driver details text
+
+    Returns:
+        str: The prompt to send to the model
+    """
+    return f"""
+        You will receive a string that could be inside a text.
+
+        If the string resembles a piece of information, edit the string until it exactly matches the associated information in the text.
+
+        Ensure the punctuation, spacing, and capitalization to exactly match the text.
+
+        Example 1
+        Input
+        string: (61) 9 9133-5265
+        text: portadora do RG n.° 209668283 SSP/DF, LAURA SOPHIA JOSEFA BARBOSA, brasileira, celular (61) 99133-5265, consultora de vendas, CPF n. 709.506.304-46, residente e domiciliado na Av. Liberdade, Lotes 04/17, Quadra 204, Bloco M, Apt. 102, St Ivo, Santa Cecília-DF, CEP 76816-800
+        
+        Output
+        original_text: (61) 9 9133-5265
+        edited_text: (61) 99133-5265
+
+        Example 2
+        Input
+        string: Quadra 314, Bloco F, 898, Asa Norte, Brasília - DF, Brasil
+        text: BRENO YURI EDSON VIANA, brasileiro, servidor público, portadora do RG n.° 362063278 SSP/DF, CPF n. 966.388.721-41, residente e domiciliado na Quadra SQN 314, Bloco F, 898, Asa NORTE, Brasília-   DF, Brasil, CEP 70767-060, celular (61) 98397-5024
+        
+        Output
+        original_text: Quadra 314 Bloco F, 898, Asa Norte, Brasília - DF, Brasil
+        edited_text: Quadra SQN 314, Bloco F, 898, Asa NORTE, Brasília-   DF, Brasil
+        
+        Your Input
+        string: {value}
+        text: {driver_details}
+        
+        Your Output
+
+        """
+
+
+def check_mapping(mapping, driver_details, model_name=DEFAULT_MODEL_NAME):
+    """
+    Check if the mapping is correct by comparing it with the original driver details,
+    repairing the values that do not match the text exactly.
+
+    Values are first aligned deterministically (whitespace, punctuation and
+    case insensitive, then digits only, then fuzzy spans). Only the values
+    that could not be aligned are sent to the model, all in one batched call.
 
     Args:
         mapping (dict): The mapping of extracted details
         driver_details (str): The original driver details text
+        model_name (str): Name of the model used to edit mismatched values
 
     Returns:
-        bool: True if the mapping is correct, False otherwise
+        tuple: (corrected_mapping, status) where status maps each field to
+               "exact", "normalized", "digits", "fuzzy", "model" or "unresolved"
     """
+    corrected_mapping = dict(mapping)
+    status = {}
+    unresolved = []
 
     # Check if all values in the mapping are present in the original driver details
-    for value in mapping.values():
-        if value not in driver_details:
-            print(f"Value '{value}' not found in driver details.")
-            model = outlines.models.transformers("Qwen/Qwen2.5-1.5B-Instruct")
-            generator = outlines.generate.json(model, EditedDriverDetails)
-            prompt = f"""
-                You will receive a string that could be inside a text.
-
-                If the string resembles a piece of information, edit the string until it exactly matches the associated information in the text.
-
-                Ensure the punctuation, spacing, and capitalization to exactly match the text.
-
-                Example 1
-                Input
-                string: (61) 9 9133-5265
-                text: portadora do RG n.° 209668283 SSP/DF, LAURA SOPHIA JOSEFA BARBOSA, brasileira, celular (61) 99133-5265, consultora de vendas, CPF n. 709.506.304-46, residente e domiciliado na Av. Liberdade, Lotes 04/17, Quadra 204, Bloco M, Apt. 102, St Ivo, Santa Cecília-DF, CEP 76816-800
-                
-                Output
-                original_text: (61) 9 9133-5265
-                edited_text: (61) 99133-5265
-
-                Example 2
-                Input
-                string: Quadra 314, Bloco F, 898, Asa Norte, Brasília - DF, Brasil
-                text: BRENO YURI EDSON VIANA, brasileiro, servidor público, portadora do RG n.° 362063278 SSP/DF, CPF n. 966.388.721-41, residente e domiciliado na Quadra SQN 314, Bloco F, 898, Asa NORTE, Brasília-   DF, Brasil, CEP 70767-060, celular (61) 98397-5024
-                
-                Output
-                original_text: Quadra 314 Bloco F, 898, Asa Norte, Brasília - DF, Brasil
-                edited_text: Quadra SQN 314, Bloco F, 898, Asa NORTE, Brasília-   DF, Brasil
-                
-                Your Input
-                string: {value}
-                text: {driver_details}
-                
-                Your Output
-
-                """
-
-            # Run the generator
-            result = generator(prompt)
-
-    return True
+    for field, value in mapping.items():
+        if not isinstance(value, str):
+            continue
+
+        span, alignment = align_value(value, driver_details)
+        if span is None:
+            logger.info(
+                "Value '%s' not found in driver details.", value, extra={"field": field}
+            )
+            unresolved.append(field)
+            continue
+
+        corrected_mapping[field] = driver_details[span[0]:span[1]]
+        status[field] = alignment
+        default_metrics.increment(f"alignment_{alignment}")
+
+    if not unresolved:
+        return corrected_mapping, status
+
+    # Ask the model to edit every remaining value in a single batch
+    generator = get_generator(EditedDriverDetails, model_name)
+    prompts = [build_edit_prompt(mapping[field], driver_details) for field in unresolved]
+    with default_metrics.timer("edit_generation"):
+        results = generator(prompts)
+
+    for field, result in zip(unresolved, results):
+        edited_text = result.edited_text.strip()
+        if edited_text and edited_text in driver_details:
+            corrected_mapping[field] = edited_text
+            status[field] = "model"
+        else:
+            status[field] = "unresolved"
+        default_metrics.increment(f"alignment_{status[field]}")
+
+    return corrected_mapping, status
@@ -0,0 +1,153 @@
+"""
+CPU inference profiles for the transformers backend.
+
+A profile decides how the model weights are loaded and run on a machine
+without GPU: the floating point precision, dynamic int8 quantization of the
+linear layers, the torch intra- and inter-op thread pools and whether
+generation runs under torch.inference_mode. Profiles are opt-in, picked by
+name with use_cpu_profile or the LLM_DATA_MASK_CPU_PROFILE environment
+variable.
+"""
+from .metrics import logger
+from .registry import default_registry
+
+
+class CPUProfile:
+    """
+    Settings used to load and run a transformers model on CPU.
+
+    Args:
+        name (str): Name of the profile
+        dtype (str): Torch dtype of the weights, "float32" or "bfloat16"
+        quantize (bool): Whether to quantize the linear layers to int8 after loading
+        intra_op_threads (int): Threads used inside each operation, torch's default if None
+        inter_op_threads (int): Threads running independent operations, torch's default if None
+        inference_mode (bool): Whether generation runs under torch.inference_mode
+    """
+
+    def __init__(
+        self,
+        name,
+        dtype="float32",
+        quantize=False,
+        intra_op_threads=None,
+        inter_op_threads=None,
+        inference_mode=True,
+    ):
+        if quantize and dtype != "float32":
+            raise ValueError("Dynamic int8 quantization starts from float32 weights")
+        self.name = name
+        self.dtype = dtype
+        self.quantize = quantize
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.inference_mode = inference_mode
+
+    def __repr__(self):
+        return (
+            f"CPUProfile({self.name!r}, dtype={self.dtype!r}, quantize={self.quantize}, "
+            f"intra_op_threads={self.intra_op_threads}, inter_op_threads={self.inter_op_threads}, "
+            f"inference_mode={self.inference_mode})"
+        )
+
+    def configure_threads(self):
+        """
+        Sizes the torch thread pools.
+
+        The inter-op pool can only be sized before torch runs any parallel
+        work, later attempts are logged and ignored.
+        """
+        import torch
+
+        if self.intra_op_threads:
+            torch.set_num_threads(self.intra_op_threads)
+        if self.inter_op_threads:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+            except RuntimeError:
+                logger.warning("Inter-op threads already in use, keeping %d", torch.get_num_interop_threads())
+
+    def torch_dtype(self):
+        """
+        Returns the torch dtype of the weights, float32 where bfloat16 is not supported.
+        """
+        import torch
+
+        if self.dtype == "bfloat16":
+            is_supported = getattr(torch.ops.mkldnn, "_is_mkldnn_bf16_supported", None)
+            if is_supported is not None and is_supported():
+                return torch.bfloat16
+            logger.warning("bfloat16 is not supported on this CPU, loading float32 weights")
+        return torch.float32
+
+    def load_model(self, model_name):
+        """
+        Loads an outlines transformers model following the profile.
+
+        Can be used as the model_loader of a ModelRegistry.
+
+        Args:
+            model_name (str): Name of the model on the Hugging Face hub
+
+        Returns:
+            The outlines model
+        """
+        import outlines
+        import torch
+
+        self.configure_threads()
+        model = outlines.models.transformers(
+            model_name,
+            device="cpu",
+            model_kwargs={"torch_dtype": self.torch_dtype()},
+        )
+
+        hf_model = model.model
+        hf_model.eval()
+        if self.quantize:
+            torch.ao.quantization.quantize_dynamic(hf_model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        if self.inference_mode:
+            # Lighter than the no_grad generate() runs under by default
+            hf_model.generate = torch.inference_mode()(hf_model.generate)
+        return model
+
+
+# Built-in profiles. "default" loads the model as outlines does, with
+# inference mode on top.
+CPU_PROFILES = {
+    "default": CPUProfile("default"),
+    "bfloat16": CPUProfile("bfloat16", dtype="bfloat16"),
+    "int8": CPUProfile("int8", quantize=True),
+}
+
+
+def get_cpu_profile(profile):
+    """
+    Returns a CPUProfile from itself or its name in CPU_PROFILES.
+    """
+    if isinstance(profile, CPUProfile):
+        return profile
+    try:
+        return CPU_PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown CPU profile {profile!r}, choose from {', '.join(CPU_PROFILES)}") from None
+
+
+def use_cpu_profile(profile, registry=default_registry):
+    """
+    Makes a registry load its models with a CPU profile.
+
+    Models already loaded are dropped, so they are reloaded with the profile.
+
+    Args:
+        profile: A CPUProfile or the name of one in CPU_PROFILES
+        registry (ModelRegistry): The registry to configure, the process-wide one by default
+
+    Returns:
+        CPUProfile: The profile applied
+    """
+    profile = get_cpu_profile(profile)
+    registry.clear()
+    registry.model_loader = profile.load_model
+    return profile
+
@@ -0,0 +1,195 @@
+"""
+Persistent index of the people already extracted, keyed by CPF.
+
+The same drivers come back in many documents. Every completed mapping is
+added to the index, and a new document is first scanned for the known values
+with a compiled multi-pattern matcher: when one known person has all the
+required fields in the text, the document is masked with the stored mapping
+without invoking the model.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from .matcher import PIIMatcher
+from .patterns import digits_only, is_valid_cpf
+
+# DriverDetails fields, all of which must be found to skip the model
+ENTITY_FIELDS = ("name", "RG", "CPF", "CEP", "phonenumber")
+
+# New values are scanned with a small separate matcher until there are this
+# many, then the main matcher is rebuilt with them
+MAX_PENDING_VALUES = 256
+
+
+class EntityIndex:
+    """
+    Known people in SQLite, with a multi-pattern matcher over their values.
+
+    Args:
+        path (str): Path of the SQLite database, ":memory:" for a private index
+        required_fields (tuple): Fields that must all be found in a text
+    """
+
+    def __init__(self, path, required_fields=ENTITY_FIELDS):
+        self.path = path
+        self.required_fields = frozenset(required_fields)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entities (
+                cpf TEXT PRIMARY KEY,
+                mapping TEXT NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+        # CPF digits -> mapping, and value -> [(CPF digits, field)]
+        self._entities = {}
+        self._owners = {}
+        for cpf, mapping in self._connection.execute("SELECT cpf, mapping FROM entities"):
+            self._store(cpf, json.loads(mapping))
+
+        self._matcher = None
+        self._pending = {}
+        self._pending_matcher = None
+
+    def __len__(self):
+        return len(self._entities)
+
+    def _store(self, cpf, mapping):
+        """
+        Records mapping in memory, replacing the previous values of cpf.
+        """
+        previous = self._entities.get(cpf, {})
+        for field, value in previous.items():
+            owners = self._owners.get(value, [])
+            if (cpf, field) in owners:
+                owners.remove((cpf, field))
+
+        self._entities[cpf] = mapping
+        new_values = []
+        for field, value in mapping.items():
+            if value not in self._owners:
+                self._owners[value] = []
+                new_values.append(value)
+            self._owners[value].append((cpf, field))
+        return new_values
+
+    def _key(self, mapping):
+        cpf = mapping.get("CPF")
+        if not isinstance(cpf, str) or not is_valid_cpf(cpf):
+            return None
+        return digits_only(cpf)
+
+    def add_many(self, mappings):
+        """
+        Adds or updates the people of completed mappings.
+
+        Mappings without a valid CPF are ignored, as are empty values.
+
+        Args:
+            mappings (list): Extracted mappings
+
+        Returns:
+            int: Number of people added or updated
+        """
+        rows = []
+        with self._lock:
+            for mapping in mappings:
+                if not mapping:
+                    continue
+                key = self._key(mapping)
+                if key is None:
+                    continue
+                values = {
+                    field: value
+                    for field, value in mapping.items()
+                    if field in ENTITY_FIELDS and isinstance(value, str) and value
+                }
+                if self._entities.get(key) == values:
+                    continue
+
+                for value in self._store(key, values):
+                    self._pending[value] = value
+                self._pending_matcher = None
+                rows.append((key, json.dumps(values, ensure_ascii=False), time.time()))
+
+            if rows:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO entities (cpf, mapping, updated) VALUES (?, ?, ?)",
+                    rows,
+                )
+                self._connection.commit()
+        return len(rows)
+
+    def add(self, mapping):
+        """
+        Adds or updates the person of one completed mapping.
+        """
+        return self.add_many([mapping])
+
+    def _matchers(self):
+        """
+        Returns the matchers covering every known value.
+        """
+        if self._matcher is None or len(self._pending) > MAX_PENDING_VALUES:
+            self._matcher = PIIMatcher({value: value for value in self._owners})
+            self._pending = {}
+            self._pending_matcher = None
+        if self._pending and self._pending_matcher is None:
+            self._pending_matcher = PIIMatcher(self._pending)
+        return [matcher for matcher in (self._matcher, self._pending_matcher) if matcher is not None]
+
+    def lookup(self, text):
+        """
+        Finds the known person whose required fields all appear in text.
+
+        Args:
+            text (str): The preprocessed text
+
+        Returns:
+            dict: A copy of the stored mapping, or None if no known person or
+                  more than one is complete in text
+        """
+        with self._lock:
+            if not self._entities:
+                self.misses += 1
+                return None
+
+            found = {}
+            for matcher in self._matchers():
+                for _, _, value in matcher.find_spans(text):
+                    for cpf, field in self._owners.get(value, ()):
+                        found.setdefault(cpf, set()).add(field)
+
+            complete = [cpf for cpf, fields in found.items() if self.required_fields <= fields]
+            if len(complete) != 1:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return dict(self._entities[complete[0]])
+
+    def stats(self):
+        """
+        Returns the hit/miss counters and the number of known people.
+        """
+        return {"hits": self.hits, "misses": self.misses, "entities": len(self._entities)}
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,142 @@
+"""
+Per-record selection of the worked examples of a few-shot prompt.
+
+Every example embedded in the prompt is prefilled for every record. A
+selector compares the record with a pool of examples using character n-gram
+TF-IDF vectors and keeps only the k most similar ones, or none for short
+records that already look like the examples.
+
+Any object with select(text), returning the indexes of the examples to
+embed, and describe(), identifying the selection in cache namespaces, can
+be used in place of TfidfExampleSelector.
+"""
+import math
+import re
+from collections import Counter
+
+DEFAULT_NGRAM_RANGE = (2, 4)
+
+_DIGIT_PATTERN = re.compile(r"\d")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def char_ngrams(text, ngram_range=DEFAULT_NGRAM_RANGE):
+    """
+    Counts the character n-grams of text.
+
+    Text is lowercased and digits are folded into "0", so records compare by
+    their layout (labels, punctuation, number formats) rather than by the
+    values themselves.
+
+    Args:
+        text (str): The text to split
+        ngram_range (tuple): Smallest and largest n-gram length
+
+    Returns:
+        Counter: Count of each n-gram
+    """
+    text = _SPACE_PATTERN.sub(" ", _DIGIT_PATTERN.sub("0", text.lower()))
+    counts = Counter()
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        counts.update(text[i:i + n] for i in range(len(text) - n + 1))
+    return counts
+
+
+class TfidfExampleSelector:
+    """
+    Selects the examples most similar to a record by char n-gram TF-IDF.
+
+    Args:
+        example_texts (list): Input texts of the example pool
+        k (int): Number of examples selected for a record
+        ngram_range (tuple): Smallest and largest n-gram length
+        easy_max_length (int): Records up to this many characters can be zero-shot
+        easy_min_similarity (float): Short records at least this similar to an
+                                     example get no examples at all. None
+                                     disables the zero-shot case.
+    """
+
+    def __init__(
+        self,
+        example_texts,
+        k=2,
+        ngram_range=DEFAULT_NGRAM_RANGE,
+        easy_max_length=400,
+        easy_min_similarity=0.75,
+    ):
+        self.k = min(k, len(example_texts))
+        self.ngram_range = tuple(ngram_range)
+        self.easy_max_length = easy_max_length
+        self.easy_min_similarity = easy_min_similarity
+
+        counts = [char_ngrams(text, self.ngram_range) for text in example_texts]
+        document_frequency = Counter(ngram for count in counts for ngram in count)
+
+        # Smoothed IDF, so n-grams shared by every example still count a little
+        size = len(example_texts)
+        self._idf = {
+            ngram: math.log((1 + size) / (1 + frequency)) + 1
+            for ngram, frequency in document_frequency.items()
+        }
+        self._vectors = [self._vectorize(count) for count in counts]
+
+    def _vectorize(self, counts):
+        """
+        Returns the L2-normalized TF-IDF vector of n-gram counts.
+
+        N-grams that appear in no example are dropped, they can't add to
+        any similarity.
+        """
+        vector = {
+            ngram: count * self._idf[ngram]
+            for ngram, count in counts.items()
+            if ngram in self._idf
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        if not norm:
+            return {}
+        return {ngram: weight / norm for ngram, weight in vector.items()}
+
+    def similarities(self, text):
+        """
+        Returns the cosine similarity of text with each example, in pool order.
+        """
+        vector = self._vectorize(char_ngrams(text, self.ngram_range))
+        return [
+            sum(weight * example.get(ngram, 0.0) for ngram, weight in vector.items())
+            for example in self._vectors
+        ]
+
+    def select(self, text):
+        """
+        Selects the examples to embed in the prompt of text.
+
+        Args:
+            text (str): The preprocessed record
+
+        Returns:
+            tuple: Indexes of the selected examples in the pool, in pool order
+                   so records selecting the same examples share a prompt prefix
+        """
+        if not self.k:
+            return ()
+
+        similarities = self.similarities(text)
+        if (
+            self.easy_min_similarity is not None
+            and len(text) <= self.easy_max_length
+            and max(similarities) >= self.easy_min_similarity
+        ):
+            return ()
+
+        ranked = sorted(range(len(similarities)), key=lambda index: similarities[index], reverse=True)
+        return tuple(sorted(ranked[:self.k]))
+
+    def describe(self):
+        """
+        Describes the selection, for the namespace of cached results.
+        """
+        return (
+            f"tfidf:k={self.k}:ngrams={self.ngram_range}:"
+            f"easy={self.easy_max_length},{self.easy_min_similarity}:pool={len(self._vectors)}"
+        )
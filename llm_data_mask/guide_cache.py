@@ -0,0 +1,245 @@
+"""
+On-disk cache of the compiled token-level guides of structured generators.
+
+Building outlines.generate.json(model, schema) turns the schema into a regex
+and the regex into an index of allowed tokens over the whole vocabulary,
+which takes far longer than loading it back. The compiled guide is stored
+once per (regex, tokenizer, outlines version) in a cache directory and
+unpickled on later cold starts.
+
+Loading a guide unpickles it, so the cache directory must only be writable
+by its owner: it is created with mode 0o700, and entries in a directory
+other users can write to are neither read nor written.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+
+from .metrics import default_metrics, logger
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "LLM_DATA_MASK_GUIDE_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "llm_data_mask", "guides"),
+)
+
+# Outlines releases build_cached_json_generator was checked against. Its
+# internals move between releases, so other versions compile the guide
+# through outlines.generate.json every time.
+SUPPORTED_OUTLINES_VERSIONS = ("0.2.1",)
+
+
+def _library_versions():
+    """
+    Returns the versions of the libraries the compiled guides depend on.
+    """
+    from importlib import metadata
+
+    versions = []
+    for package in ("outlines", "outlines_core"):
+        try:
+            versions.append(f"{package}=={metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            versions.append(f"{package}==none")
+    return ";".join(versions)
+
+
+def is_supported_outlines():
+    """
+    Returns whether the installed outlines is one build_cached_json_generator supports.
+    """
+    from importlib import metadata
+
+    try:
+        return metadata.version("outlines") in SUPPORTED_OUTLINES_VERSIONS
+    except metadata.PackageNotFoundError:
+        return False
+
+
+def _is_private(path):
+    """
+    Returns whether path belongs to the current user and no one else can write to it.
+    """
+    info = os.stat(path)
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        return False
+    return not info.st_mode & 0o022
+
+
+def fingerprint_tokenizer(tokenizer):
+    """
+    Hashes everything a compiled guide depends on in a tokenizer.
+
+    Args:
+        tokenizer: An outlines tokenizer, with vocabulary, eos_token_id and special_tokens
+
+    Returns:
+        str: Hex digest of the tokenizer
+    """
+    digest = hashlib.sha256()
+    for token, token_id in sorted(tokenizer.vocabulary.items(), key=lambda item: item[1]):
+        digest.update(f"{token_id}\0{token}\0".encode("utf-8", "surrogatepass"))
+    digest.update(f"eos={tokenizer.eos_token_id}".encode("utf-8"))
+    digest.update(json.dumps(sorted(getattr(tokenizer, "special_tokens", ()))).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class GuideCache:
+    """
+    Directory of pickled guides, private to the current user.
+
+    Args:
+        directory (str): Cache directory, created on first write
+        enabled (bool): Whether guides are read from and written to disk at all
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, enabled=True):
+        self.directory = directory
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._fingerprints = {}  # id(tokenizer) -> (tokenizer, fingerprint)
+        self._lock = threading.Lock()
+
+    def key(self, regex, tokenizer):
+        """
+        Returns the cache key of the guide of regex for tokenizer.
+        """
+        with self._lock:
+            entry = self._fingerprints.get(id(tokenizer))
+            if entry is None or entry[0] is not tokenizer:
+                entry = (tokenizer, fingerprint_tokenizer(tokenizer))
+                self._fingerprints[id(tokenizer)] = entry
+
+        digest = hashlib.sha256()
+        for part in (regex, entry[1], _library_versions()):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.guide")
+
+    def _directory_is_private(self):
+        if _is_private(self.directory):
+            return True
+        logger.warning("Guide cache %s is writable by other users, ignoring it", self.directory)
+        return False
+
+    def load(self, key):
+        """
+        Returns the cached guide of key, or None on a miss or an unreadable entry.
+
+        Entries are only unpickled from a directory and file owned by the
+        current user and writable by no one else.
+        """
+        path = self._path(key)
+        try:
+            if not os.path.exists(path) or not self._directory_is_private() or not _is_private(path):
+                return None
+            with open(path, "rb") as f:
+                return pickle.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        except Exception:
+            logger.warning("Ignoring unreadable guide cache entry %s", key, exc_info=True)
+            return None
+
+    def store(self, key, guide):
+        """
+        Writes a guide to the cache atomically. Guides that can't be pickled are skipped.
+        """
+        try:
+            payload = pickle.dumps(guide, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            logger.warning("Guide of type %s can't be cached", type(guide).__name__, exc_info=True)
+            return
+
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        if not self._directory_is_private():
+            return
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                f.write(payload)
+            os.replace(temporary_path, self._path(key))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def get_or_build(self, regex, tokenizer, build):
+        """
+        Returns the guide of regex for tokenizer, building and storing it on a miss.
+
+        Args:
+            regex (str): The regex the guide enforces
+            tokenizer: The outlines tokenizer of the model
+            build (callable): Builds the guide when it is not cached
+
+        Returns:
+            The compiled guide
+        """
+        if not self.enabled:
+            return build()
+
+        key = self.key(regex, tokenizer)
+        guide = self.load(key)
+        if guide is not None:
+            self.hits += 1
+            default_metrics.increment("guide_cache_hits")
+            return guide
+
+        self.misses += 1
+        default_metrics.increment("guide_cache_misses")
+        with default_metrics.timer("guide_build"):
+            guide = build()
+        self.store(key, guide)
+        return guide
+
+    def clear(self):
+        """
+        Deletes every cached guide.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".guide"):
+                os.unlink(os.path.join(self.directory, name))
+
+
+# Guide cache shared by the whole process
+default_guide_cache = GuideCache()
+
+
+def build_cached_json_generator(model, schema, guide_cache=default_guide_cache):
+    """
+    Builds the equivalent of outlines.generate.json(model, schema) with a cached guide.
+
+    Mirrors what outlines.generate.json does for a pydantic schema on a
+    transformers model in the SUPPORTED_OUTLINES_VERSIONS (schema to regex,
+    regex guide, guide logits processor, multinomial sampling), but reads the
+    compiled regex guide from guide_cache.
+
+    Args:
+        model: An outlines transformers model
+        schema: Pydantic model class describing the output
+        guide_cache (GuideCache): Where compiled guides are kept
+
+    Returns:
+        The structured generator
+    """
+    from outlines.fsm.guide import RegexGuide
+    from outlines.generate.api import SequenceGeneratorAdapter
+    from outlines.processors.structured import GuideLogitsProcessor
+    from outlines.samplers import multinomial
+    from outlines_core.fsm.json_schema import build_regex_from_schema
+
+    regex = build_regex_from_schema(json.dumps(schema.model_json_schema()))
+    tokenizer = model.tokenizer
+    guide = guide_cache.get_or_build(regex, tokenizer, lambda: RegexGuide.from_regex(regex, tokenizer))
+
+    generator = SequenceGeneratorAdapter(model, GuideLogitsProcessor(tokenizer=tokenizer, guide=guide), multinomial())
+    generator.format_sequence = schema.model_validate_json
+    return generator
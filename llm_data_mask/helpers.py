@@ -1,4 +1,13 @@
 import re
+from bisect import bisect_left, bisect_right
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from .matcher import apply_masks, get_matcher
+from .metrics import default_metrics, logger
+
+COMMA_SPACING_PATTERN = re.compile(r'\s+,')
+EXTRA_SPACES_PATTERN = re.compile(r'\s+')
 
 
 def mask_pii(text, pii_dict, mask_format="[{pii_type}]"):
@@ -15,35 +24,72 @@ def mask_pii(text, pii_dict, mask_format="[{pii_type}]"):
     Returns:
         str: The text with PII information masked
     """
-    masked_text = text
-    
-    # Sort PII elements by length (descending) to avoid partial replacements
-    # For example, replace "John Doe" before "John" if both are in the dictionary
-    all_pii_items = []
-    for pii_type, value in pii_dict.items():
-        # Skip None values or non-string values
-        if value is None or not isinstance(value, str):
-            continue
-        all_pii_items.append((value, pii_type))
-    
-    # Sort by length (longest first)
-    all_pii_items.sort(key=lambda x: len(x[0]), reverse=True)
-    # Replace each PII item with its mask
-
-    for pii_item, pii_type in all_pii_items:
-        
-        mask = mask_format.format(pii_type=pii_type)
-        
-        if pii_item in masked_text:
-            masked_text = masked_text.replace(pii_item, mask)
-        else:
-            print(f"'{pii_item}' not found in text.")        
-            # Apply additional masking for specific patterns
-            masked_text = replace_if_matches_ends(masked_text, pii_item, mask)
-    
+    masked_text, _ = mask_pii_with_spans(text, pii_dict, mask_format)
     return masked_text
 
 
+def mask_pii_with_spans(text, pii_dict, mask_format="[{pii_type}]"):
+    """
+    Masks PII information in text and reports where each mask was applied.
+
+    Exact values are masked in a single left-to-right pass with leftmost-longest
+    semantics, so "John Doe" wins over "John" if both are in the dictionary.
+    Values that are not found verbatim fall back to the spans located by
+    find_fuzzy_spans.
+
+    Args:
+        text (str): The original text containing PII information
+        pii_dict (dict): A dictionary where keys are PII types and values are the actual PII values
+        mask_format (str): Format string for the mask, with {pii_type} as a placeholder
+
+    Returns:
+        tuple: (masked_text, spans) where spans are the (start, end, pii_type)
+               offsets of each mask in the original text
+    """
+    return mask_with_matcher(text, get_matcher(pii_dict, mask_format))
+
+
+def mask_with_matcher(text, matcher):
+    """
+    Masks text with an already compiled PIIMatcher, as in mask_pii_with_spans.
+
+    Args:
+        text (str): The original text containing PII information
+        matcher (PIIMatcher): The compiled PII values and their masks
+
+    Returns:
+        tuple: (masked_text, spans) as returned by mask_pii_with_spans
+    """
+    masked_text, spans = matcher.mask(text)
+    default_metrics.increment("mask_exact_hits", len(spans))
+
+    # Values that were not found verbatim, longest first
+    found_types = {pii_type for _, _, pii_type in spans}
+    missing_items = [
+        (value, pii_type)
+        for value, pii_type in matcher.values.items()
+        if pii_type not in found_types
+    ]
+    if not missing_items:
+        return masked_text, spans
+    missing_items.sort(key=lambda x: len(x[0]), reverse=True)
+
+    for pii_item, pii_type in missing_items:
+        logger.info("'%s' not found in text.", pii_item, extra={"pii_type": pii_type})
+        # Apply additional masking for approximate occurrences
+        found = len(spans)
+        with default_metrics.timer("fuzzy_match"):
+            for start, end, _ in find_fuzzy_spans(text, pii_item):
+                if not any(start < other_end and other_start < end for other_start, other_end, _ in spans):
+                    spans.append((start, end, pii_type))
+        default_metrics.increment("mask_fuzzy_hits", len(spans) - found)
+        if len(spans) == found:
+            default_metrics.increment("mask_misses")
+
+    spans.sort()
+    return apply_masks(text, spans, matcher.masks), spans
+
+
 def unmask_pii(masked_text, pii_dict, mask_format="[{pii_type}]"):
     """
     Replaces masked PII elements in text with their original values using a PII dictionary.
@@ -59,25 +105,61 @@ def unmask_pii(masked_text, pii_dict, mask_format="[{pii_type}]"):
         str: The text with PII information restored
     """
     unmasked_text = masked_text
-    
-    # Create a mapping of mask to original value
-    masks_to_values = {}
-    for pii_type, value in pii_dict.items():
-        # Skip None values or non-string values
-        if value is None or not isinstance(value, str):
-            continue
-        
-        # Create the mask using the provided format
-        mask = mask_format.format(pii_type=pii_type)
-        masks_to_values[mask] = value
-    
-    # Replace each mask with its original value
-    for mask, original_value in masks_to_values.items():
-        unmasked_text = unmasked_text.replace(mask, original_value)
-    
+
+    # Replace each mask with its original value, longest first so that
+    # indexed masks such as "name_1" never match inside "name_10"
+    with default_metrics.timer("unmask"):
+        for pii_type, mask in _unmask_template(tuple(pii_dict), mask_format):
+            value = pii_dict[pii_type]
+            # Skip None values or non-string values
+            if isinstance(value, str) and mask in unmasked_text:
+                unmasked_text = unmasked_text.replace(mask, value)
+
     return unmasked_text
 
 
+@lru_cache(maxsize=256)
+def _unmask_template(pii_types, mask_format="[{pii_type}]"):
+    """
+    Returns the (pii_type, mask) pairs of a set of PII types, longest mask first.
+
+    Formatting and ordering the masks is cached, since stored mappings
+    share a handful of PII type sets.
+
+    Args:
+        pii_types (tuple): The PII types of a mapping
+        mask_format (str): Format string for the mask, with {pii_type} as a placeholder
+
+    Returns:
+        tuple: (pii_type, mask) pairs
+    """
+    masks = [(pii_type, mask_format.format(pii_type=pii_type)) for pii_type in pii_types]
+    return tuple(sorted(masks, key=lambda item: len(item[1]), reverse=True))
+
+
+def entities_to_pii_dict(entities, exclude=("role",)):
+    """
+    Flattens a list of entities into a PII dictionary with indexed types.
+
+    The fields of the i-th entity (counting from 1) become "<field>_i", so
+    masking produces placeholders such as [name_1] and [CPF_2] and the values
+    of different people never collide.
+
+    Args:
+        entities (list): Dicts of PII values, one per person
+        exclude (tuple): Keys that are attributes of the entity rather than PII
+
+    Returns:
+        dict: The PII dictionary, e.g. {"name_1": "JOHN DOE", "CPF_1": "...", "name_2": ...}
+    """
+    pii_dict = {}
+    for index, entity in enumerate(entities, start=1):
+        for pii_type, value in entity.items():
+            if pii_type not in exclude:
+                pii_dict[f"{pii_type}_{index}"] = value
+    return pii_dict
+
+
 def remove_dots_and_hyphens(input_string):
     """
     Removes all dots (.) and hyphens (-) from a string.
@@ -108,7 +190,7 @@ def fix_comma_spacing_regex(input_string):
         return input_string
     
     # Replace any whitespace followed by a comma with just a comma
-    return re.sub(r'\s+,', ',', input_string)
+    return COMMA_SPACING_PATTERN.sub(',', input_string)
 
 
 def remove_extra_spaces_regex(input_string):
@@ -125,57 +207,164 @@ def remove_extra_spaces_regex(input_string):
         return input_string
     
     # Replace one or more whitespace characters with a single space
-    return re.sub(r'\s+', ' ', input_string)
+    return EXTRA_SPACES_PATTERN.sub(' ', input_string)
+
+
+def _normalize_for_alignment(value):
+    """
+    Keeps only the letters and digits of a string, case-folded.
+    """
+    return "".join(char for char in value.casefold() if char.isalnum())
+
+
+def _alignment_score(candidate, comparison_string):
+    """
+    Scores how well a candidate span aligns with the comparison string.
+
+    Digit-heavy values (CPF, CEP, phone numbers) are compared on their digits
+    only, everything else on letters and digits ignoring case.
+
+    Returns:
+        float: Similarity between 0 and 1
+    """
+    comparison_normalized = _normalize_for_alignment(comparison_string)
+    comparison_digits = "".join(char for char in comparison_normalized if char.isdigit())
+
+    if comparison_digits and len(comparison_digits) * 2 >= len(comparison_normalized):
+        candidate_digits = "".join(char for char in candidate if char.isdigit())
+        if candidate_digits == comparison_digits:
+            return 1.0
+        return SequenceMatcher(None, candidate_digits, comparison_digits, autojunk=False).ratio()
+
+    candidate_normalized = _normalize_for_alignment(candidate)
+    if candidate_normalized == comparison_normalized:
+        return 1.0
+    return SequenceMatcher(None, candidate_normalized, comparison_normalized, autojunk=False).ratio()
+
+
+def _find_all(string, substring):
+    """
+    Returns the start offsets of every occurrence of substring, overlapping included.
+    """
+    positions = []
+    position = string.find(substring)
+    while position != -1:
+        positions.append(position)
+        position = string.find(substring, position + 1)
+    return positions
+
+
+def find_fuzzy_spans(
+    original_string,
+    comparison_string,
+    prefix_length=2,
+    suffix_length=3,
+    max_span_length=None,
+    min_score=0.6,
+):
+    """
+    Locate the spans of original_string that approximately match comparison_string.
+
+    Candidates start with the prefix and end with the suffix of
+    comparison_string and are at most max_span_length long. They are found
+    from an index of prefix and suffix occurrences, scored by digit or
+    character alignment, and the best non-overlapping ones are kept from left
+    to right.
+
+    Args:
+        original_string: The string to search
+        comparison_string: The value whose approximate occurrences we are looking for
+        prefix_length: Length of the prefix to match (default=2)
+        suffix_length: Length of the suffix to match (default=3)
+        max_span_length: Longest span considered, twice the comparison length by default
+        min_score: Minimum alignment score for a span to be kept
+
+    Returns:
+        list: (start, end, score) tuples sorted by start offset
+    """
+    if not comparison_string or len(comparison_string) < prefix_length + suffix_length:
+        return []
+
+    if max_span_length is None:
+        max_span_length = 2 * len(comparison_string)
+
+    prefix = comparison_string[:prefix_length]
+    suffix = comparison_string[-suffix_length:]
+
+    prefix_positions = _find_all(original_string, prefix)
+    if not prefix_positions:
+        return []
+    suffix_positions = _find_all(original_string, suffix)
+
+    spans = []
+    position = 0
+    for start in prefix_positions:
+        if start < position:
+            continue
+
+        # Suffix occurrences that end the span within the length limit
+        first = bisect_left(suffix_positions, start + prefix_length)
+        last = bisect_right(suffix_positions, start + max_span_length - suffix_length)
 
+        best = None
+        for suffix_start in suffix_positions[first:last]:
+            end = suffix_start + suffix_length
+            score = _alignment_score(original_string[start:end], comparison_string)
+            if best is None or score > best[2]:
+                best = (start, end, score)
 
-def replace_if_matches_ends(original_string, comparison_string, replacement, prefix_length=2, suffix_length=3):
+        if best is not None and best[2] >= min_score:
+            spans.append(best)
+            position = best[1]
+
+    return spans
+
+
+def replace_if_matches_ends(
+    original_string,
+    comparison_string,
+    replacement,
+    prefix_length=2,
+    suffix_length=3,
+    max_span_length=None,
+    min_score=0.6,
+):
     """
     Replace all substrings in the original_string if they start with the first part
     and end with the last part of the comparison_string.
+
+    Spans are located with find_fuzzy_spans and replaced in a single pass.
     
     Args:
         original_string: The string to be modified
         comparison_string: The string whose ends we're checking against
         replacement: What to replace matching substrings with
-        prefix_length: Length of the prefix to match (default=3)
+        prefix_length: Length of the prefix to match (default=2)
         suffix_length: Length of the suffix to match (default=3)
+        max_span_length: Longest span considered, twice the comparison length by default
+        min_score: Minimum alignment score for a span to be replaced
     
     Returns:
         Modified original_string with all matches replaced
     """
-    if not comparison_string or len(comparison_string) < prefix_length + suffix_length:
-        return original_string
-    
-    # Get prefix and suffix of the comparison string
-    prefix = comparison_string[:prefix_length]
-    suffix = comparison_string[-suffix_length:]
-    
-    result = ""
-    i = 0
-    
-    while i <= len(original_string) - prefix_length:
-        # Check if current position matches the prefix
-        if original_string[i:i+prefix_length] == prefix:
-            # Search for the nearest suffix after this position
-            for j in range(i + prefix_length, len(original_string) - suffix_length + 1):
-                if original_string[j:j+suffix_length] == suffix:
-                    # Replace the substring from i to j+suffix_length
-                    result += replacement
-                    i = j + suffix_length  # Move past the replaced substring
-                    break
-            else:
-                # No matching suffix found, keep the original character
-                result += original_string[i]
-                i += 1
-        else:
-            # No prefix match, keep the original character
-            result += original_string[i]
-            i += 1
-    
-    # Add any remaining characters
-    result += original_string[i:]
-    
-    return result
+    spans = find_fuzzy_spans(
+        original_string,
+        comparison_string,
+        prefix_length,
+        suffix_length,
+        max_span_length,
+        min_score,
+    )
+
+    parts = []
+    position = 0
+    for start, end, _ in spans:
+        parts.append(original_string[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(original_string[position:])
+
+    return "".join(parts)
 
 
 # Example usage:
@@ -0,0 +1,195 @@
+"""
+Single-pass multi-pattern matching of PII values.
+
+A PII dictionary is compiled once into an Aho-Corasick automaton, which then
+finds every value in a text in one left-to-right pass.
+"""
+from collections import deque
+from functools import lru_cache
+
+# Up to this many values, str.find scans are cheaper than building the automaton
+SCAN_MAX_VALUES = 16
+
+
+class PIIMatcher:
+    """
+    Aho-Corasick automaton over the values of a PII dictionary.
+
+    Small dictionaries, such as the mapping of a single record, skip the
+    automaton and scan the text once per value with str.find, which gives
+    the same spans at a fraction of the construction cost.
+
+    Overlapping values are resolved with leftmost-longest semantics: the
+    match that starts first wins, and among matches starting at the same
+    position the longest one wins. When the same value appears under several
+    PII types, the first type in the dictionary is used.
+
+    Args:
+        pii_dict (dict): A dictionary where keys are PII types and values are the actual PII values
+        mask_format (str): Format string for the mask, with {pii_type} as a placeholder
+    """
+
+    def __init__(self, pii_dict, mask_format="[{pii_type}]"):
+        self.mask_format = mask_format
+        self.masks = {}
+        self.values = {}
+
+        # State 0 is the root. Each state has its transitions, failure link
+        # and the (length, pii_type) of every value ending in it.
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+
+        for pii_type, value in pii_dict.items():
+            # Skip None, empty or non-string values
+            if not value or not isinstance(value, str):
+                continue
+            if value in self.values:
+                continue
+            self.values[value] = pii_type
+            self.masks[pii_type] = mask_format.format(pii_type=pii_type)
+
+        self._automaton = len(self.values) > SCAN_MAX_VALUES
+        if self._automaton:
+            for value, pii_type in self.values.items():
+                self._add(value, pii_type)
+            self._build_failure_links()
+
+    def _add(self, value, pii_type):
+        state = 0
+        for char in value:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._outputs[state].append((len(value), pii_type))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                self._outputs[next_state].extend(self._outputs[fail])
+
+    def _longest_matches(self, text):
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+
+        longest = {}
+        state = 0
+        for end, char in enumerate(text, start=1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, pii_type in outputs[state]:
+                start = end - length
+                if longest.get(start, (0,))[0] < length:
+                    longest[start] = (length, pii_type)
+        return longest
+
+    def _scan(self, text):
+        longest = {}
+        for value, pii_type in self.values.items():
+            length = len(value)
+            start = text.find(value)
+            while start != -1:
+                if longest.get(start, (0,))[0] < length:
+                    longest[start] = (length, pii_type)
+                start = text.find(value, start + 1)
+        return longest
+
+    def find_spans(self, text):
+        """
+        Finds the non-overlapping PII values in text.
+
+        Args:
+            text (str): The text to search
+
+        Returns:
+            list: (start, end, pii_type) tuples sorted by start offset
+        """
+        if not self.values:
+            return []
+
+        # Longest match starting at each position
+        longest = self._longest_matches(text) if self._automaton else self._scan(text)
+
+        spans = []
+        position = 0
+        for start in sorted(longest):
+            if start < position:
+                continue
+            length, pii_type = longest[start]
+            spans.append((start, start + length, pii_type))
+            position = start + length
+        return spans
+
+    def mask(self, text):
+        """
+        Masks every PII value in text in a single pass.
+
+        Args:
+            text (str): The original text containing PII information
+
+        Returns:
+            tuple: (masked_text, spans) where spans are the (start, end, pii_type)
+                   offsets of each mask in the original text
+        """
+        spans = self.find_spans(text)
+        return apply_masks(text, spans, self.masks), spans
+
+
+def apply_masks(text, spans, masks):
+    """
+    Replaces each span of text with the mask of its PII type.
+
+    Args:
+        text (str): The original text
+        spans (list): Non-overlapping (start, end, pii_type) tuples sorted by start
+        masks (dict): Mask string for each PII type
+
+    Returns:
+        str: The text with every span replaced
+    """
+    parts = []
+    position = 0
+    for start, end, pii_type in spans:
+        parts.append(text[position:start])
+        parts.append(masks[pii_type])
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+@lru_cache(maxsize=128)
+def _cached_matcher(pii_items, mask_format):
+    return PIIMatcher(dict(pii_items), mask_format)
+
+
+def get_matcher(pii_dict, mask_format="[{pii_type}]"):
+    """
+    Returns a compiled PIIMatcher, reusing it across documents that share values.
+
+    Args:
+        pii_dict (dict): A dictionary where keys are PII types and values are the actual PII values
+        mask_format (str): Format string for the mask, with {pii_type} as a placeholder
+
+    Returns:
+        PIIMatcher: The compiled matcher
+    """
+    try:
+        return _cached_matcher(tuple(pii_dict.items()), mask_format)
+    except TypeError:
+        # Unhashable values can't be cached
+        return PIIMatcher(pii_dict, mask_format)
@@ -0,0 +1,164 @@
+"""
+Per-stage timings, counters and structured logging.
+
+Metrics are disabled by default. While disabled, timer() returns a shared
+no-op context manager and increment() returns immediately, so the hooks left
+in the hot paths cost next to nothing.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger("llm_data_mask")
+
+METRIC_PREFIX = "llm_data_mask_"
+
+_NULL_TIMER = nullcontext()
+
+
+class MetricsRegistry:
+    """
+    Collects counters and stage timings, and forwards them to callbacks.
+
+    Args:
+        enabled (bool): Whether events are recorded at all
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._counters = {}
+        self._timings = {}  # name -> [count, total seconds, max seconds]
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback):
+        """
+        Registers a function called as callback(kind, name, value) for every event,
+        where kind is "counter" or "timing".
+        """
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self._callbacks.remove(callback)
+
+    def increment(self, name, value=1):
+        """
+        Adds value to the counter name.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        for callback in self._callbacks:
+            callback("counter", name, value)
+
+    def observe(self, name, seconds):
+        """
+        Records one duration of the stage name.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            timing = self._timings.setdefault(name, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+        for callback in self._callbacks:
+            callback("timing", name, seconds)
+
+    def timer(self, name):
+        """
+        Returns a context manager timing the stage name.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timer(name)
+
+    @contextmanager
+    def _timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        Returns the current counters and timings.
+
+        Returns:
+            dict: {"counters": {name: value}, "timings": {name: {"count", "sum", "max"}}}
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "timings": {
+                    name: {"count": count, "sum": total, "max": maximum}
+                    for name, (count, total, maximum) in self._timings.items()
+                },
+            }
+
+    def reset(self):
+        """
+        Clears every counter and timing.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+    def to_prometheus(self):
+        """
+        Formats the metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = f"{METRIC_PREFIX}{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, timing in sorted(snapshot["timings"].items()):
+            metric = f"{METRIC_PREFIX}{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            lines.append(f"{metric}_count {timing['count']}")
+            lines.append(f"{metric}_sum {timing['sum']}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            lines.append(f"{metric}_max {timing['max']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """
+        Writes the metrics to path, in Prometheus text format if it ends with
+        .prom or .txt and as JSON otherwise.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2, sort_keys=True)
+
+
+# Metrics shared by the whole process
+default_metrics = MetricsRegistry()
+
+
+def enable_metrics(enabled=True):
+    """
+    Turns recording on or off for the process-wide metrics.
+    """
+    default_metrics.enabled = enabled
+
+
+def timer(name):
+    """
+    Times a stage on the process-wide metrics.
+    """
+    return default_metrics.timer(name)
+
+
+def increment(name, value=1):
+    """
+    Increments a counter on the process-wide metrics.
+    """
+    default_metrics.increment(name, value)
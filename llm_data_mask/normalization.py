@@ -0,0 +1,119 @@
+"""
+Text normalization with an offset map back to the original text.
+"""
+import re
+from bisect import bisect_right
+
+# All the rewrites applied before extraction, as one alternation:
+# - whitespace before a comma is removed
+# - any other run of whitespace becomes a single space (single spaces are
+#   left alone, they would be rewritten to themselves)
+# - the dot after a whitespace and two digits is removed ("70.316-109" -> "70316-109")
+NORMALIZATION_PATTERN = re.compile(
+    r"(?P<comma>\s+,)|(?P<space>\s{2,}|[^\S ])|(?<=\s\d\d)(?P<dot>\.)"
+)
+
+# The same rewrites as separate patterns with constant replacements. Applied
+# in this order they give the same text as NORMALIZATION_PATTERN, and each
+# substitution runs entirely in C.
+COMMA_SPACING_PATTERN = re.compile(r"\s+,")
+EXTRA_SPACES_PATTERN = re.compile(r"\s{2,}|[^\S ]")
+NUMBER_DOT_PATTERN = re.compile(r"(?<=\s\d\d)\.")
+
+
+def _breakpoints(text):
+    """
+    Returns the (normalized_offset, original_offset) breakpoints of normalizing text.
+    """
+    breakpoints = [(0, 0)]
+    normalized_length = 0
+    position = 0
+    for match in NORMALIZATION_PATTERN.finditer(text):
+        start, end = match.span()
+        # Commas and whitespace runs become one character, dots are dropped
+        replacement_length = 0 if match.lastgroup == "dot" else 1
+
+        # The replacement is aligned with the end of the rewritten text
+        normalized_length += start - position
+        breakpoints.append((normalized_length, end - replacement_length))
+        normalized_length += replacement_length
+        position = end
+    return breakpoints
+
+
+class NormalizedText:
+    """
+    A normalized text and the map from its offsets to the original text.
+
+    The map is stored as breakpoints, one per rewrite, so it stays small no
+    matter how long the text is. Without breakpoints it is built from the
+    original text the first time an offset is mapped, so callers that only
+    need the text never pay for it.
+
+    Args:
+        text (str): The normalized text
+        breakpoints (list): (normalized_offset, original_offset) pairs where
+                            the alignment between both texts changes
+        original (str): The original text, to build the breakpoints lazily
+    """
+
+    def __init__(self, text, breakpoints=None, original=None):
+        if breakpoints is None and original is None:
+            raise ValueError("Pass the breakpoints or the original text")
+        self.text = text
+        self._original = original
+        self._normalized_offsets = None
+        self._original_offsets = None
+        if breakpoints is not None:
+            self._set_breakpoints(breakpoints)
+
+    def _set_breakpoints(self, breakpoints):
+        self._normalized_offsets = [normalized for normalized, _ in breakpoints]
+        self._original_offsets = [original for _, original in breakpoints]
+
+    def to_original(self, offset):
+        """
+        Maps an offset of the normalized text to the original text.
+        """
+        if self._normalized_offsets is None:
+            self._set_breakpoints(_breakpoints(self._original))
+        index = bisect_right(self._normalized_offsets, offset) - 1
+        return self._original_offsets[index] + offset - self._normalized_offsets[index]
+
+    def to_original_span(self, start, end):
+        """
+        Maps a (start, end) span of the normalized text to the original text.
+        """
+        if end <= start:
+            original_start = self.to_original(start)
+            return original_start, original_start
+        return self.to_original(start), self.to_original(end - 1) + 1
+
+    def to_original_spans(self, spans):
+        """
+        Maps (start, end, pii_type) spans of the normalized text to the original text.
+        """
+        return [(*self.to_original_span(start, end), pii_type) for start, end, pii_type in spans]
+
+
+def normalize_text(text):
+    """
+    Applies every preprocessing rewrite.
+
+    Equivalent to remove_extra_spaces_regex, then fix_comma_spacing_regex,
+    then removing the dot in "(\\s\\d\\d)\\.". The text is rewritten by
+    three C-level substitutions, which is faster than one pass collecting
+    the offsets in Python. The offset map costs a second scan of the text,
+    made only when a span is first mapped back to the original text
+    (mask_original=True).
+
+    Args:
+        text (str): The original text
+
+    Returns:
+        NormalizedText: The normalized text with its offset map
+    """
+    normalized = COMMA_SPACING_PATTERN.sub(",", text)
+    normalized = EXTRA_SPACES_PATTERN.sub(" ", normalized)
+    normalized = NUMBER_DOT_PATTERN.sub("", normalized)
+    return NormalizedText(normalized, original=text)
@@ -0,0 +1,204 @@
+"""
+Multi-process corpus processing with one model per worker.
+"""
+import multiprocessing
+import os
+from collections import deque
+from functools import partial
+
+from .cache import ResultCache
+from .core import process_driver_texts, warm_up
+from .entity_index import EntityIndex
+from .registry import DEFAULT_MODEL_NAME
+
+# Result cache, entity index and example selector of each worker process
+_worker_cache = None
+_worker_entity_index = None
+_worker_example_selector = None
+
+
+def _init_worker(model_name, torch_threads, stub, cache_path, entity_index_path, example_selector):
+    """
+    Loads the model once when a worker starts.
+    """
+    global _worker_cache, _worker_entity_index, _worker_example_selector
+
+    _worker_example_selector = example_selector
+
+    if cache_path:
+        _worker_cache = ResultCache(cache_path)
+    if entity_index_path:
+        _worker_entity_index = EntityIndex(entity_index_path)
+
+    if stub:
+        from .stub import use_stub_model
+
+        use_stub_model()
+
+    if torch_threads:
+        try:
+            import torch
+        except ImportError:
+            pass
+        else:
+            torch.set_num_threads(torch_threads)
+
+    warm_up(model_name)
+
+
+def _process_batch(texts, batch_size, model_name, window_size):
+    return process_driver_texts(
+        texts,
+        batch_size=batch_size,
+        model_name=model_name,
+        cache=_worker_cache,
+        window_size=window_size,
+        entity_index=_worker_entity_index,
+        example_selector=_worker_example_selector,
+    )
+
+
+class DriverTextPool:
+    """
+    Pool of worker processes running process_driver_texts.
+
+    Each worker loads the model once at start-up and uses its own share of the
+    CPU threads. Batches of texts are sharded across workers and results come
+    back in input order.
+
+    Args:
+        workers (int): Number of worker processes, one per CPU by default
+        torch_threads (int): Torch threads per worker, CPUs divided by workers by default
+        batch_size (int): Number of prompts generated together in a worker
+        model_name (str): Name of the model used for extraction
+        stub (bool): Whether the workers use the stub model instead of real weights
+        cache_path (str): SQLite result cache shared by the workers, if any
+        window_size (int): Texts longer than this are extracted from their best windows only
+        entity_index_path (str): SQLite index of known people shared by the workers, if any.
+                                 Each worker loads it at start-up and adds its own results.
+        example_selector: Selector of the worked examples embedded in each prompt,
+                          sent once to each worker at start-up
+    """
+
+    def __init__(
+        self,
+        workers=None,
+        torch_threads=None,
+        batch_size=8,
+        model_name=DEFAULT_MODEL_NAME,
+        stub=False,
+        cache_path=None,
+        window_size=None,
+        entity_index_path=None,
+        example_selector=None,
+    ):
+        cpu_count = os.cpu_count() or 1
+        self.workers = workers or cpu_count
+        self.torch_threads = torch_threads or max(1, cpu_count // self.workers)
+        self.batch_size = batch_size
+
+        # Torch is not fork-safe once initialized, so workers are spawned
+        context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(model_name, self.torch_threads, stub, cache_path, entity_index_path, example_selector),
+        )
+        self._process_batch = partial(
+            _process_batch,
+            batch_size=batch_size,
+            model_name=model_name,
+            window_size=window_size,
+        )
+
+    def imap(self, text_batches):
+        """
+        Processes batches of texts across the workers.
+
+        Args:
+            text_batches (iterable): Lists of texts, consumed lazily
+
+        Yields:
+            list: (extracted_details, masked_text, original_text) tuples for each batch, in input order
+        """
+        # Only a few batches per worker are in flight, so the input is not
+        # read ahead of the workers
+        max_in_flight = 2 * self.workers
+        in_flight = deque()
+        for texts in text_batches:
+            in_flight.append(self._pool.apply_async(self._process_batch, (texts,)))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().get()
+
+        while in_flight:
+            yield in_flight.popleft().get()
+
+    def map(self, texts):
+        """
+        Processes a list of texts across the workers.
+
+        Args:
+            texts (list): The texts containing driver details
+
+        Returns:
+            list: (extracted_details, masked_text, original_text) tuples in input order
+        """
+        text_batches = [
+            texts[start:start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        return [result for batch in self.imap(text_batches) for result in batch]
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def process_driver_texts_parallel(
+    texts,
+    workers=None,
+    torch_threads=None,
+    batch_size=8,
+    model_name=DEFAULT_MODEL_NAME,
+    stub=False,
+    cache_path=None,
+    window_size=None,
+    entity_index_path=None,
+    example_selector=None,
+):
+    """
+    Parallel version of process_driver_texts using worker processes.
+
+    Args:
+        texts (list): The texts containing driver details
+        workers (int): Number of worker processes, one per CPU by default
+        torch_threads (int): Torch threads per worker, CPUs divided by workers by default
+        batch_size (int): Number of prompts generated together in a worker
+        model_name (str): Name of the model used for extraction
+        stub (bool): Whether the workers use the stub model instead of real weights
+        cache_path (str): SQLite result cache shared by the workers, if any
+        window_size (int): Texts longer than this are extracted from their best windows only
+        entity_index_path (str): SQLite index of known people shared by the workers, if any
+        example_selector: Selector of the worked examples embedded in each prompt
+
+    Returns:
+        list: (extracted_details, masked_text, original_text) tuples in input order
+    """
+    with DriverTextPool(
+        workers,
+        torch_threads,
+        batch_size,
+        model_name,
+        stub,
+        cache_path,
+        window_size,
+        entity_index_path,
+        example_selector,
+    ) as pool:
+        return pool.map(texts)
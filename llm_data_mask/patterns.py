@@ -0,0 +1,149 @@
+"""
+Deterministic extraction of the DriverDetails fields that follow rigid
+Brazilian formats (CPF, CEP, RG and phone number), plus the driver name when
+the qualification paragraph follows the usual "NAME, brasileiro" layout.
+"""
+import re
+
+# Area codes (DDD) in use in Brazil
+VALID_DDDS = frozenset(
+    [11, 12, 13, 14, 15, 16, 17, 18, 19, 21, 22, 24, 27, 28]
+    + [31, 32, 33, 34, 35, 37, 38, 41, 42, 43, 44, 45, 46, 47, 48, 49]
+    + [51, 53, 54, 55, 61, 62, 63, 64, 65, 66, 67, 68, 69]
+    + [71, 73, 74, 75, 77, 79, 81, 82, 83, 84, 85, 86, 87, 88, 89]
+    + [91, 92, 93, 94, 95, 96, 97, 98, 99]
+)
+
+CPF_PATTERN = re.compile(r"(?<![\d.])\d{3}\.?\d{3}\.?\d{3}-?\d{2}(?![\d-])")
+CEP_PATTERN = re.compile(
+    r"\bCEP\s*(?:n\.?\s*[°º]?\s*)?:?\s*(\d{2}\.?\d{3}-?\d{3})(?![\d-])",
+    re.IGNORECASE,
+)
+RG_PATTERN = re.compile(
+    r"\bRG\s*(?:n\.?\s*[°º]?\s*)?:?\s*(\d[\d.\-]{4,}[\dxX](?:\s+[A-Z]{2,6}/[A-Z]{2})?)"
+)
+PHONE_PATTERN = re.compile(r"(?<![\d\w])\(?\d{2}\)?\s?(?:9\s?)?\d{4}-?\s?\d{4}(?![\d-])")
+NAME_PATTERN = re.compile(
+    r"(?<![\w])([A-ZÀ-Ý][A-ZÀ-Ý']+(?: (?:[A-ZÀ-Ý][A-ZÀ-Ý']*))+),\s*brasileir[oa]\b"
+)
+
+
+def digits_only(value):
+    """
+    Removes every non-digit character from a string.
+
+    Args:
+        value (str): The string to process
+
+    Returns:
+        str: The digits of value, in order
+    """
+    return "".join(char for char in value if char.isdigit())
+
+
+def is_valid_cpf(cpf):
+    """
+    Validates the two check digits of a CPF.
+
+    Args:
+        cpf (str): The CPF, with or without punctuation
+
+    Returns:
+        bool: True if the CPF has 11 digits and valid check digits
+    """
+    digits = [int(char) for char in digits_only(cpf)]
+    if len(digits) != 11 or len(set(digits)) == 1:
+        return False
+
+    for length in (9, 10):
+        total = sum(digit * (length + 1 - i) for i, digit in enumerate(digits[:length]))
+        if (total * 10) % 11 % 10 != digits[length]:
+            return False
+    return True
+
+
+def is_valid_phonenumber(phonenumber):
+    """
+    Validates a Brazilian phone number with area code.
+
+    Landlines have 10 digits and mobiles have 11 digits starting with 9
+    after the area code.
+
+    Args:
+        phonenumber (str): The phone number, with or without punctuation
+
+    Returns:
+        bool: True if the number has a valid DDD and length
+    """
+    digits = digits_only(phonenumber)
+    if len(digits) not in (10, 11) or int(digits[:2]) not in VALID_DDDS:
+        return False
+    if len(digits) == 11:
+        return digits[2] == "9"
+    # Landlines start with 2-5
+    return digits[2] in "2345"
+
+
+def is_valid_cep(cep):
+    """
+    Validates that a CEP has exactly 8 digits.
+    """
+    return len(digits_only(cep)) == 8
+
+
+def _unique(candidates):
+    """
+    Returns the only distinct candidate, or None if there are zero or several.
+    """
+    distinct = set(candidates)
+    if len(distinct) == 1:
+        return distinct.pop()
+    return None
+
+
+def extract_fast_fields(text):
+    """
+    Extracts the DriverDetails fields that can be resolved without a model.
+
+    A field is only returned when exactly one distinct valid candidate is
+    found, so the values are verbatim substrings of text and can be masked
+    with mask_pii as usual.
+
+    Args:
+        text (str): The preprocessed text containing driver details
+
+    Returns:
+        dict: The resolved fields, a subset of the DriverDetails keys
+    """
+    fields = {}
+
+    name = _unique(match.group(1) for match in NAME_PATTERN.finditer(text))
+    if name:
+        fields["name"] = name
+
+    rg = _unique(match.group(1) for match in RG_PATTERN.finditer(text))
+    if rg:
+        fields["RG"] = rg
+
+    cpf = _unique(
+        match.group(0) for match in CPF_PATTERN.finditer(text) if is_valid_cpf(match.group(0))
+    )
+    if cpf:
+        fields["CPF"] = cpf
+
+    cep = _unique(
+        match.group(1) for match in CEP_PATTERN.finditer(text) if is_valid_cep(match.group(1))
+    )
+    if cep:
+        fields["CEP"] = cep
+
+    phonenumber = _unique(
+        match.group(0).strip()
+        for match in PHONE_PATTERN.finditer(text)
+        if is_valid_phonenumber(match.group(0))
+        and not (cpf and match.group(0) in cpf)
+    )
+    if phonenumber:
+        fields["phonenumber"] = phonenumber
+
+    return fields
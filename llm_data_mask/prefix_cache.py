@@ -0,0 +1,233 @@
+"""
+Reuse of the key/value cache of a fixed prompt prefix.
+
+Most of the extraction prompt (instructions and worked examples) is the same
+for every record. For the transformers backend the prefix is encoded once per
+model and its key/value cache is handed to generate(), so each record only
+prefills its own suffix tokens.
+
+The helpers reaching the transformers model behind an outlines model, and
+counting the tokens it reads and produces, live here too.
+"""
+import copy
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Room for the prefixes of every field subset and selection of examples in use
+DEFAULT_MAX_PREFIXES = 16
+
+
+def hf_parts(model):
+    """
+    Returns the transformers model and tokenizer behind an outlines model.
+
+    Returns:
+        tuple: (hf_model, hf_tokenizer), or (None, None) for other backends
+    """
+    hf_model = getattr(model, "model", None)
+    tokenizer = getattr(model, "tokenizer", None)
+    hf_tokenizer = getattr(tokenizer, "tokenizer", None)
+    if hf_model is None or hf_tokenizer is None or not hasattr(hf_model, "generate"):
+        return None, None
+    return hf_model, hf_tokenizer
+
+
+def count_tokens(model, texts):
+    """
+    Counts the tokens of texts with the tokenizer of model.
+
+    Returns:
+        int: The total number of tokens, or None for backends without a transformers tokenizer
+    """
+    _, hf_tokenizer = hf_parts(model)
+    if hf_tokenizer is None:
+        return None
+    return sum(len(ids) for ids in hf_tokenizer(list(texts)).input_ids)
+
+
+class GeneratedTokens:
+    """
+    Number of tokens produced by generate(), see count_generated_tokens.
+    """
+
+    def __init__(self):
+        self.tokens = 0
+
+
+@contextmanager
+def count_generated_tokens(model):
+    """
+    Counts the tokens the transformers generate() of model produces inside the block.
+
+    Padding of the rows that stopped early is not counted.
+
+    Args:
+        model: An outlines model
+
+    Yields:
+        GeneratedTokens: The running count, or None for other backends
+    """
+    hf_model, _ = hf_parts(model)
+    if hf_model is None:
+        yield None
+        return
+
+    counter = GeneratedTokens()
+    original_generate = hf_model.generate
+
+    def generate(*args, input_ids=None, **kwargs):
+        output = original_generate(*args, input_ids=input_ids, **kwargs)
+        sequences = getattr(output, "sequences", output)
+        generated = sequences[:, input_ids.shape[1]:] if input_ids is not None else sequences
+        pad_token_id = kwargs.get("pad_token_id", getattr(hf_model.generation_config, "pad_token_id", None))
+        if pad_token_id is None:
+            counter.tokens += generated.numel()
+        else:
+            counter.tokens += int((generated != pad_token_id).sum())
+        return output
+
+    patched_instance = "generate" in vars(hf_model)
+    hf_model.generate = generate
+    try:
+        yield counter
+    finally:
+        if patched_instance:
+            hf_model.generate = original_generate
+        else:
+            del hf_model.generate
+
+
+def _move_padding_after_prefix(input_ids, attention_mask, prefix_ids):
+    """
+    Moves the left padding of each prompt to just after the prefix tokens.
+
+    Every row then starts with the prefix, so they can share its key/value
+    cache. Padding stays masked out, and the positions generate() derives
+    from the attention mask are those of the unpadded prompts.
+
+    Returns:
+        tuple: (input_ids, attention_mask), or None when a row is not
+               left-padded or does not start with the prefix
+    """
+    import torch
+
+    length = prefix_ids.shape[1]
+    rows, masks = [], []
+    for row, mask in zip(input_ids, attention_mask):
+        padding = int((mask == 0).sum())
+        if not bool(mask[padding:].all()) or row.shape[0] - padding <= length:
+            return None
+        if not bool((row[padding:padding + length] == prefix_ids[0]).all()):
+            return None
+        rows.append(torch.cat([row[padding:padding + length], row[:padding], row[padding + length:]]))
+        masks.append(torch.cat([mask[padding:padding + length], mask[:padding], mask[padding + length:]]))
+    return torch.stack(rows), torch.stack(masks)
+
+
+class PrefixCache:
+    """
+    Key/value caches of prompt prefixes, kept per model in LRU order.
+
+    Args:
+        max_prefixes (int): Maximum number of (model, prefix) caches kept
+        enabled (bool): Whether generation reuses prefix caches at all
+    """
+
+    def __init__(self, max_prefixes=DEFAULT_MAX_PREFIXES, enabled=True):
+        self.max_prefixes = max_prefixes
+        self.enabled = enabled
+        self._entries = OrderedDict()  # (id(hf_model), prefix) -> (prefix_ids, past_key_values)
+        self._lock = threading.RLock()
+
+    def _encode(self, hf_model, hf_tokenizer, prefix):
+        import torch
+
+        key = (id(hf_model), prefix)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+
+        prefix_ids = hf_tokenizer(prefix, return_tensors="pt").input_ids.to(hf_model.device)
+        with torch.inference_mode():
+            output = hf_model(input_ids=prefix_ids, use_cache=True)
+
+        entry = (prefix_ids, output.past_key_values)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_prefixes:
+            self._entries.popitem(last=False)
+        return entry
+
+    def preload(self, model, prefix):
+        """
+        Encodes prefix on model ahead of the first generation.
+        """
+        hf_model, hf_tokenizer = hf_parts(model)
+        if self.enabled and hf_model is not None:
+            with self._lock:
+                self._encode(hf_model, hf_tokenizer, prefix)
+
+    @contextmanager
+    def reuse(self, model, prefix):
+        """
+        Makes generation on model reuse the key/value cache of prefix.
+
+        Inside the block, calls to the underlying transformers generate()
+        whose prompts all start with the prefix tokens receive a copy of the
+        prefix cache. In left-padded batches the padding is moved after the
+        prefix first. Any other call, or a model from another backend,
+        generates as usual.
+
+        Args:
+            model: An outlines model
+            prefix (str): The prompt prefix shared by the prompts
+        """
+        hf_model, hf_tokenizer = hf_parts(model)
+        if not self.enabled or hf_model is None:
+            yield
+            return
+
+        with self._lock:
+            prefix_ids, past_key_values = self._encode(hf_model, hf_tokenizer, prefix)
+            original_generate = hf_model.generate
+
+            def generate(*args, input_ids=None, **kwargs):
+                reusable = False
+                if input_ids is not None and "past_key_values" not in kwargs:
+                    attention_mask = kwargs.get("attention_mask")
+                    if attention_mask is not None:
+                        moved = _move_padding_after_prefix(input_ids, attention_mask, prefix_ids)
+                        if moved is not None:
+                            input_ids, kwargs["attention_mask"] = moved
+                            reusable = True
+                    else:
+                        length = prefix_ids.shape[1]
+                        reusable = input_ids.shape[1] > length and bool((input_ids[:, :length] == prefix_ids).all())
+                if reusable:
+                    cache = copy.deepcopy(past_key_values)
+                    if input_ids.shape[0] > 1:
+                        cache.batch_repeat_interleave(input_ids.shape[0])
+                    kwargs["past_key_values"] = cache
+                return original_generate(*args, input_ids=input_ids, **kwargs)
+
+            patched_instance = "generate" in vars(hf_model)
+            hf_model.generate = generate
+            try:
+                yield
+            finally:
+                if patched_instance:
+                    hf_model.generate = original_generate
+                else:
+                    del hf_model.generate
+
+    def clear(self):
+        """
+        Drops every cached prefix.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+# Prefix caches shared by the whole process
+default_prefix_cache = PrefixCache()
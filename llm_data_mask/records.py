@@ -0,0 +1,156 @@
+"""
+Streaming record input/output with resumable checkpoints.
+
+Records are read lazily from JSON arrays or JSONL files, results are appended
+to a JSONL file as soon as they are produced, and a checkpoint records how far
+the run got so a rerun skips the records already done.
+"""
+import json
+import os
+
+READ_CHUNK_SIZE = 1 << 16
+
+
+def _iter_json_array(f):
+    """
+    Yields the elements of a top-level JSON array without loading the whole file.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        # Skip whitespace and separators
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The element continues in the next chunk
+                if eof:
+                    raise
+            else:
+                # A number at the end of the buffer might be incomplete
+                if end < len(buffer) or eof:
+                    yield item
+                    position = end
+                    continue
+
+        if eof:
+            if started:
+                raise ValueError("Unterminated JSON array")
+            return
+
+        chunk = f.read(READ_CHUNK_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_records(path):
+    """
+    Lazily reads records from a JSON array file or a JSONL file.
+
+    Args:
+        path (str): Path to a .json file holding an array, or a .jsonl file
+
+    Yields:
+        The records, in file order
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(f)
+
+
+def read_checkpoint(checkpoint_path):
+    """
+    Reads a checkpoint written by ResultWriter.
+
+    Args:
+        checkpoint_path (str): Path to the checkpoint file
+
+    Returns:
+        dict: {"records": records done, "output_offset": bytes of output written}
+    """
+    if not os.path.exists(checkpoint_path):
+        return {"records": 0, "output_offset": 0}
+
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ResultWriter:
+    """
+    Appends results to a JSONL file and checkpoints the progress.
+
+    On resume the output is truncated to the last checkpoint, so results of
+    records that were written after it (and will be processed again) are not
+    duplicated.
+
+    Args:
+        output_path (str): Path to the JSONL output file
+        checkpoint_path (str): Path to the checkpoint file, output_path + ".checkpoint" by default
+        resume (bool): Whether to continue from an existing checkpoint
+    """
+
+    def __init__(self, output_path, checkpoint_path=None, resume=True):
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path or output_path + ".checkpoint"
+
+        checkpoint = read_checkpoint(self.checkpoint_path) if resume else {}
+        self.records_done = checkpoint.get("records", 0)
+        output_offset = checkpoint.get("output_offset", 0)
+
+        self._file = open(output_path, "ab" if resume else "wb")
+        self._file.truncate(output_offset)
+        self._file.seek(output_offset)
+
+    def write(self, result):
+        """
+        Writes one result as a JSONL line.
+        """
+        line = json.dumps(result, ensure_ascii=False) + "\n"
+        self._file.write(line.encode("utf-8"))
+
+    def checkpoint(self, records_done):
+        """
+        Flushes the output and records that records_done input records are finished.
+
+        Args:
+            records_done (int): Number of input records processed so far, skipped ones included
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.records_done = records_done
+
+        temporary_path = self.checkpoint_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump({"records": records_done, "output_offset": self._file.tell()}, f)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,210 @@
+"""
+Process-wide registry of loaded models and compiled structured generators.
+
+Loading model weights and compiling an output schema into a generator is far
+more expensive than a single generation, so both are kept alive here and
+shared by every caller in the process.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from .metrics import logger
+
+# Environment variables selecting the model and its CPU profile
+MODEL_NAME_VARIABLE = "LLM_DATA_MASK_MODEL"
+CPU_PROFILE_VARIABLE = "LLM_DATA_MASK_CPU_PROFILE"
+
+DEFAULT_MODEL_NAME = os.environ.get(MODEL_NAME_VARIABLE) or "Qwen/Qwen2.5-1.5B-Instruct"
+# Other models that were tried with the extraction prompt, selectable with
+# LLM_DATA_MASK_MODEL:
+# "Qwen/Qwen2.5-0.5B-Instruct"
+# "Qwen/Qwen2.5-3B-Instruct"
+# "HuggingFaceTB/SmolLM2-1.7B-Instruct"
+# "meta-llama/Llama-3.2-3B-Instruct"
+
+# Default memory budget for loaded model weights (8 GiB)
+DEFAULT_MEMORY_BUDGET = 8 * 1024 ** 3
+
+
+def estimate_model_size(model):
+    """
+    Estimates the memory footprint of a loaded model in bytes.
+
+    Args:
+        model: An outlines model wrapping a transformers model
+
+    Returns:
+        int: Size of the model parameters and buffers in bytes, 0 if unknown
+    """
+    hf_model = getattr(model, "model", None)
+    if hf_model is None or not hasattr(hf_model, "parameters"):
+        return 0
+
+    size = 0
+    for tensor in list(hf_model.parameters()) + list(hf_model.buffers()):
+        size += tensor.numel() * tensor.element_size()
+    return size
+
+
+def _load_transformers_model(model_name):
+    # A CPU profile named in the environment takes over the loading
+    profile_name = os.environ.get(CPU_PROFILE_VARIABLE)
+    if profile_name:
+        from .cpu_profile import get_cpu_profile
+
+        return get_cpu_profile(profile_name).load_model(model_name)
+
+    import outlines
+
+    return outlines.models.transformers(model_name)
+
+
+def _build_json_generator(model, schema):
+    import outlines
+
+    # Transformers models reuse the compiled guide from the on-disk cache
+    if type(model).__name__ == "Transformers":
+        from .guide_cache import build_cached_json_generator, is_supported_outlines
+
+        if is_supported_outlines():
+            return build_cached_json_generator(model, schema)
+        logger.info("Guide cache unavailable for this outlines version, compiling the guide")
+
+    return outlines.generate.json(model, schema)
+
+
+class ModelRegistry:
+    """
+    Keeps models and generators keyed by model name and output schema.
+
+    Models are evicted in least-recently-used order once the total size of
+    the loaded weights exceeds the memory budget. Evicting a model also drops
+    every generator compiled against it.
+
+    Args:
+        memory_budget (int): Maximum bytes of model weights kept loaded
+        model_loader (callable): Function that loads a model from its name
+        generator_builder (callable): Function that builds a generator from
+                                      a model and a pydantic schema
+    """
+
+    def __init__(
+        self,
+        memory_budget=DEFAULT_MEMORY_BUDGET,
+        model_loader=_load_transformers_model,
+        generator_builder=_build_json_generator,
+    ):
+        self.memory_budget = memory_budget
+        self.model_loader = model_loader
+        self.generator_builder = generator_builder
+        self._models = OrderedDict()  # model_name -> (model, size)
+        self._generators = {}  # (model_name, schema) -> generator
+        self._lock = threading.RLock()
+
+    def get_model(self, model_name=DEFAULT_MODEL_NAME):
+        """
+        Returns the loaded model for model_name, loading it on first use.
+        """
+        with self._lock:
+            if model_name in self._models:
+                self._models.move_to_end(model_name)
+                return self._models[model_name][0]
+
+            model = self.model_loader(model_name)
+            self._models[model_name] = (model, estimate_model_size(model))
+            self._evict(keep=model_name)
+            return model
+
+    def get_generator(self, schema, model_name=DEFAULT_MODEL_NAME):
+        """
+        Returns the structured generator for schema on model_name.
+
+        Args:
+            schema: Pydantic model class describing the output
+            model_name (str): Name of the model to generate with
+
+        Returns:
+            The compiled generator, built on first use
+        """
+        with self._lock:
+            model = self.get_model(model_name)
+            key = (model_name, schema)
+            generator = self._generators.get(key)
+            if generator is None:
+                generator = self.generator_builder(model, schema)
+                self._generators[key] = generator
+            return generator
+
+    def preload(self, model_names=(DEFAULT_MODEL_NAME,), schemas=()):
+        """
+        Loads models and compiles generators ahead of the first request.
+
+        Args:
+            model_names (iterable): Names of the models to load
+            schemas (iterable): Pydantic model classes to compile for each model
+        """
+        for model_name in model_names:
+            self.get_model(model_name)
+            for schema in schemas:
+                self.get_generator(schema, model_name)
+
+    def set_memory_budget(self, memory_budget):
+        """
+        Changes the memory budget, evicting models that no longer fit.
+        """
+        with self._lock:
+            self.memory_budget = memory_budget
+            self._evict()
+
+    def loaded_models(self):
+        """
+        Returns the names of the loaded models, least recently used first.
+        """
+        with self._lock:
+            return list(self._models)
+
+    def clear(self):
+        """
+        Drops every loaded model and generator.
+        """
+        with self._lock:
+            self._models.clear()
+            self._generators.clear()
+
+    def _evict(self, keep=None):
+        total = sum(size for _, size in self._models.values())
+        for model_name in list(self._models):
+            if total <= self.memory_budget:
+                break
+            if model_name == keep:
+                continue
+            _, size = self._models.pop(model_name)
+            total -= size
+            for key in [key for key in self._generators if key[0] == model_name]:
+                del self._generators[key]
+
+
+# Registry shared by the whole process
+default_registry = ModelRegistry()
+
+
+def get_model(model_name=DEFAULT_MODEL_NAME):
+    """
+    Returns a model from the default registry.
+    """
+    return default_registry.get_model(model_name)
+
+
+def get_generator(schema, model_name=DEFAULT_MODEL_NAME):
+    """
+    Returns a structured generator from the default registry.
+    """
+    return default_registry.get_generator(schema, model_name)
+
+
+def preload(model_names=(DEFAULT_MODEL_NAME,), schemas=()):
+    """
+    Warms up the default registry with models and generators.
+    """
+    default_registry.preload(model_names, schemas)
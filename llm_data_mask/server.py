@@ -0,0 +1,379 @@
+"""
+Local HTTP service around the extraction and masking functions.
+
+The model is loaded once when the server starts. Concurrent /process
+requests are gathered by a scheduler into micro-batches, each generated with
+one process_driver_texts call: a batch is sent as soon as it is full or the
+oldest request in it has waited max_wait seconds. Requests beyond the queue
+depth limit are rejected with 503 instead of piling up.
+
+Endpoints:
+    POST /process   {"text"} -> {"mapping", "masked_text", "original_text"}
+    POST /mask      {"text", "pii_dict", "mask_format"?} -> {"masked_text"}
+    POST /unmask    {"masked_text", "pii_dict", "mask_format"?} -> {"text"}
+    GET  /metrics   Prometheus text, or JSON with ?format=json
+    GET  /health    {"status", "queue_depth"}
+"""
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .core import process_driver_texts, warm_up
+from .helpers import mask_pii, unmask_pii
+from .metrics import METRIC_PREFIX, default_metrics, enable_metrics, logger
+from .registry import DEFAULT_MODEL_NAME
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+DEFAULT_MAX_BATCH_SIZE = 8
+# Longest a request waits for others to join its batch
+DEFAULT_MAX_WAIT = 0.01
+DEFAULT_MAX_QUEUE = 256
+# Longest a request waits for its result before a 504
+DEFAULT_REQUEST_TIMEOUT = 300
+
+# Largest request body accepted
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class QueueFull(Exception):
+    """
+    Raised when a request arrives while the scheduler queue is at its limit.
+    """
+
+
+class MicroBatcher:
+    """
+    Gathers items submitted from many threads into batches for one worker thread.
+
+    Args:
+        process_batch (callable): Function called with a list of items,
+                                  returning one result per item in order
+        max_batch_size (int): Maximum number of items per batch
+        max_wait (float): Seconds the oldest item of a batch waits for more items
+        max_queue (int): Maximum number of items waiting, beyond which submit
+                         raises QueueFull
+    """
+
+    def __init__(
+        self,
+        process_batch,
+        max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+        max_wait=DEFAULT_MAX_WAIT,
+        max_queue=DEFAULT_MAX_QUEUE,
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="llm_data_mask-batcher", daemon=True)
+        self._thread.start()
+
+    def queue_depth(self):
+        """
+        Returns the number of items waiting for a batch.
+        """
+        return self._queue.qsize()
+
+    def submit(self, item):
+        """
+        Queues an item for the next batch.
+
+        Returns:
+            Future: Resolved with the result of the item
+
+        Raises:
+            QueueFull: If max_queue items are already waiting
+        """
+        if self._closed:
+            raise RuntimeError("The batcher is closed")
+
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except queue.Full:
+            default_metrics.increment("server_rejected")
+            raise QueueFull(f"{self._queue.maxsize} requests already waiting") from None
+        return future
+
+    def _next_batch(self):
+        """
+        Waits for an item, then for more items until the batch is full or
+        the first item's deadline passes. Returns None once closed.
+        """
+        entry = self._queue.get()
+        if entry is None:
+            return None
+
+        batch = [entry]
+        deadline = entry[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            started = time.perf_counter()
+            for _, _, queued in batch:
+                default_metrics.observe("server_queue_wait", started - queued)
+            default_metrics.increment("server_batches")
+            default_metrics.increment("server_batched_requests", len(batch))
+
+            items = [item for item, _, _ in batch]
+            try:
+                with default_metrics.timer("server_batch"):
+                    results = self.process_batch(items)
+            except Exception as error:
+                logger.exception("Batch of %d requests failed", len(batch))
+                for _, future, _ in batch:
+                    future.set_exception(error)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def close(self):
+        """
+        Processes the items already queued, then stops the worker thread.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+
+class _RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MaskingRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the endpoints of a MaskingServer.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if not isinstance(body, str):
+            body = json.dumps(body, ensure_ascii=False)
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body can't be delimited, so neither can the next request
+            self.close_connection = True
+            raise _RequestError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_SIZE:
+            # The unread body would be taken for the next request
+            self.close_connection = True
+            raise _RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            raise _RequestError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON") from None
+        if not isinstance(body, dict):
+            raise _RequestError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+        return body
+
+    @staticmethod
+    def _field(body, name, kind=str, default=None):
+        value = body.get(name, default)
+        if not isinstance(value, kind):
+            raise _RequestError(HTTPStatus.BAD_REQUEST, f"'{name}' must be a {kind.__name__}")
+        return value
+
+    def _handle(self, endpoint, handler):
+        start = time.perf_counter()
+        try:
+            status, body, headers = handler()
+        except _RequestError as error:
+            status, body, headers = error.status, {"error": str(error)}, None
+        except QueueFull as error:
+            status, body, headers = HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(error)}, {"Retry-After": "1"}
+        except FutureTimeoutError:
+            status, body, headers = HTTPStatus.GATEWAY_TIMEOUT, {"error": "Request timed out"}, None
+        except Exception:
+            logger.exception("Request to %s failed", endpoint)
+            status, body, headers = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal error"}, None
+
+        content_type = "application/json"
+        if isinstance(body, str):
+            content_type = "text/plain; version=0.0.4"
+        self._send(status, body, content_type, headers)
+
+        default_metrics.observe(f"server_request_{endpoint}", time.perf_counter() - start)
+        default_metrics.increment(f"server_responses_{int(status)}")
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        handlers = {
+            "/process": self._process,
+            "/mask": self._mask,
+            "/unmask": self._unmask,
+        }
+        if path not in handlers:
+            self.close_connection = True
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint {path}"})
+            return
+        self._handle(path.strip("/"), handlers[path])
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            self._handle("metrics", lambda: self._metrics(parse_qs(url.query)))
+        elif url.path == "/health":
+            self._handle("health", self._health)
+        else:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint {url.path}"})
+
+    def _process(self):
+        text = self._field(self._read_json(), "text")
+        future = self.server.batcher.submit(text)
+        mapping, masked_text, original_text = future.result(timeout=self.server.request_timeout)
+        return HTTPStatus.OK, {"mapping": mapping, "masked_text": masked_text, "original_text": original_text}, None
+
+    def _mask(self):
+        body = self._read_json()
+        text = self._field(body, "text")
+        pii_dict = self._field(body, "pii_dict", dict)
+        mask_format = self._field(body, "mask_format", str, "[{pii_type}]")
+        return HTTPStatus.OK, {"masked_text": mask_pii(text, pii_dict, mask_format)}, None
+
+    def _unmask(self):
+        body = self._read_json()
+        masked_text = self._field(body, "masked_text")
+        pii_dict = self._field(body, "pii_dict", dict)
+        mask_format = self._field(body, "mask_format", str, "[{pii_type}]")
+        return HTTPStatus.OK, {"text": unmask_pii(masked_text, pii_dict, mask_format)}, None
+
+    def _metrics(self, query):
+        queue_depth = self.server.batcher.queue_depth()
+        if query.get("format") == ["json"]:
+            return HTTPStatus.OK, dict(default_metrics.snapshot(), queue_depth=queue_depth), None
+
+        metric = f"{METRIC_PREFIX}server_queue_depth"
+        gauge = f"# TYPE {metric} gauge\n{metric} {queue_depth}\n"
+        return HTTPStatus.OK, default_metrics.to_prometheus() + gauge, None
+
+    def _health(self):
+        return HTTPStatus.OK, {"status": "ok", "queue_depth": self.server.batcher.queue_depth()}, None
+
+
+class MaskingServer(ThreadingHTTPServer):
+    """
+    HTTP server with a warm model and a micro-batching scheduler.
+
+    Args:
+        address (tuple): (host, port) to listen on, port 0 picks a free one
+        model_name (str): Name of the model used for extraction
+        max_batch_size (int): Maximum number of texts generated together
+        max_wait (float): Seconds a request waits for others to join its batch
+        max_queue (int): Maximum number of requests waiting, beyond which
+                         /process answers 503
+        request_timeout (float): Seconds a request waits for its result before a 504
+        mask_original (bool): Whether to mask the untouched input texts
+        cache (ResultCache): Cache of previous extractions, if any
+        window_size (int): Texts longer than this are extracted from their best windows only
+        entity_index (EntityIndex): Known people, matched before any extraction
+        example_selector: Selector of the worked examples embedded in each prompt
+    """
+
+    daemon_threads = True
+    # Connections waiting to be accepted, beyond which clients are reset
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        address=(DEFAULT_HOST, DEFAULT_PORT),
+        model_name=DEFAULT_MODEL_NAME,
+        max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+        max_wait=DEFAULT_MAX_WAIT,
+        max_queue=DEFAULT_MAX_QUEUE,
+        request_timeout=DEFAULT_REQUEST_TIMEOUT,
+        mask_original=False,
+        cache=None,
+        window_size=None,
+        entity_index=None,
+        example_selector=None,
+    ):
+        self.request_timeout = request_timeout
+
+        # Load the model before accepting requests
+        warm_up(model_name)
+
+        def process_batch(texts):
+            return process_driver_texts(
+                texts,
+                batch_size=max_batch_size,
+                model_name=model_name,
+                mask_original=mask_original,
+                cache=cache,
+                window_size=window_size,
+                entity_index=entity_index,
+                example_selector=example_selector,
+            )
+
+        super().__init__(address, MaskingRequestHandler)
+        self.batcher = MicroBatcher(process_batch, max_batch_size, max_wait, max_queue)
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, metrics=True, **options):
+    """
+    Runs a MaskingServer until interrupted.
+
+    Args:
+        host (str): Address to listen on
+        port (int): Port to listen on
+        metrics (bool): Whether to record the metrics served on /metrics
+        **options: MaskingServer options
+    """
+    if metrics:
+        enable_metrics()
+
+    with MaskingServer((host, port), **options) as server:
+        logger.info("Serving on http://%s:%d", *server.server_address[:2])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
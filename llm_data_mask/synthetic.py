@@ -0,0 +1,250 @@
+"""
+Synthetic Brazilian driver qualification paragraphs for tests and benchmarks.
+
+Every generated record is completely fake but follows the real formats:
+CPFs have valid check digits, phone numbers use valid area codes and the
+paragraphs carry the same noisy spacing and trailing petition text as the
+appeals the extraction runs on.
+"""
+import json
+import random
+
+from .patterns import VALID_DDDS
+
+FIRST_NAMES = [
+    "ANA", "BRENO", "CARLOS", "DANIELA", "EVELYN", "FELIPE", "GUSTAVO", "HELENA",
+    "IGOR", "JULIANA", "LAURA", "LEONARDO", "MARCOS", "NATALIA", "OTAVIO", "PAULO",
+    "RAFAELA", "SERGIO", "TATIANE", "VINICIUS",
+]
+MIDDLE_NAMES = [
+    "AUGUSTO", "CRISTINA", "EDSON", "FERNANDA", "GIOVANI", "HENRIQUE", "JOSEFA",
+    "LÍVIA", "SOPHIA", "YURI",
+]
+LAST_NAMES = [
+    "ALMEIDA", "ASSUNÇÃO", "BARBOSA", "CARVALHO", "DIAS", "FERREIRA", "GOMES",
+    "LEANDRO", "MAGALHAES DE OLIVEIRA", "PEREIRA", "RIBEIRO", "SANTANA SOUZA",
+    "SILVA", "VIANA",
+]
+PROFESSIONS = [
+    "advogado", "comerciante", "consultora de vendas", "funcionário público",
+    "professor", "servidor público", "supervisora administrativo",
+]
+STATES = ["AP", "CE", "DF", "GO", "MG", "PR", "RJ", "RS", "SC", "SP"]
+ADDRESSES = [
+    "Avenida Joaquim Coutinho, 201, Marabaixo, Macapá - AP",
+    "Av. Liberdade, Lotes 04/17, Quadra 204, Bloco M, Apt. 102, St Ivo, Santa Cecília-DF",
+    "Rua do Gelo, 453, Edson Queiroz, Fortaleza - CE, Brasil",
+    "Rua C, 706, Canindezinho, São Paulo - SP, Brasil",
+    "Quadra SQN 314 Bloco F, 898, Asa Norte, Brasília - DF, Brasil",
+    "SHS Quadra 06, Bloco C, 513, Ed. Brasil 21, DF - Brasília",
+]
+PETITION_SENTENCES = [
+    "vem respeitosamente à presença de Vossa Senhoria, através de seus procuradores (procuração anexa), interpor RECURSO À JARI - SUSPENSÃO DO DIREITO DE DIRIGIR.",
+    "Com base no artigo 265 do Código de Trânsito Brasileiro, conforme notificação anexa, o que faz da seguinte forma:",
+    "O recorrente foi notificado da instauração do processo administrativo em data posterior ao prazo legal.",
+    "Não houve a devida identificação do agente autuador, o que torna o auto de infração nulo de pleno direito.",
+    "Diante do exposto, requer o provimento do presente recurso, com o consequente arquivamento do processo.",
+    "Nestes termos, pede deferimento.",
+]
+
+
+def generate_cpf(rng, formatted=True):
+    """
+    Generates a CPF with valid check digits.
+
+    Args:
+        rng (random.Random): Source of randomness
+        formatted (bool): Whether to use the 000.000.000-00 format
+
+    Returns:
+        str: The CPF
+    """
+    digits = [rng.randrange(10) for _ in range(9)]
+    for length in (9, 10):
+        total = sum(digit * (length + 1 - i) for i, digit in enumerate(digits[:length]))
+        digits.append((total * 10) % 11 % 10)
+
+    cpf = "".join(map(str, digits))
+    if formatted:
+        return f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+    return cpf
+
+
+def generate_cep(rng):
+    """
+    Generates a CEP, sometimes with the 00.000-000 grouping.
+    """
+    cep = f"{rng.randrange(10 ** 8):08d}"
+    if rng.random() < 0.3:
+        return f"{cep[:2]}.{cep[2:5]}-{cep[5:]}"
+    return f"{cep[:5]}-{cep[5:]}"
+
+
+def generate_rg(rng):
+    """
+    Generates an RG number with its issuing body.
+    """
+    return f"{rng.randrange(10 ** 6, 10 ** 9)} SSP/{rng.choice(STATES)}"
+
+
+def generate_phonenumber(rng):
+    """
+    Generates a mobile or landline number with a valid area code.
+    """
+    ddd = rng.choice(sorted(VALID_DDDS))
+    if rng.random() < 0.2:
+        return f"({ddd}) {rng.randint(2, 5)}{rng.randrange(1000):03d}-{rng.randrange(10000):04d}"
+
+    number = f"{rng.randrange(10000):04d}-{rng.randrange(10000):04d}"
+    if rng.random() < 0.4:
+        return f"({ddd}) 9 {number}"
+    return f"({ddd}) 9{number}"
+
+
+def generate_name(rng):
+    """
+    Generates an upper-case full name.
+    """
+    parts = [rng.choice(FIRST_NAMES)]
+    parts += rng.sample(MIDDLE_NAMES, rng.randint(0, 2))
+    parts.append(rng.choice(LAST_NAMES))
+    return " ".join(parts)
+
+
+def _add_noise(text, rng, noise):
+    """
+    Adds doubled spaces, spaces before commas and line breaks.
+    """
+    if not noise:
+        return text
+
+    parts = []
+    for char in text:
+        if char == " " and rng.random() < noise:
+            parts.append(rng.choice(["  ", "\n", " \t "]))
+        elif char == "," and rng.random() < noise:
+            parts.append(" ,")
+        else:
+            parts.append(char)
+    return "".join(parts)
+
+
+def generate_record(rng, noise=0.1, trailing_sentences=(0, 2), unresolved=0.0):
+    """
+    Generates one qualification paragraph and the PII it contains.
+
+    Args:
+        rng (random.Random): Source of randomness
+        noise (float): Probability of a spacing glitch at each space or comma
+        trailing_sentences (tuple): Minimum and maximum number of petition
+                                    sentences appended after the paragraph
+        unresolved (float): Probability that the paragraph is written so the
+                            fast path can't resolve every field, leaving
+                            some to the model
+
+    Returns:
+        dict: {"text": paragraph, "mapping": DriverDetails values as written in the text}
+    """
+    gender = rng.choice(["o", "a"])
+    mapping = {
+        "name": generate_name(rng),
+        "RG": generate_rg(rng),
+        "CPF": generate_cpf(rng, formatted=rng.random() < 0.9),
+        "CEP": generate_cep(rng),
+        "phonenumber": generate_phonenumber(rng),
+    }
+
+    rg = f"portador{'a' if gender == 'a' else ''} {rng.choice(['da cédula de identidade RG', 'do RG n.°'])} {mapping['RG']}"
+    phone = f"celular{rng.choice([':', ''])} {mapping['phonenumber']}"
+    name = f"{mapping['name']}, brasileir{gender}"
+
+    # Layouts the patterns don't cover: no nationality after the name, no
+    # "RG" before the identity number, or a second phone in the paragraph
+    if unresolved and rng.random() < unresolved:
+        layout = rng.choice(["name", "rg", "phone"])
+        if layout == "name":
+            name = mapping["name"]
+        elif layout == "rg":
+            rg = f"portador{'a' if gender == 'a' else ''} da identidade n. {mapping['RG']}"
+        else:
+            phone += f", telefone comercial {generate_phonenumber(rng)}"
+    qualification = [
+        f"{rng.choice(PROFESSIONS)}",
+        f"CPF n. {mapping['CPF']}",
+        f"residente e domiciliad{gender} na {rng.choice(ADDRESSES)}",
+        f"CEP{rng.choice([':', ''])} {mapping['CEP']}",
+    ]
+
+    if rng.random() < 0.2:
+        parts = [rg, name, phone] + qualification
+    else:
+        parts = [name] + qualification[:1] + [rg] + qualification[1:] + [phone]
+
+    text = ", ".join(parts)
+    sentences = rng.randint(*trailing_sentences)
+    if sentences:
+        text += ", " + " ".join(rng.choice(PETITION_SENTENCES) for _ in range(sentences))
+
+    return {"text": _add_noise(text, rng, noise), "mapping": mapping}
+
+
+def generate_records(count, seed=0, noise=0.1, trailing_sentences=(0, 2), unresolved=0.0):
+    """
+    Generates a reproducible list of synthetic records.
+
+    Args:
+        count (int): Number of records
+        seed (int): Seed of the random generator
+        noise (float): Probability of a spacing glitch at each space or comma
+        trailing_sentences (tuple): Minimum and maximum number of petition sentences per record
+        unresolved (float): Share of records leaving some fields to the model, see generate_record
+
+    Returns:
+        list: Records as returned by generate_record
+    """
+    rng = random.Random(seed)
+    return [generate_record(rng, noise, trailing_sentences, unresolved) for _ in range(count)]
+
+
+def write_records(path, count, seed=0, noise=0.1, trailing_sentences=(0, 2)):
+    """
+    Writes synthetic records to a JSONL file readable by process_drivers.py.
+    """
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(count):
+            record = generate_record(rng, noise, trailing_sentences)
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def normalize_value(value):
+    """
+    Reduces a value to its letters and digits, for comparisons that ignore formatting.
+    """
+    return "".join(char for char in value.casefold() if char.isalnum())
+
+
+def field_accuracy(records, mappings):
+    """
+    Measures how many extracted fields match the synthetic ground truth.
+
+    Values are compared on their letters and digits only, since
+    preprocessing may change punctuation (e.g. the CEP grouping).
+
+    Args:
+        records (list): Records as returned by generate_record
+        mappings (list): Extracted mappings, one per record
+
+    Returns:
+        dict: Accuracy per field and overall, between 0 and 1
+    """
+    correct = {}
+    for record, mapping in zip(records, mappings):
+        for field, expected in record["mapping"].items():
+            actual = mapping.get(field) or ""
+            correct[field] = correct.get(field, 0) + (normalize_value(actual) == normalize_value(expected))
+
+    total = max(len(records), 1)
+    accuracy = {field: count / total for field, count in correct.items()}
+    accuracy["overall"] = sum(correct.values()) / max(total * len(correct), 1)
+    return accuracy
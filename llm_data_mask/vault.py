@@ -0,0 +1,263 @@
+"""
+Append-only store of PII mappings for reversible masking at corpus scale.
+
+Mappings are appended as compact JSON to a binary log, and a fixed-width
+index file holds the offset and length of each one. Document ids are the
+positions in the index, so an id or a range of ids is found without a search
+and read through a memory map without loading the rest of the vault.
+
+Masks written with the vault's mask format carry the document id, e.g.
+"[CPF@42]", so a masked text is restored from the vault alone.
+"""
+import json
+import mmap
+import os
+import re
+import struct
+
+from .helpers import mask_pii
+
+# Offset and length of each mapping in the log
+INDEX_ENTRY = struct.Struct("<QI")
+
+# Masks referencing a vault entry, as produced by mask_format
+VAULT_MASK_PATTERN = re.compile(r"\[(?P<pii_type>[^\[\]@]+)@(?P<doc_id>\d+)\]")
+
+
+class _MappedFile:
+    """
+    Read-only memory map of a file that keeps growing.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = None
+        self._size = 0
+
+    def view(self, end):
+        # Remap when the file grew past the mapped part
+        if end > self._size:
+            if self._map is not None:
+                self._map.close()
+            self._size = os.fstat(self._file.fileno()).st_size
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._size else None
+        if end > self._size:
+            raise IndexError("Read past the end of the vault")
+        return self._map
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class PIIVault:
+    """
+    PII mappings stored in <path>.log and indexed by document id in <path>.idx.
+
+    Args:
+        path (str): Path of the vault, without extension
+        readonly (bool): Whether to open the vault for reading only
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._log_path = f"{path}.log"
+        self._index_path = f"{path}.idx"
+
+        if not readonly:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._recover()
+            self._log = open(self._log_path, "ab")
+            self._index = open(self._index_path, "ab")
+        self._count = os.path.getsize(self._index_path) // INDEX_ENTRY.size
+        self._log_size = os.path.getsize(self._log_path)
+
+        self._log_map = _MappedFile(self._log_path)
+        self._index_map = _MappedFile(self._index_path)
+
+    def _recover(self):
+        """
+        Drops the partial writes of an interrupted run.
+
+        Both files are written through buffers, so after a crash either one
+        may hold entries the other lacks. Index entries pointing past the end
+        of the log are discarded, and so is any log data past the last
+        complete entry. The log is never extended.
+        """
+        for file_path in (self._log_path, self._index_path):
+            if not os.path.exists(file_path):
+                open(file_path, "wb").close()
+
+        log_size = os.path.getsize(self._log_path)
+        entries = os.path.getsize(self._index_path) // INDEX_ENTRY.size
+        log_end = 0
+        with open(self._index_path, "r+b") as index:
+            while entries:
+                index.seek((entries - 1) * INDEX_ENTRY.size)
+                offset, length = INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))
+                if offset + length <= log_size:
+                    log_end = offset + length
+                    break
+                entries -= 1
+            index.truncate(entries * INDEX_ENTRY.size)
+        with open(self._log_path, "r+b") as log:
+            log.truncate(log_end)
+
+    def __len__(self):
+        return self._count
+
+    def put(self, mapping):
+        """
+        Appends a mapping to the vault.
+
+        Args:
+            mapping (dict): The PII mapping of one document
+
+        Returns:
+            int: The document id of the mapping
+        """
+        if self.readonly:
+            raise PermissionError("The vault is open read-only")
+
+        payload = json.dumps(mapping, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._log.write(payload)
+        self._index.write(INDEX_ENTRY.pack(self._log_size, len(payload)))
+        self._log_size += len(payload)
+        self._count += 1
+        return self._count - 1
+
+    def flush(self):
+        """
+        Makes the appended mappings durable and visible to readers.
+        """
+        if not self.readonly:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._index.flush()
+            os.fsync(self._index.fileno())
+
+    def _entries(self, start, stop):
+        """
+        Returns the (offset, length) index entries of the ids in [start, stop).
+        """
+        if not self.readonly:
+            # Appended entries must reach the files before they are mapped
+            self._log.flush()
+            self._index.flush()
+        elif stop > self._count:
+            self._count = os.path.getsize(self._index_path) // INDEX_ENTRY.size
+
+        if not 0 <= start <= stop <= self._count:
+            raise IndexError(f"Document ids {start}:{stop} out of range (vault has {self._count})")
+        if start == stop:
+            return []
+
+        index = self._index_map.view(stop * INDEX_ENTRY.size)
+        return list(INDEX_ENTRY.iter_unpack(index[start * INDEX_ENTRY.size:stop * INDEX_ENTRY.size]))
+
+    def get(self, doc_id):
+        """
+        Reads the mapping of one document.
+
+        Args:
+            doc_id (int): The document id returned by put
+
+        Returns:
+            dict: The PII mapping
+        """
+        [mapping] = self.get_range(doc_id, doc_id + 1)
+        return mapping
+
+    def get_range(self, start, stop):
+        """
+        Reads the mappings of the document ids in [start, stop).
+
+        Only the part of the log holding those mappings is touched.
+
+        Returns:
+            list: The PII mappings, in id order
+        """
+        entries = self._entries(start, stop)
+        if not entries:
+            return []
+
+        log = self._log_map.view(entries[-1][0] + entries[-1][1])
+        return [json.loads(log[offset:offset + length]) for offset, length in entries]
+
+    @staticmethod
+    def mask_format(doc_id):
+        """
+        Returns the mask format whose masks reference the vault entry doc_id.
+        """
+        return f"[{{pii_type}}@{doc_id}]"
+
+    def mask(self, text, mapping):
+        """
+        Stores mapping and masks text with masks referencing it.
+
+        Returns:
+            tuple: (doc_id, masked_text)
+        """
+        doc_id = self.put(mapping)
+        return doc_id, mask_pii(text, mapping, self.mask_format(doc_id))
+
+    def unmask(self, masked_text, mappings=None):
+        """
+        Restores the masks of a text that reference vault entries.
+
+        Args:
+            masked_text (str): Text masked with mask_format
+            mappings (dict): Mappings already read, by document id
+
+        Returns:
+            str: The text with PII information restored. Masks whose entry
+                 or PII type is unknown are left as they are.
+        """
+        if mappings is None:
+            mappings = {}
+
+        def restore(match):
+            doc_id = int(match.group("doc_id"))
+            if doc_id not in mappings:
+                try:
+                    mappings[doc_id] = self.get(doc_id)
+                except IndexError:
+                    mappings[doc_id] = {}
+            value = mappings[doc_id].get(match.group("pii_type"))
+            return value if isinstance(value, str) else match.group(0)
+
+        return VAULT_MASK_PATTERN.sub(restore, masked_text)
+
+    def unmask_range(self, start, masked_texts):
+        """
+        Restores a run of texts masked with consecutive vault entries.
+
+        The mappings of the whole range are read in one pass over the log.
+
+        Args:
+            start (int): Document id of the first text
+            masked_texts (list): Texts masked with the entries start, start + 1, ...
+
+        Returns:
+            list: The restored texts
+        """
+        mappings = dict(enumerate(self.get_range(start, start + len(masked_texts)), start=start))
+        return [self.unmask(masked_text, mappings) for masked_text in masked_texts]
+
+    def close(self):
+        if not self.readonly:
+            self.flush()
+            self._log.close()
+            self._index.close()
+        self._log_map.close()
+        self._index_map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
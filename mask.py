@@ -1,10 +1,21 @@
+import asyncio
+import contextlib
 import json
-import uuid
+import random
 
 import requests
 
+from llm_data_mask.vault import PIIVault
+
 OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL = "mistral"
+VAULT_PATH = "pii_vault"
+
+# Defaults for the async client
+MAX_CONCURRENCY = 4
+REQUEST_TIMEOUT = 300
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
 
 
 def call_ollama(prompt: str) -> str:
@@ -14,8 +25,8 @@ def call_ollama(prompt: str) -> str:
     return response.json()["response"].strip()
 
 
-def mask_pii(text: str):
-    prompt = (
+def build_mask_prompt(text: str) -> str:
+    return (
         "The following text contains personal information. "
         "Identify all PII (like names, emails, phone numbers, SSNs, addresses, etc.) "
         "and replace them with fake placeholders like <MASK_1>, <MASK_2>, etc. "
@@ -25,8 +36,8 @@ def mask_pii(text: str):
         f"Text:\n{text}\n"
     )
 
-    response = call_ollama(prompt)
 
+def parse_mask_response(response: str):
     # Attempt to extract masked text and mapping from model's response
     try:
         masked_part, mapping_part = response.split("2.", 1)
@@ -41,6 +52,195 @@ def mask_pii(text: str):
         raise e
 
 
+class MaskResponseParser:
+    """Parses a mask response as its fragments arrive.
+
+    The masked text is known as soon as the "2." section starts, and the
+    mapping as soon as its JSON object is closed, so a stream can be used,
+    and stopped, before the model finishes talking.
+    """
+
+    def __init__(self):
+        self.masked_text = None
+        self.pii_map = None
+        self._parts = []
+        self._buffer = ""
+
+    @property
+    def complete(self) -> bool:
+        return self.pii_map is not None
+
+    def feed(self, fragment: str):
+        self._parts.append(fragment)
+        if self.complete:
+            return
+        self._buffer += fragment
+
+        if self.masked_text is None:
+            masked_part, marker, mapping_part = self._buffer.partition("2.")
+            if not marker:
+                return
+            self.masked_text = masked_part.replace("1.", "").strip()
+            self._buffer = mapping_part
+
+        # Only try to decode once the fragment may have closed the object
+        start = self._buffer.find("{")
+        if start == -1 or "}" not in fragment:
+            return
+        try:
+            self.pii_map, _ = json.JSONDecoder().raw_decode(self._buffer, start)
+        except json.JSONDecodeError:
+            pass
+
+    def result(self):
+        if self.complete:
+            return self.masked_text, self.pii_map
+        return parse_mask_response("".join(self._parts).strip())
+
+
+def mask_pii(text: str):
+    response = call_ollama(build_mask_prompt(text))
+    return parse_mask_response(response)
+
+
+class AsyncOllamaClient:
+    """Asyncio Ollama client sharing one pooled connection set across prompts.
+
+    At most `max_concurrency` requests are in flight at once. Failed requests
+    (connection errors, timeouts and 5xx responses) are retried with
+    exponential backoff and jitter.
+    """
+
+    def __init__(
+        self,
+        url: str = OLLAMA_URL,
+        model: str = MODEL,
+        max_concurrency: int = MAX_CONCURRENCY,
+        timeout: float = REQUEST_TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+    ):
+        self.url = url
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session = None
+
+    async def __aenter__(self):
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self._session = None
+
+    async def _with_retries(self, request):
+        import aiohttp
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await request()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status >= 500
+                if not retryable or attempt == self.max_retries:
+                    raise
+                delay = self.backoff_base * 2 ** attempt
+                await asyncio.sleep(delay + random.uniform(0, delay))
+
+    async def generate(self, prompt: str) -> str:
+        async def request():
+            payload = {"model": self.model, "prompt": prompt, "stream": False}
+            async with self._semaphore:
+                async with self._session.post(self.url, json=payload) as response:
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+            return data["response"].strip()
+
+        return await self._with_retries(request)
+
+    async def stream(self, prompt: str):
+        """Yields response fragments as Ollama produces them.
+
+        Retries only happen before the first fragment is received. The
+        timeout bounds the wait for each read rather than the whole stream.
+        """
+        payload = {"model": self.model, "prompt": prompt, "stream": True}
+        async with self._semaphore:
+            response = await self._with_retries(lambda: self._open_stream(payload))
+            async with response:
+                async for line in response.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+
+    async def _open_stream(self, payload):
+        import aiohttp
+
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+        response = await self._session.post(self.url, json=payload, timeout=timeout)
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.release()
+            raise
+        return response
+
+
+async def amask_pii(client: AsyncOllamaClient, text: str, stream: bool = False, on_masked_text=None):
+    """Masks a text with the model, returning (masked_text, pii_map).
+
+    In stream mode the response is parsed as it arrives: `on_masked_text` is
+    called with the masked text as soon as it is complete, and the stream is
+    closed once the mapping is.
+    """
+    prompt = build_mask_prompt(text)
+    if not stream:
+        return parse_mask_response(await client.generate(prompt))
+
+    parser = MaskResponseParser()
+    async with contextlib.aclosing(client.stream(prompt)) as fragments:
+        async for fragment in fragments:
+            had_masked_text = parser.masked_text is not None
+            parser.feed(fragment)
+            if on_masked_text is not None and not had_masked_text and parser.masked_text is not None:
+                on_masked_text(parser.masked_text)
+            if parser.complete:
+                break
+    return parser.result()
+
+
+async def amask_pii_many(
+    texts,
+    max_concurrency: int = MAX_CONCURRENCY,
+    stream: bool = False,
+    client: AsyncOllamaClient = None,
+    **client_kwargs,
+):
+    """Masks many texts concurrently, keeping up to `max_concurrency` requests in flight.
+
+    Returns the (masked_text, pii_map) pairs in input order.
+    """
+    if client is None:
+        async with AsyncOllamaClient(max_concurrency=max_concurrency, **client_kwargs) as client:
+            return await amask_pii_many(texts, stream=stream, client=client)
+
+    return await asyncio.gather(*(amask_pii(client, text, stream) for text in texts))
+
+
 def restore_original_text(masked_text: str, pii_mapping: dict) -> str:
     restored_text = masked_text
     for mask, original in pii_mapping.items():
@@ -52,15 +252,13 @@ def main():
     text = "Pedro é um cidadão com CNH 152.526.266-11 que gosta de ir ao cinema. Seu email é pedrolinhares@gmail.com"
     masked_text, pii_mapping = mask_pii(text)
 
-    # Save mapping to file with unique name
-    map_file = f"pii_mapping_{uuid.uuid4().hex[:8]}.json"
-    with open(map_file, "w") as f:
-        json.dump(pii_mapping, f, indent=2)
-
-    restored = restore_original_text(masked_text, pii_mapping)
+    # Append the mapping to the vault instead of writing one file per text
+    with PIIVault(VAULT_PATH) as vault:
+        doc_id = vault.put(pii_mapping)
+        restored = restore_original_text(masked_text, vault.get(doc_id))
 
     print("\n✅ Masked Text:\n", masked_text)
-    print(f"\n📁 PII mapping saved to: {map_file}")
+    print(f"\n📁 PII mapping saved to: {VAULT_PATH} (document {doc_id})")
     print(f"\n🔍 Restored Text:\n{restored}")
 
 
@@ -1,41 +1,164 @@
+import argparse
+import logging
+import os
+from collections import deque
+from itertools import islice
 
-import json
 import tqdm
-from llm_data_mask import process_driver_text, mask_pii
+from llm_data_mask import build_example_selector, process_driver_texts
+from llm_data_mask.cache import ResultCache
+from llm_data_mask.entity_index import EntityIndex
+from llm_data_mask.metrics import default_metrics, enable_metrics
+from llm_data_mask.parallel import DriverTextPool
+from llm_data_mask.registry import CPU_PROFILE_VARIABLE
+from llm_data_mask.records import ResultWriter, iter_records
+from llm_data_mask.stub import use_stub_model
+from llm_data_mask.vault import PIIVault
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract and mask driver details from a corpus")
+    parser.add_argument('--input', default='data.json', help="JSON array or JSONL file with the records")
+    parser.add_argument('--output', default='extracted_data.jsonl', help="JSONL file the results are appended to")
+    parser.add_argument('--checkpoint', default=None, help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument('--limit', type=int, default=None, help="Only process the first N records")
+    parser.add_argument('--batch-size', type=int, default=8, help="Records generated together")
+    parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and start over")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes, each with its own model")
+    parser.add_argument('--torch-threads', type=int, default=None, help="Torch threads per worker")
+    parser.add_argument('--cpu-profile', default=None, help="CPU inference profile of the model: default, bfloat16 or int8")
+    parser.add_argument('--stub', action='store_true', help="Use the stub model instead of real weights")
+    parser.add_argument('--cache', default=None, help="SQLite cache of extraction results")
+    parser.add_argument('--entity-index', default=None, help="SQLite index of known people, masked without the model")
+    parser.add_argument('--few-shot', type=int, default=None, help="Embed only the K most similar examples in each prompt, none for short records close to an example (0 makes every prompt zero-shot)")
+    parser.add_argument('--window-size', type=int, default=None, help="Extract texts longer than this from their best windows only")
+    parser.add_argument('--vault', default=None, help="Store the mappings in this PII vault and mask with references to it, the output then holds no original text")
+    parser.add_argument('--metrics', default=None, help="Export stage metrics to this file (.prom for Prometheus text, JSON otherwise)")
+    parser.add_argument('--log-level', default='INFO', help="Level of the diagnostic logs")
+    return parser.parse_args()
+
+
+def iter_batches(records, batch_size):
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
 
 
 def main():
-    # Read input data
-    with open('data.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    data = data[:20]
-
-    # Process each sample
-    results = []
-    for item in tqdm.tqdm(data, desc="Processing samples"):
-        if isinstance(item, dict) and 'text' in item:
-            mapping, masked_text, _ = process_driver_text(item['text'])
-
-            print(mapping)
-            print(masked_text)
-            print("-"*50)
-
-
-            if masked_text:
-                results.append({
-                    'original': item['text'],
-                    'mapping': mapping,
-                    'masked_text': masked_text
-                })
-    
-    # Save results
-    output_file = 'extracted_data.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-    
-    print(f"Processed {len(results)} samples. Results saved to {output_file}")
+    args = parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s %(name)s: %(message)s")
+    if args.metrics:
+        # Only the stages run in this process are recorded, not those of the workers
+        enable_metrics()
+
+    if args.cpu_profile:
+        # Set in the environment so the worker processes load the model the same way
+        os.environ[CPU_PROFILE_VARIABLE] = args.cpu_profile
+
+    example_selector = build_example_selector(args.few_shot) if args.few_shot is not None else None
+
+    pool = None
+    cache = None
+    entity_index = None
+    if args.workers > 1:
+        pool = DriverTextPool(
+            args.workers,
+            args.torch_threads,
+            args.batch_size,
+            stub=args.stub,
+            cache_path=args.cache,
+            window_size=args.window_size,
+            entity_index_path=args.entity_index,
+            example_selector=example_selector,
+        )
+    else:
+        if args.stub:
+            use_stub_model()
+        if args.cache:
+            cache = ResultCache(args.cache)
+        if args.entity_index:
+            entity_index = EntityIndex(args.entity_index)
+
+    vault = PIIVault(args.vault) if args.vault else None
+
+    with ResultWriter(args.output, args.checkpoint, resume=not args.restart) as writer:
+        # Read input data lazily, skipping the records already done
+        records = islice(iter_records(args.input), writer.records_done, args.limit)
+        records_done = writer.records_done
+        written = 0
+
+        # Batches handed out for processing, in order
+        pending = deque()
+
+        def text_batches():
+            for batch in iter_batches(records, args.batch_size):
+                texts = [item['text'] for item in batch if isinstance(item, dict) and 'text' in item]
+                pending.append((len(batch), texts))
+                yield texts
+
+        if pool is not None:
+            batch_results = pool.imap(text_batches())
+        else:
+            batch_results = (
+                process_driver_texts(
+                    texts,
+                    args.batch_size,
+                    cache=cache,
+                    window_size=args.window_size,
+                    entity_index=entity_index,
+                    example_selector=example_selector,
+                )
+                for texts in text_batches()
+            )
+
+        progress = tqdm.tqdm(desc="Processing samples", initial=records_done, total=args.limit)
+        for results in batch_results:
+            batch_length, texts = pending.popleft()
+
+            # Process each sample
+            for text, (mapping, masked_text, preprocessed_text) in zip(texts, results):
+                if vault is None:
+                    print(mapping)
+                print(masked_text)
+                print("-"*50)
+
+                if masked_text:
+                    if vault is not None:
+                        # Keep the PII in the vault only, the masks reference its entry
+                        doc_id, masked_text = vault.mask(preprocessed_text, mapping)
+                        record = {'doc_id': doc_id, 'masked_text': masked_text}
+                    else:
+                        record = {'original': text, 'mapping': mapping, 'masked_text': masked_text}
+                    writer.write(record)
+                    written += 1
+
+            # Save progress, the vault entries first so every record references a stored entry
+            if vault is not None:
+                vault.flush()
+            records_done += batch_length
+            writer.checkpoint(records_done)
+            progress.update(batch_length)
+
+        progress.close()
+
+    if pool is not None:
+        pool.close()
+    if cache is not None:
+        print(f"Cache: {cache.stats()}")
+        cache.close()
+    if entity_index is not None:
+        print(f"Entity index: {entity_index.stats()}")
+        entity_index.close()
+    if vault is not None:
+        vault.close()
+
+    if args.metrics:
+        default_metrics.export(args.metrics)
+
+    print(f"Processed {written} samples. Results saved to {args.output}")
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import logging
+import os
+
+from llm_data_mask.cache import ResultCache
+from llm_data_mask.core import build_example_selector
+from llm_data_mask.entity_index import EntityIndex
+from llm_data_mask.registry import CPU_PROFILE_VARIABLE
+from llm_data_mask.server import (
+    DEFAULT_HOST,
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_QUEUE,
+    DEFAULT_MAX_WAIT,
+    DEFAULT_PORT,
+    serve,
+)
+from llm_data_mask.stub import use_stub_model
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve driver detail extraction and masking over HTTP")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Address to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE, help="Requests generated together")
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT * 1000, help="Longest a request waits for others to join its batch")
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE, help="Waiting requests beyond which /process answers 503")
+    parser.add_argument('--cpu-profile', default=None, help="CPU inference profile of the model: default, bfloat16 or int8")
+    parser.add_argument('--stub', action='store_true', help="Use the stub model instead of real weights")
+    parser.add_argument('--cache', default=None, help="SQLite cache of extraction results")
+    parser.add_argument('--entity-index', default=None, help="SQLite index of known people, masked without the model")
+    parser.add_argument('--few-shot', type=int, default=None, help="Embed only the K most similar examples in each prompt, none for short records close to an example (0 makes every prompt zero-shot)")
+    parser.add_argument('--window-size', type=int, default=None, help="Extract texts longer than this from their best windows only")
+    parser.add_argument('--log-level', default='INFO', help="Level of the diagnostic logs")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s %(name)s: %(message)s")
+
+    if args.cpu_profile:
+        os.environ[CPU_PROFILE_VARIABLE] = args.cpu_profile
+    if args.stub:
+        use_stub_model()
+
+    serve(
+        args.host,
+        args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+        max_queue=args.max_queue,
+        cache=ResultCache(args.cache) if args.cache else None,
+        window_size=args.window_size,
+        entity_index=EntityIndex(args.entity_index) if args.entity_index else None,
+        example_selector=build_example_selector(args.few_shot) if args.few_shot is not None else None,
+    )
+
+
+if __name__ == "__main__":
+    main()
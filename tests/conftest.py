@@ -0,0 +1,21 @@
+import pytest
+
+from llm_data_mask import use_stub_model
+from llm_data_mask.metrics import default_metrics, enable_metrics
+from llm_data_mask.registry import default_registry
+
+
+@pytest.fixture
+def stub_model():
+    use_stub_model()
+    yield
+    default_registry.clear()
+
+
+@pytest.fixture
+def metrics():
+    default_metrics.reset()
+    enable_metrics()
+    yield default_metrics
+    enable_metrics(False)
+    default_metrics.reset()
@@ -0,0 +1,34 @@
+import json
+
+from llm_data_mask import bulk, mask_column, mask_pii, unmask_column, unmask_pii
+
+MAPPING = {"name": "JOAO DA SILVA", "CPF": "111.444.777-35"}
+TEXTS = [f"Motorista JOAO DA SILVA, CPF 111.444.777-35, viagem {row}" for row in range(50)]
+
+
+def test_matches_the_row_functions():
+    mappings = [MAPPING] * 25 + [{"name": "JOAO DA SILVA"}] * 25
+    masked = mask_column(TEXTS, mappings=mappings)
+
+    assert masked == [mask_pii(text, mapping) for text, mapping in zip(TEXTS, mappings)]
+    assert unmask_column(masked, mappings=mappings) == [
+        unmask_pii(text, mapping) for text, mapping in zip(masked, mappings)
+    ]
+    assert mask_column(TEXTS + [None], pii_dict=MAPPING)[-1] is None
+
+
+def test_decodes_each_distinct_json_mapping_once(monkeypatch):
+    decoded = []
+    original = json.loads
+
+    def counting_loads(data, *args, **kwargs):
+        decoded.append(data)
+        return original(data, *args, **kwargs)
+
+    monkeypatch.setattr(bulk.json, "loads", counting_loads)
+    mappings = [json.dumps(MAPPING)] * 25 + ['{"name": "JOAO DA SILVA"}'] * 25
+
+    masked = mask_column(TEXTS, mappings=mappings)
+    assert len(decoded) == 2
+    assert unmask_column(masked, mappings=mappings) == TEXTS
+    assert len(decoded) == 4
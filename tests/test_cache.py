@@ -0,0 +1,59 @@
+import itertools
+from types import SimpleNamespace
+
+from llm_data_mask import ResultCache, extract_driver_details
+from llm_data_mask import cache as cache_module
+from llm_data_mask.core import extraction_cache_namespace
+
+TEXT = (
+    "PAULO GIOVANI LEANDRO DIAS, comerciante, portador da identidade n. 324830130, "
+    "CPF n. 802.881.025-09, CEP 68906-491, celular (96) 98226-8422"
+)
+
+
+def test_persists_results_per_namespace(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    with ResultCache(path) as cache:
+        cache.put("texto", "namespace", {"CPF": "802.881.025-09"})
+        assert cache.get("texto", "other namespace") is None
+
+    with ResultCache(path) as cache:
+        assert cache.get("texto", "namespace") == {"CPF": "802.881.025-09"}
+        assert cache.stats() == {"hits": 1, "misses": 0, "entries": 1}
+
+
+def test_evicts_the_least_recently_used_results(monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: next(clock)))
+
+    with ResultCache(":memory:", max_entries=10) as cache:
+        for index in range(10):
+            cache.put(f"texto {index}", "namespace", {"index": index})
+        cache.get("texto 0", "namespace")
+
+        # Going over the limit evicts a tenth of the cache on top of the excess
+        cache.put("texto 10", "namespace", {"index": 10})
+
+        assert cache.stats()["entries"] == 9
+        assert cache.get("texto 0", "namespace") == {"index": 0}
+        assert cache.get("texto 1", "namespace") is None
+        assert cache.get("texto 2", "namespace") is None
+        assert cache.get("texto 3", "namespace") == {"index": 3}
+
+
+def test_namespace_changes_with_how_results_are_produced():
+    assert extraction_cache_namespace("model") == extraction_cache_namespace("model")
+    assert extraction_cache_namespace("model") != extraction_cache_namespace("other model")
+    assert extraction_cache_namespace("model") != extraction_cache_namespace("model", fast_path=False)
+
+
+def test_extraction_reuses_cached_results(stub_model, metrics):
+    with ResultCache(":memory:") as cache:
+        first = extract_driver_details(TEXT, cache=cache)
+        second = extract_driver_details(TEXT, cache=cache)
+
+    assert second == first
+    counters = metrics.snapshot()["counters"]
+    assert counters["cache_misses"] == 1
+    assert counters["cache_hits"] == 1
+    assert counters["generated_prompts"] == 1
@@ -0,0 +1,50 @@
+from llm_data_mask import check_mapping
+from llm_data_mask.core import EditedDriverDetails
+from llm_data_mask.registry import default_registry
+
+TEXT = (
+    "BRENO YURI EDSON VIANA, portador do RG n.° 362063278 SSP/DF, CPF n. 966.388.721-41, "
+    "residente na Quadra SQN 314, Bloco F, Asa NORTE, Brasília-   DF, celular (61) 98397-5024"
+)
+
+
+def test_values_are_aligned_without_the_model(stub_model, metrics):
+    mapping = {
+        "phonenumber": "(61) 98397-5024",
+        "address": "Quadra SQN 314 Bloco F, Asa Norte, Brasília - DF",
+        "CPF": "CPF: 966388721-41",
+        "name": "BRENO YURY EDSON VIANA",
+        "RG": None,
+    }
+
+    corrected_mapping, status = check_mapping(mapping, TEXT)
+
+    assert corrected_mapping == {
+        "phonenumber": "(61) 98397-5024",
+        "address": "Quadra SQN 314, Bloco F, Asa NORTE, Brasília-   DF",
+        "CPF": "966.388.721-41",
+        "name": "BRENO YURI EDSON VIANA",
+        "RG": None,
+    }
+    assert status == {"phonenumber": "exact", "address": "normalized", "CPF": "digits", "name": "fuzzy"}
+    assert "alignment_model" not in metrics.snapshot()["counters"]
+
+
+def test_unaligned_values_go_to_the_model_in_one_batch(stub_model):
+    calls = []
+
+    def edit(prompts):
+        calls.append(len(prompts))
+        return [EditedDriverDetails(edited_text=" SQN 314 "), EditedDriverDetails(edited_text="70767-060")]
+
+    default_registry.generator_builder = lambda model, schema: edit
+
+    mapping = {"address": "Quadra 314 Sul", "CEP": "70767-060", "name": "BRENO YURI EDSON VIANA"}
+
+    corrected_mapping, status = check_mapping(mapping, TEXT)
+
+    assert calls == [2]
+    assert corrected_mapping["address"] == "SQN 314"
+    # Values the model can't place in the text are kept as they were
+    assert corrected_mapping["CEP"] == "70767-060"
+    assert status == {"name": "exact", "address": "model", "CEP": "unresolved"}
@@ -0,0 +1,61 @@
+from llm_data_mask import (
+    extract_driver_details_long,
+    merge_window_mappings,
+    normalize_text,
+    process_driver_text,
+)
+from llm_data_mask.core import DriverDetails
+
+
+def test_merged_mapping_has_every_field():
+    text = "JOAO DA SILVA, CPF 111.444.777-35, sem outros dados."
+    windows = [(0, 30, 3.0), (10, len(text), 2.0)]
+    mappings = [{"name": "JOAO DA SILVA", "CPF": ""}, {"CPF": "111.444.777-35"}]
+
+    mapping, spans = merge_window_mappings(text, windows, mappings)
+
+    assert list(mapping) == list(DriverDetails.model_fields)
+    assert mapping == {
+        "name": "JOAO DA SILVA",
+        "RG": None,
+        "CPF": "111.444.777-35",
+        "CEP": None,
+        "phonenumber": None,
+    }
+    assert spans == [(0, 13, "name"), (19, 33, "CPF")]
+
+
+PII_BLOCK = (
+    "PAULO GIOVANI LEANDRO DIAS, brasileiro, comerciante, portador da cédula de identidade "
+    "RG 324830130 SSP/DF, CPF n. 802.881.025-09, residente e domiciliado na Avenida Joaquim "
+    "Coutinho, 201, Marabaixo, Macapá - AP, CEP 68906-491, celular (96) 98226-8422"
+)
+FILLER = "O recurso trata de uma autuação lavrada durante a fiscalização de trânsito na rodovia. " * 60
+
+
+def test_long_document_is_extracted_from_its_late_window(stub_model):
+    text = normalize_text(FILLER + PII_BLOCK + " " + FILLER).text
+
+    mapping, spans = extract_driver_details_long(text, window_size=1000, overlap=200, normalized=True)
+
+    assert mapping == {
+        "name": "PAULO GIOVANI LEANDRO DIAS",
+        "RG": "324830130 SSP/DF",
+        "CPF": "802.881.025-09",
+        "CEP": "68906-491",
+        "phonenumber": "(96) 98226-8422",
+    }
+    assert len(spans) == 5
+    assert spans[0][0] > len(FILLER) - 200
+    for start, end, field in spans:
+        assert text[start:end] == mapping[field]
+
+
+def test_windows_smaller_than_the_default_overlap(stub_model):
+    text = FILLER + PII_BLOCK
+
+    mapping, masked_text, _ = process_driver_text(text, window_size=500)
+
+    assert mapping["CPF"] == "802.881.025-09"
+    assert "802.881.025-09" not in masked_text
+    assert "[CPF]" in masked_text
@@ -0,0 +1,86 @@
+from llm_data_mask import EntityIndex, extract_driver_details
+from llm_data_mask import entity_index as entity_index_module
+
+PAULO = {
+    "name": "PAULO GIOVANI LEANDRO DIAS",
+    "RG": "324830130 SSP/DF",
+    "CPF": "802.881.025-09",
+    "CEP": "68906-491",
+    "phonenumber": "(96) 98226-8422",
+}
+BRENO = {
+    "name": "BRENO YURI EDSON VIANA",
+    "RG": "362063278 SSP/DF",
+    "CPF": "966.388.721-41",
+    "CEP": "70767-060",
+    "phonenumber": "(61) 98397-5024",
+}
+
+
+def qualification(person):
+    return (
+        f"{person['name']}, comerciante, RG {person['RG']}, CPF n. {person['CPF']}, "
+        f"CEP {person['CEP']}, celular {person['phonenumber']}"
+    )
+
+
+def test_finds_known_people_across_connections(tmp_path):
+    path = str(tmp_path / "entities.sqlite")
+    with EntityIndex(path) as index:
+        assert index.add_many([PAULO, dict(BRENO, CPF="966.388.721-00"), {}]) == 1
+        assert index.add(PAULO) == 0
+
+    with EntityIndex(path) as index:
+        assert len(index) == 1
+        assert index.lookup("Recurso de " + qualification(PAULO)) == PAULO
+        # Every required field must be in the text
+        assert index.lookup(qualification(PAULO).replace(PAULO["CEP"], "")) is None
+        assert index.stats() == {"hits": 1, "misses": 1, "entities": 1}
+
+
+def test_updates_replace_the_stored_values():
+    moved = dict(PAULO, CEP="70767-060")
+    with EntityIndex(":memory:") as index:
+        index.add(PAULO)
+        assert index.lookup(qualification(PAULO)) == PAULO
+
+        index.add(moved)
+
+        assert index.lookup(qualification(moved)) == moved
+        assert index.lookup(qualification(PAULO)) is None
+
+
+def test_new_values_are_found_before_and_after_the_matcher_rebuild(monkeypatch):
+    monkeypatch.setattr(entity_index_module, "MAX_PENDING_VALUES", 8)
+    with EntityIndex(":memory:") as index:
+        index.add(PAULO)
+        index.lookup("")
+
+        # Scanned with the small matcher of pending values
+        index.add(BRENO)
+        assert index.lookup(qualification(BRENO)) == BRENO
+        assert len(index._pending) == 5
+
+        # Going over the limit folds the pending values into the main matcher
+        index.add(dict(BRENO, name="BRENO VIANA", RG="1234567 SSP/DF", CEP="70000-000", phonenumber="(61) 3333-4444"))
+        assert index.lookup(qualification(PAULO)) == PAULO
+        assert index._pending == {}
+
+
+def test_texts_with_several_known_people_are_ambiguous():
+    with EntityIndex(":memory:") as index:
+        index.add_many([PAULO, BRENO])
+
+        assert index.lookup(qualification(PAULO) + " e " + qualification(BRENO)) is None
+
+
+def test_extraction_reuses_known_people(stub_model, metrics):
+    text = qualification(PAULO).replace(", comerciante", ", brasileiro")
+    with EntityIndex(":memory:") as index:
+        first = extract_driver_details(text, entity_index=index)
+        second = extract_driver_details("Recorrente: " + text, entity_index=index)
+
+    assert first == second == PAULO
+    counters = metrics.snapshot()["counters"]
+    assert counters["entity_index_misses"] == 1
+    assert counters["entity_index_hits"] == 1
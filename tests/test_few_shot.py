@@ -0,0 +1,61 @@
+from llm_data_mask import TfidfExampleSelector, build_example_selector, extract_driver_details_batch
+from llm_data_mask.core import DriverDetails, build_extraction_prompt_prefix
+from llm_data_mask.few_shot import char_ngrams
+from llm_data_mask.registry import default_registry
+
+POOL = [
+    "JOAO SILVA, brasileiro, CPF n. 111.444.777-35, CEP 70767-060",
+    "portadora do RG n.° 209668283 SSP/DF, celular (61) 9 9133-5265",
+    "Endereço: Rua das Flores, 12, Bairro Centro, Cidade Alta",
+]
+
+
+def test_records_compare_by_layout_not_values():
+    assert char_ngrams("CPF 123", (2, 2)) == char_ngrams("cpf 987", (2, 2))
+
+
+def test_selects_the_most_similar_examples_in_pool_order():
+    selector = TfidfExampleSelector(POOL, k=2, easy_min_similarity=None)
+
+    similarities = selector.similarities("Endereço: Rua Sete, 40, Bairro Norte, Cidade Baixa, celular (11) 9 8888-7777")
+
+    assert max(similarities) == similarities[2]
+    assert selector.select("Endereço: Rua Sete, 40, Bairro Norte, Cidade Baixa, celular (11) 9 8888-7777") == (1, 2)
+
+
+def test_short_records_like_an_example_are_zero_shot():
+    selector = TfidfExampleSelector(POOL, k=2)
+    text = "MARIA SOUZA, brasileira, CPF n. 222.555.888-46, CEP 70000-000"
+
+    assert selector.select(text) == ()
+    assert len(selector.select(text * 10)) == 2
+    assert TfidfExampleSelector(POOL, k=0).select(text) == ()
+
+
+def test_description_changes_with_the_selection():
+    assert build_example_selector().describe() == build_example_selector().describe()
+    assert build_example_selector(k=1).describe() != build_example_selector(k=2).describe()
+
+
+def test_records_selecting_the_same_examples_share_a_prompt(stub_model, metrics):
+    selector = build_example_selector(k=2, easy_min_similarity=None)
+    texts = [
+        "portadora do RG n.° 111111111 SSP/DF, ANA LIMA, brasileira, CPF n. 111.444.777-35",
+        "portadora do RG n.° 222222222 SSP/DF, BIA LIMA, brasileira, CPF n. 802.881.025-09",
+    ]
+    prompts = []
+    stub_builder = default_registry.generator_builder
+
+    def recording_builder(model, schema):
+        generator = stub_builder(model, schema)
+        return lambda batch: prompts.append(batch) or generator(batch)
+
+    default_registry.generator_builder = recording_builder
+
+    extract_driver_details_batch(texts, max_retries=0, fast_path=False, example_selector=selector)
+
+    [examples] = {selector.select(text) for text in texts}
+    prefix = build_extraction_prompt_prefix(tuple(DriverDetails.model_fields), examples)
+    assert len(examples) == 2
+    assert len(prompts) == 1 and all(prompt.startswith(prefix) for prompt in prompts[0])
+    assert metrics.snapshot()["counters"]["few_shot_examples"] == 4
@@ -0,0 +1,37 @@
+import os
+import stat
+from importlib import metadata
+
+import pytest
+
+from llm_data_mask.guide_cache import GuideCache, is_supported_outlines
+
+
+def test_round_trips_a_guide_in_a_private_directory(tmp_path):
+    guide_cache = GuideCache(str(tmp_path / "guides"))
+    guide_cache.store("key", {0: {1: 2}})
+
+    assert stat.S_IMODE(os.stat(guide_cache.directory).st_mode) == 0o700
+    assert guide_cache.load("key") == {0: {1: 2}}
+
+
+def test_ignores_a_directory_other_users_can_write_to(tmp_path):
+    guide_cache = GuideCache(str(tmp_path / "guides"))
+    guide_cache.store("key", {0: {1: 2}})
+    os.chmod(guide_cache.directory, 0o777)
+
+    assert guide_cache.load("key") is None
+    guide_cache.store("other", {0: {}})
+    assert not os.path.exists(os.path.join(guide_cache.directory, "other.guide"))
+
+
+@pytest.mark.parametrize("version, supported", [("0.2.1", True), ("0.2.3", False), (None, False)])
+def test_only_checked_outlines_versions_use_the_cache(monkeypatch, version, supported):
+    def fake_version(package):
+        if version is None:
+            raise metadata.PackageNotFoundError(package)
+        return version
+
+    monkeypatch.setattr(metadata, "version", fake_version)
+
+    assert is_supported_outlines() is supported
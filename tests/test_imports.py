@@ -0,0 +1,37 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.imports import HEAVY_MODULES, IMPORT_BUDGETS
+
+_PROBE = """
+import json, sys
+{statement}
+print(json.dumps([name for name in {heavy!r} if name in sys.modules]))
+"""
+
+
+def loaded_heavy_modules(statement):
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return set(json.loads(output.strip().splitlines()[-1]))
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS))
+def test_import_loads_only_the_allowed_dependencies(module):
+    assert loaded_heavy_modules(f"import {module}") <= set(IMPORT_BUDGETS[module]["allowed"])
+
+
+def test_masking_does_not_load_the_model_stack():
+    statement = (
+        "from llm_data_mask import mask_pii, unmask_pii, mask_column, PIIVault\n"
+        "masked = mask_pii('JOAO DA SILVA, CPF 111.444.777-35', {'name': 'JOAO DA SILVA'})\n"
+        "unmask_pii(masked, {'name': 'JOAO DA SILVA'})"
+    )
+    assert loaded_heavy_modules(statement) == set()
@@ -0,0 +1,191 @@
+import asyncio
+import json
+
+import pytest
+
+from mask import AsyncOllamaClient, MaskResponseParser, amask_pii, amask_pii_many
+
+RESPONSE = (
+    "1. <MASK_1> tem CNH <MASK_2>.\n",
+    "2",
+    ". Mapping:\n{\"<MASK_1>\": \"Pedro\", ",
+    "\"<MASK_2>\": \"152.526.266-11\"}",
+    "\nLet me know if you need anything else.",
+)
+
+GENERATED = '1. <MASK_1> tem CNH <MASK_2>.\n2. {"<MASK_1>": "Pedro", "<MASK_2>": "152.526.266-11"}'
+EXPECTED = ("<MASK_1> tem CNH <MASK_2>.", {"<MASK_1>": "Pedro", "<MASK_2>": "152.526.266-11"})
+
+
+class FakeStreamingClient:
+    def __init__(self, fragments):
+        self.fragments = fragments
+        self.sent = 0
+        self.closed = False
+
+    async def stream(self, prompt):
+        try:
+            for fragment in self.fragments:
+                self.sent += 1
+                yield fragment
+        finally:
+            self.closed = True
+
+
+def test_parser_reads_one_fragment_at_a_time():
+    parser = MaskResponseParser()
+    for fragment in RESPONSE[:2]:
+        parser.feed(fragment)
+    assert parser.masked_text is None
+
+    parser.feed(RESPONSE[2])
+    assert parser.masked_text == "<MASK_1> tem CNH <MASK_2>."
+    assert not parser.complete
+
+    parser.feed(RESPONSE[3])
+    assert parser.result() == ("<MASK_1> tem CNH <MASK_2>.", {"<MASK_1>": "Pedro", "<MASK_2>": "152.526.266-11"})
+
+
+def test_stream_emits_the_masked_text_early_and_stops_after_the_mapping():
+    client = FakeStreamingClient(RESPONSE)
+    emitted = []
+
+    def on_masked_text(masked_text):
+        emitted.append((masked_text, client.sent))
+
+    masked_text, pii_map = asyncio.run(amask_pii(client, "texto", stream=True, on_masked_text=on_masked_text))
+
+    assert emitted == [("<MASK_1> tem CNH <MASK_2>.", 3)]
+    assert pii_map == {"<MASK_1>": "Pedro", "<MASK_2>": "152.526.266-11"}
+    # The trailing chatter is never read
+    assert client.sent == 4
+    assert client.closed
+
+
+class StubOllama:
+    """
+    Local aiohttp server answering /api/generate like Ollama.
+
+    Args:
+        failures (int): Number of requests answered with a 500 first
+        status (int): Status of the failing responses
+        delay (float): Seconds each answer waits before the first byte
+        chunk_delay (float): Seconds between streamed chunks
+    """
+
+    def __init__(self, failures=0, status=500, delay=0.0, chunk_delay=0.0):
+        self.failures = failures
+        self.status = status
+        self.delay = delay
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.peers = set()
+
+    async def handle(self, request):
+        from aiohttp import web
+
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.peers.add(request.transport.get_extra_info("peername"))
+        try:
+            payload = await request.json()
+            await asyncio.sleep(self.delay)
+            if self.failures:
+                self.failures -= 1
+                return web.Response(status=self.status)
+            if not payload["stream"]:
+                return web.json_response({"response": GENERATED})
+
+            response = web.StreamResponse()
+            await response.prepare(request)
+            for fragment in RESPONSE:
+                await asyncio.sleep(self.chunk_delay)
+                await response.write((json.dumps({"response": fragment, "done": False}) + "\n").encode())
+            await response.write(b'{"response": "", "done": true}\n')
+            return response
+        finally:
+            self.in_flight -= 1
+
+    async def run(self, scenario):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post("/api/generate", self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            return await scenario(f"http://127.0.0.1:{port}/api/generate")
+        finally:
+            await runner.cleanup()
+
+
+def run_against(server, scenario):
+    pytest.importorskip("aiohttp")
+    return asyncio.run(server.run(scenario))
+
+
+def test_retries_server_errors():
+    server = StubOllama(failures=2)
+
+    async def scenario(url):
+        async with AsyncOllamaClient(url, backoff_base=0.001) as client:
+            return await amask_pii(client, "texto")
+
+    assert run_against(server, scenario) == EXPECTED
+    assert server.requests == 3
+
+
+def test_does_not_retry_client_errors():
+    import aiohttp
+
+    server = StubOllama(failures=1, status=404)
+
+    async def scenario(url):
+        async with AsyncOllamaClient(url, backoff_base=0.001) as client:
+            return await amask_pii(client, "texto")
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        run_against(server, scenario)
+    assert server.requests == 1
+
+
+def test_bounds_concurrency_and_pools_connections():
+    server = StubOllama(delay=0.05)
+
+    async def scenario(url):
+        return await amask_pii_many([f"texto {index}" for index in range(12)], max_concurrency=3, url=url)
+
+    results = run_against(server, scenario)
+
+    assert results == [EXPECTED] * 12
+    assert server.max_in_flight == 3
+    # Requests reuse the pooled keep-alive connections
+    assert len(server.peers) <= 3
+
+
+def test_times_out_a_slow_answer():
+    server = StubOllama(delay=1.0)
+
+    async def scenario(url):
+        async with AsyncOllamaClient(url, timeout=0.1, max_retries=0) as client:
+            return await amask_pii(client, "texto")
+
+    with pytest.raises(asyncio.TimeoutError):
+        run_against(server, scenario)
+
+
+def test_stream_timeout_bounds_each_read_not_the_whole_stream():
+    # Every chunk arrives within the timeout, the whole stream takes longer
+    server = StubOllama(chunk_delay=0.06)
+
+    async def scenario(url):
+        async with AsyncOllamaClient(url, timeout=0.15, max_retries=0) as client:
+            return await amask_pii(client, "texto", stream=True)
+
+    assert run_against(server, scenario) == EXPECTED
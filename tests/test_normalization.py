@@ -0,0 +1,32 @@
+import random
+import re
+
+from llm_data_mask import normalize_text
+from llm_data_mask.helpers import fix_comma_spacing_regex, remove_extra_spaces_regex
+
+
+def legacy_preprocess(text):
+    text = remove_extra_spaces_regex(text)
+    text = fix_comma_spacing_regex(text)
+    return re.sub(r"(\s\d\d)\.", r"\1", text)
+
+
+def test_matches_the_legacy_rewrites():
+    rng = random.Random(0)
+    for _ in range(2000):
+        text = "".join(rng.choice(" \t\n,.12aB") for _ in range(rng.randint(0, 40)))
+        assert normalize_text(text).text == legacy_preprocess(text)
+
+
+def test_maps_spans_back_to_the_original():
+    original = "CPF  n. 802.881.025-09 ,\tCEP 70.316-109"
+    normalized = normalize_text(original)
+
+    assert normalized.text == "CPF n. 802.881.025-09, CEP 70316-109"
+    for value in ("802.881.025-09", "CEP"):
+        start = normalized.text.index(value)
+        original_start, original_end = normalized.to_original_span(start, start + len(value))
+        assert original[original_start:original_end] == value
+
+    start = normalized.text.index("70316-109")
+    assert normalized.to_original_span(start, start + 9) == (original.index("70.316-109"), len(original))
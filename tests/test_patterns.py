@@ -0,0 +1,41 @@
+from llm_data_mask import extract_driver_details, extract_fast_fields, is_valid_cpf, is_valid_phonenumber
+
+TEXT = (
+    "PAULO GIOVANI LEANDRO DIAS, brasileiro, comerciante, portador da cédula de identidade "
+    "RG 324830130 SSP/DF, CPF n. 802.881.025-09, residente e domiciliado na Avenida Joaquim "
+    "Coutinho, 201, Marabaixo, Macapá - AP, CEP 68906-491, celular (96) 98226-8422"
+)
+
+
+def test_resolves_every_field_of_the_usual_layout():
+    assert extract_fast_fields(TEXT) == {
+        "name": "PAULO GIOVANI LEANDRO DIAS",
+        "RG": "324830130 SSP/DF",
+        "CPF": "802.881.025-09",
+        "CEP": "68906-491",
+        "phonenumber": "(96) 98226-8422",
+    }
+
+
+def test_leaves_invalid_and_ambiguous_values_to_the_model():
+    assert not is_valid_cpf("802.881.025-00")
+    assert not is_valid_phonenumber("(10) 98226-8422")
+    assert extract_fast_fields("CPF 802.881.025-00, telefone (10) 98226-8422, CEP 68906-491") == {
+        "CEP": "68906-491",
+    }
+    # Two valid CPFs, the model picks the driver's
+    assert "CPF" not in extract_fast_fields("CPF 802.881.025-09 e CPF 111.444.777-35")
+
+
+def test_the_model_only_generates_the_unresolved_fields(stub_model, metrics):
+    assert extract_driver_details(TEXT)["CPF"] == "802.881.025-09"
+    assert "generated_prompts" not in metrics.snapshot()["counters"]
+
+    text = TEXT.replace(", brasileiro", "").replace("RG ", "identidade n. ")
+    mapping = extract_driver_details(text)
+
+    counters = metrics.snapshot()["counters"]
+    assert counters["generated_prompts"] == 1
+    assert counters["generated_fields"] == 2
+    assert mapping["CPF"] == "802.881.025-09"
+    assert mapping["phonenumber"] == "(96) 98226-8422"
@@ -0,0 +1,72 @@
+import types
+
+import pytest
+
+from llm_data_mask.prefix_cache import PrefixCache, count_generated_tokens
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+PREFIX_IDS = [5, 6, 7, 8, 9, 10, 11, 12]
+PROMPTS = [PREFIX_IDS + [20, 21, 22, 23, 24], PREFIX_IDS + [30, 31], PREFIX_IDS + [40, 41, 42]]
+GENERATION = {"max_new_tokens": 6, "do_sample": False, "pad_token_id": 0}
+
+
+def tiny_model():
+    """
+    Returns a randomly initialized Qwen2 model and an outlines-like wrapper around it.
+    """
+    torch.manual_seed(0)
+    config = transformers.Qwen2Config(
+        vocab_size=100,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+    )
+    hf_model = transformers.Qwen2ForCausalLM(config).eval()
+
+    def hf_tokenizer(text, return_tensors=None):
+        return types.SimpleNamespace(input_ids=torch.tensor([PREFIX_IDS]))
+
+    model = types.SimpleNamespace(model=hf_model, tokenizer=types.SimpleNamespace(tokenizer=hf_tokenizer))
+    return hf_model, model
+
+
+def test_left_padded_batch_reuses_the_prefix_cache():
+    hf_model, model = tiny_model()
+    width = max(len(prompt) for prompt in PROMPTS)
+    input_ids = torch.tensor([[0] * (width - len(prompt)) + prompt for prompt in PROMPTS])
+    attention_mask = torch.tensor([[0] * (width - len(prompt)) + [1] * len(prompt) for prompt in PROMPTS])
+    expected = hf_model.generate(input_ids=input_ids, attention_mask=attention_mask, **GENERATION)
+
+    prefix_cache = PrefixCache()
+    prefix_cache.preload(model, "prefix")
+    prefilled = []
+    original_forward = hf_model.forward
+
+    def forward(*args, **kwargs):
+        prefilled.append(kwargs["input_ids"].shape[1])
+        return original_forward(*args, **kwargs)
+
+    hf_model.forward = forward
+    with prefix_cache.reuse(model, "prefix"):
+        output = hf_model.generate(input_ids=input_ids, attention_mask=attention_mask, **GENERATION)
+
+    # Only the suffixes are prefilled, and the completions are unchanged
+    assert prefilled[0] == width - len(PREFIX_IDS)
+    assert output[:, width:].tolist() == expected[:, width:].tolist()
+
+
+def test_counts_the_tokens_generate_produces():
+    hf_model, model = tiny_model()
+    input_ids = torch.tensor([PROMPTS[0], PROMPTS[0]])
+
+    with count_generated_tokens(model) as counter:
+        output = hf_model.generate(input_ids=input_ids, **dict(GENERATION, eos_token_id=None))
+
+    assert output.shape[1] == input_ids.shape[1] + GENERATION["max_new_tokens"]
+    assert counter.tokens == int((output[:, input_ids.shape[1]:] != GENERATION["pad_token_id"]).sum())
+    assert counter.tokens > 0
+    assert "generate" not in vars(hf_model)
@@ -0,0 +1,72 @@
+import pytest
+
+from llm_data_mask import extract_driver_details, extract_driver_details_batch
+from llm_data_mask.registry import default_registry
+
+TEXT = "Motorista: PAULO DIAS, identidade 324830130, CPF 802.881.025-09, CEP 68906-491, fone (96) 98226-8422"
+
+FIRST_ANSWER = {
+    "name": "PAULO DIAS",
+    "RG": "324830130",
+    "CPF": "802.881.025-00",  # Wrong check digits
+    "CEP": "68906-491",
+    "phonenumber": "(96) 98226-8422",
+}
+
+
+class ScriptedGenerator:
+    """
+    Generator answering each call with the next scripted values, recording the fields asked for.
+    """
+
+    def __init__(self, schema, answers, calls):
+        self.schema = schema
+        self.answers = answers
+        self.calls = calls
+
+    def __call__(self, prompts):
+        fields = tuple(self.schema.model_fields)
+        self.calls.append((fields, len(prompts)))
+        answer = self.answers.pop(0)
+        return [self.schema.model_construct(**{field: answer[field] for field in fields}) for _ in prompts]
+
+
+@pytest.fixture
+def scripted_model(stub_model):
+    calls = []
+
+    def script(*answers):
+        answers = list(answers)
+        default_registry.generator_builder = lambda model, schema: ScriptedGenerator(schema, answers, calls)
+        return calls
+
+    return script
+
+
+def test_only_the_invalid_field_is_regenerated(scripted_model, metrics):
+    calls = scripted_model(FIRST_ANSWER, {"CPF": "802.881.025-09"})
+
+    mapping = extract_driver_details(TEXT, fast_path=False)
+
+    assert calls == [(tuple(FIRST_ANSWER), 1), (("CPF",), 1)]
+    assert mapping == dict(FIRST_ANSWER, CPF="802.881.025-09")
+    assert metrics.snapshot()["counters"]["retries"] == 1
+
+
+def test_gives_up_after_max_retries(scripted_model):
+    calls = scripted_model(FIRST_ANSWER, {"CPF": "111.111.111-11"})
+
+    mapping = extract_driver_details(TEXT, max_retries=1, fast_path=False)
+
+    assert len(calls) == 2
+    assert mapping["CPF"] == "111.111.111-11"
+    assert mapping["name"] == "PAULO DIAS"
+
+
+def test_batch_regenerates_the_failing_records_together(scripted_model):
+    calls = scripted_model(FIRST_ANSWER, {"CPF": "802.881.025-09"})
+
+    mappings = extract_driver_details_batch([TEXT, TEXT + "."], fast_path=False)
+
+    assert calls == [(tuple(FIRST_ANSWER), 2), (("CPF",), 2)]
+    assert [mapping["CPF"] for mapping in mappings] == ["802.881.025-09"] * 2
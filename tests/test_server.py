@@ -0,0 +1,133 @@
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+from llm_data_mask.server import MaskingServer
+
+TEXT = (
+    "PAULO GIOVANI LEANDRO DIAS, brasileiro, comerciante, portador da cédula de identidade "
+    "RG 324830130 SSP/DF, CPF n. 802.881.025-09, residente e domiciliado na Avenida Joaquim "
+    "Coutinho, 201, Marabaixo, Macapá - AP, CEP 68906-491, celular (96) 98226-8422"
+)
+
+
+@pytest.fixture
+def serve(stub_model, metrics):
+    servers = []
+
+    def start(**options):
+        server = MaskingServer(("127.0.0.1", 0), **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def hold_batches(server):
+    """
+    Makes the batcher wait for the returned event before processing each batch.
+    """
+    gate = threading.Event()
+    process_batch = server.batcher.process_batch
+
+    def held(texts):
+        gate.wait()
+        return process_batch(texts)
+
+    server.batcher.process_batch = held
+    return gate
+
+
+def request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    try:
+        if body is not None and not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def post_in_background(server, path, body):
+    responses = []
+    thread = threading.Thread(target=lambda: responses.append(request(server, "POST", path, body)))
+    thread.start()
+    return thread, responses
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_concurrent_requests_are_batched(serve, metrics):
+    server = serve(max_batch_size=4, max_wait=1.0)
+    gate = hold_batches(server)
+
+    # The first request is taken alone, the next ones queue behind it
+    first = post_in_background(server, "/process", {"text": TEXT})
+    wait_for(lambda: metrics.snapshot()["counters"].get("server_batches") == 1)
+    others = [post_in_background(server, "/process", {"text": TEXT}) for _ in range(4)]
+    wait_for(lambda: server.batcher.queue_depth() == 4)
+    gate.set()
+
+    for thread, responses in [first, *others]:
+        thread.join()
+        status, body = responses[0]
+        assert status == 200
+        assert body["mapping"]["CPF"] == "802.881.025-09"
+        assert "802.881.025-09" not in body["masked_text"]
+
+    counters = metrics.snapshot()["counters"]
+    assert counters["server_batches"] == 2
+    assert counters["server_batched_requests"] == 5
+
+
+def test_full_queue_answers_503(serve, metrics):
+    server = serve(max_batch_size=1, max_queue=1)
+    gate = hold_batches(server)
+
+    running = post_in_background(server, "/process", {"text": TEXT})
+    wait_for(lambda: metrics.snapshot()["counters"].get("server_batches") == 1)
+    queued = post_in_background(server, "/process", {"text": TEXT})
+    wait_for(lambda: server.batcher.queue_depth() == 1)
+
+    status, body = request(server, "POST", "/process", {"text": TEXT})
+    gate.set()
+
+    assert status == 503
+    assert "already waiting" in body["error"]
+    for thread, responses in (running, queued):
+        thread.join()
+        assert responses[0][0] == 200
+    assert metrics.snapshot()["counters"]["server_rejected"] == 1
+
+
+@pytest.mark.parametrize(
+    "body, headers",
+    [
+        (b"{not json", {}),
+        (b"[1, 2]", {}),
+        ({"text": 3}, {}),
+        (b"{}", {"Content-Length": "abc"}),
+        (b"{}", {"Content-Length": "-2"}),
+    ],
+)
+def test_bad_requests_answer_400(serve, body, headers):
+    server = serve()
+
+    status, response = request(server, "POST", "/process", body, headers)
+
+    assert status == 400
+    assert "error" in response
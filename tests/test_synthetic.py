@@ -0,0 +1,20 @@
+from llm_data_mask import extract_fast_fields, normalize_text, process_driver_texts
+from llm_data_mask.synthetic import field_accuracy, generate_records
+
+
+def test_default_records_are_resolved_by_the_fast_path():
+    for record in generate_records(50):
+        assert len(extract_fast_fields(normalize_text(record["text"]).text)) == 5
+
+
+def test_unresolved_records_reach_the_model(stub_model, metrics):
+    records = generate_records(40, unresolved=1.0)
+    for record in records:
+        assert len(extract_fast_fields(normalize_text(record["text"]).text)) < 5
+
+    results = process_driver_texts([record["text"] for record in records])
+
+    counters = metrics.snapshot()["counters"]
+    assert counters["generated_prompts"] >= len(records)
+    # The stub can't find what the fast path misses
+    assert field_accuracy(records, [mapping for mapping, _, _ in results])["overall"] < 1
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+from llm_data_mask.vault import INDEX_ENTRY, PIIVault
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CRASHING_WRITER = """
+import os, sys
+from llm_data_mask.vault import PIIVault
+vault = PIIVault(sys.argv[1])
+for doc_id in range(700):
+    vault.put({"name": f"PERSON {doc_id}", "CPF": "111.444.777-35"})
+os._exit(0)
+"""
+
+
+def test_recovers_from_a_crash_without_flush(tmp_path):
+    path = str(tmp_path / "vault")
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.run([sys.executable, "-c", _CRASHING_WRITER, path], check=True, env=environment)
+    log_size = os.path.getsize(f"{path}.log")
+
+    with PIIVault(path) as vault:
+        assert os.path.getsize(f"{path}.log") <= log_size
+        mappings = vault.get_range(0, len(vault))
+        assert [mapping["name"] for mapping in mappings] == [f"PERSON {doc_id}" for doc_id in range(len(vault))]
+
+        # The vault keeps working after recovery
+        doc_id = vault.put({"name": "NEW"})
+        assert vault.get(doc_id) == {"name": "NEW"}
+
+
+def test_drops_index_entries_past_the_end_of_the_log(tmp_path):
+    path = str(tmp_path / "vault")
+    with PIIVault(path) as vault:
+        vault.put({"name": "A"})
+        vault.put({"name": "B"})
+
+    # An index entry whose log bytes never reached the disk
+    log_size = os.path.getsize(f"{path}.log")
+    with open(f"{path}.idx", "ab") as index:
+        index.write(INDEX_ENTRY.pack(log_size, 100))
+
+    with PIIVault(path) as vault:
+        assert len(vault) == 2
+        assert os.path.getsize(f"{path}.log") == log_size
+        assert vault.get(1) == {"name": "B"}